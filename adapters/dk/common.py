@@ -14,6 +14,18 @@ DK_COLS = {
     # "Opponent": "opp",  # 無ければ空でOK
 }
 
+def _game_info(df: pd.DataFrame, team: pd.Series) -> tuple[pd.Series, pd.Series]:
+    """"Game Info"（例: "DET@BOS 09/26/2025 07:10PM ET"）から (opp, game_id) を作る。無い/読めない行は空。"""
+    empty = pd.Series("", index=df.index, dtype=object)
+    if "Game Info" not in df.columns:
+        return empty, empty.copy()
+    matchup = df["Game Info"].astype(str).str.extract(r"^\s*([A-Za-z0-9]+)@([A-Za-z0-9]+)")
+    away, home = matchup[0].str.upper(), matchup[1].str.upper()
+    team = team.fillna("").astype(str).str.strip().str.upper()
+    opp = empty.mask(team == away, home).mask(team == home, away).fillna("")
+    game_id = (away + "@" + home).fillna("")
+    return opp, game_id
+
 def _read_csv_utf8(path: Path) -> pd.DataFrame:
     """Windows環境での文字化け対策：UTF-8優先で安全に読む。"""
     for enc in ("utf-8", "utf-8-sig", "cp932", "cp1252"):
@@ -46,7 +58,9 @@ def load_and_normalize(raw_csv: Path, sport: str) -> pd.DataFrame:
 
     # 追加の共通列
     out["site"], out["sport"] = "dk", sport
-    out["game_id"], out["slate_id"], out["status"], out["opp"] = "", "", "", ""
+    out["slate_id"], out["status"] = "", ""
+    # 対戦相手・試合ID（"Game Info" があれば埋める。対戦相手除外/スタックで使用）
+    out["opp"], out["game_id"] = _game_info(df, out["team"])
 
     # 必須列を保証
     for c in COLUMNS:
@@ -22,7 +22,7 @@ def backtest_lineups(lineups: List[Dict[str, Any]], df_actual: pd.DataFrame, act
         hits = 0 # players with >0 pts
         
         for slot in lu["slots"]:
-            pid = slot["player_id"]
+            pid = slot.get("base_player_id", slot["player_id"])
             act = id_map.get(str(pid), 0)
             total_act += act
             if act > 0:
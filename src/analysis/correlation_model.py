@@ -1,31 +1,122 @@
+import json
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
 import pandas as pd
 import numpy as np
 
-def generate_correlation_matrix(lineup_players: pd.DataFrame, sport: str = "NBA") -> pd.DataFrame:
+def _position(value) -> str:
+    """First position token ("PG/SG" -> "PG"; sets: alphabetically first)."""
+    if isinstance(value, (set, frozenset, list, tuple)):
+        value = sorted(value)[0] if value else ""
+    return str(value).split("/")[0].strip().upper()
+
+
+def pair_correlation(pairs: Dict[str, float], pos_a: str, pos_b: str) -> float:
     """
-    Generates a correlation matrix for the players in a specific lineup (or pool).
-    Note: Doing this for the WHOLE pool is n^2 and expensive/useless.
-    Usually used for calculating Lineup Variance or checking constraints.
-    
-    For now, we might not build a full dense matrix for the solver (too heavy).
-    Instead, this module provide helpers to calculate "Correlated Boost" for a lineup.
-    
-    Heuristics (NBA):
-    - Same Team:
-        - PG + C: Weak Positive
-        - PG + SG: Slight Positive
-        - Usage cannibalization: Star + Star might be slightly negative/neutral?
-    - Opponent:
-        - PG vs Opp PG: Positive (Game Script)
-    
-    Returns: DataFrame (index=player_id, col=player_id) - sparse representation preferred if large.
+    Correlation of a position pair from a `same_team` / `opponent` table.
+    First match of "A-B" / "B-A", "A-*" / "*-A", "B-*" / "*-B", then "*" (default 0).
     """
-    # Placeholder for MVP:
-    # We will likely implement "Stack Bonus" in EV calculation directly rather than full covariance matrix.
-    # But if we need a matrix for "Variance" calc: Var(L) = Sum(Var_i) + 2*Sum(Cov_ij)
-    
-    # Simplification: Return empty for now, or implement simple lookup.
-    return pd.DataFrame()
+    for key in (f"{pos_a}-{pos_b}", f"{pos_b}-{pos_a}", f"{pos_a}-*", f"*-{pos_a}", f"{pos_b}-*", f"*-{pos_b}", "*"):
+        if key in pairs:
+            return float(pairs[key])
+    return 0.0
+
+
+def game_keys(df: pd.DataFrame) -> pd.Series:
+    """
+    Game per player: _game / game_id, else the DK "Game Info" matchup, else the
+    sorted (team, opponent) pair, else the team alone. None without a team.
+    """
+    team = df["_team"] if "_team" in df.columns else df.get("team", pd.Series(None, index=df.index))
+    team = team.astype(object).where(team.notna(), None)
+    game = pd.Series(None, index=df.index, dtype=object)
+    for col in ("_game", "game_id"):
+        if col in df.columns:
+            game = game.combine_first(df[col].astype(object).where(df[col].notna(), None))
+    if "Game Info" in df.columns:
+        matchup = df["Game Info"].astype(str).str.extract(r"^\s*([A-Za-z0-9]+@[A-Za-z0-9]+)")[0]
+        game = game.combine_first(matchup.str.upper())
+    for col in ("_opp", "opp"):
+        if col in df.columns:
+            pair = ["@".join(sorted((str(t), str(o)))) if t is not None and pd.notna(o) else None
+                    for t, o in zip(team, df[col])]
+            game = game.combine_first(pd.Series(pair, index=df.index, dtype=object))
+    return game.combine_first(team)
+
+
+@lru_cache(maxsize=4096)
+def _block_factor(members: Tuple[Tuple[int, str], ...], config_key: str) -> np.ndarray:
+    """Lower Cholesky factor of one game's correlation matrix (float32), by block shape."""
+    config = json.loads(config_key)
+    same, opp = config.get("same_team", {}), config.get("opponent", {})
+    n = len(members)
+    corr = np.eye(n)
+    for i in range(n):
+        for j in range(i + 1, n):
+            (ti, pi), (tj, pj) = members[i], members[j]
+            corr[i, j] = corr[j, i] = pair_correlation(same if ti == tj else opp, pi, pj)
+    try:
+        return np.linalg.cholesky(corr).astype(np.float32)
+    except np.linalg.LinAlgError:
+        # Hand-set pair values need not be a valid correlation matrix: clip to the nearest PSD one
+        w, v = np.linalg.eigh(corr)
+        corr = (v * np.maximum(w, 1e-6)) @ v.T
+        d = np.sqrt(np.diag(corr))
+        return np.linalg.cholesky(corr / np.outer(d, d)).astype(np.float32)
+
+
+def correlation_blocks(players_df: pd.DataFrame, config: Optional[Dict[str, Any]]) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Block-diagonal correlation of players_df rows: one (row positions, Cholesky
+    factor) pair per game. Players of different games are independent, and a
+    game's factor is cached by its shape (teams x positions), so it is computed
+    once per game structure, not per slate or per run.
+    config: one sport's entry of the `correlation` section of configs/analysis.yaml.
+    """
+    if not config or len(players_df) == 0:
+        return []
+    aliases = {str(k).upper(): str(v).upper() for k, v in (config.get("aliases") or {}).items()}
+    pos_col = "position" if "position" in players_df.columns else "_positions"
+    if pos_col in players_df.columns:
+        positions = [aliases.get(p, p) for p in map(_position, players_df[pos_col])]
+    else:
+        positions = [""] * len(players_df)
+    team = players_df["_team"] if "_team" in players_df.columns else players_df.get("team")
+    teams = [str(t) for t in team] if team is not None else [""] * len(players_df)
+    config_key = json.dumps({k: config.get(k, {}) for k in ("same_team", "opponent")}, sort_keys=True)
+
+    blocks = []
+    games = game_keys(players_df).to_numpy()
+    for game in pd.unique(games[pd.notna(games)]):
+        rows = np.nonzero(games == game)[0]
+        if len(rows) < 2:
+            continue
+        # Canonical member order: team (within the game), then position
+        order = sorted(rows.tolist(), key=lambda r: (teams[r], positions[r], r))
+        team_rank = {t: i for i, t in enumerate(sorted({teams[r] for r in order}))}
+        members = tuple((team_rank[teams[r]], positions[r]) for r in order)
+        blocks.append((np.asarray(order, dtype=np.int64), _block_factor(members, config_key)))
+    return blocks
+
+
+def generate_correlation_matrix(
+    lineup_players: pd.DataFrame, sport: str = "NBA", config: Optional[Dict[str, Any]] = None,
+) -> pd.DataFrame:
+    """
+    Correlation matrix (index=player_id, col=player_id) of a lineup or a small
+    pool, from the same-team / same-game position-pair model of `config` (the
+    sport's `correlation` entry in configs/analysis.yaml). Players in different
+    games are uncorrelated. For simulation over a whole slate use
+    correlation_blocks, which never builds the full n x n matrix.
+    """
+    ids = lineup_players["player_id"].astype(str).tolist() if "player_id" in lineup_players.columns else []
+    corr = np.eye(len(ids))
+    for rows, factor in correlation_blocks(lineup_players.reset_index(drop=True), config):
+        block = factor.astype(float) @ factor.T.astype(float)
+        corr[np.ix_(rows, rows)] = block
+    return pd.DataFrame(corr, index=ids, columns=ids)
+
 
 def calculate_lineup_correlation_score(lineup_slots: list, df_lookup: pd.DataFrame) -> float:
     """
@@ -44,7 +135,7 @@ def calculate_lineup_correlation_score(lineup_slots: list, df_lookup: pd.DataFra
     score = 0.0
     
     # MVP: Just count same-team pairs
-    teams = [pid_to_team.get(str(s["player_id"]), "UNK") for s in lineup_slots]
+    teams = [pid_to_team.get(str(s.get("base_player_id", s["player_id"])), "UNK") for s in lineup_slots]
     valid_teams = [t for t in teams if t != "UNK" and t is not None]
     
     from collections import Counter
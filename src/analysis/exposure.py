@@ -14,7 +14,7 @@ def calculate_exposure(lineups: List[Dict[str, Any]], total_lineups: int) -> pd.
     
     for lu in lineups:
         for p in lu["slots"]:
-            pid = p["player_id"]
+            pid = p.get("base_player_id", p["player_id"])
             counts[pid] = counts.get(pid, 0) + 1
             names[pid] = p["player_name"]
             
@@ -0,0 +1,210 @@
+"""
+Monte Carlo lineup simulation with shared player draws.
+
+One outcome matrix (n_sims x players) is drawn per slate, and every lineup's
+total in every simulation comes out of one product with a sparse
+players x lineups membership matrix. All lineups are scored under the same
+scenarios, so they can be compared draw by draw (Top%), and a player is
+drawn once however many lineups use them. Players of one game can be drawn
+correlated (same team / opponent position pairs, correlation_model.py).
+"""
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .correlation_model import correlation_blocks
+
+try:
+    from scipy import sparse  # type: ignore
+except Exception:  # pragma: no cover - optional dependency
+    sparse = None
+
+DEFAULT_SIMS = 10000
+
+
+@dataclass
+class SlateOutcomes:
+    """Simulated fantasy points: outcomes[s, i] is player ids[i] in simulation s."""
+    ids: List[str]
+    index: Dict[str, int]
+    mu: np.ndarray
+    sigma: np.ndarray
+    outcomes: np.ndarray
+
+    @property
+    def n_sims(self) -> int:
+        return int(self.outcomes.shape[0])
+
+
+def player_distribution(players_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    player_id, mu, sigma per slate player.
+    mu = _proj; sigma = _stddev, or the distribution.py default (25% of proj, at least 1.0).
+    """
+    out = pd.DataFrame({
+        "player_id": players_df["player_id"].astype(str),
+        "mu": pd.to_numeric(players_df["_proj"], errors="coerce").fillna(0.0).clip(lower=0.0),
+    })
+    if "_stddev" in players_df.columns:
+        out["sigma"] = pd.to_numeric(players_df["_stddev"], errors="coerce")
+    else:
+        out["sigma"] = np.nan
+    default = (0.25 * out["mu"]).clip(lower=1.0)
+    out["sigma"] = out["sigma"].fillna(default).clip(lower=0.0)
+    return out.drop_duplicates("player_id", keep="last").reset_index(drop=True)
+
+
+def draw_outcomes(
+    mu: np.ndarray,
+    sigma: np.ndarray,
+    n_sims: int,
+    rng: np.random.Generator,
+    blocks: Optional[List[Tuple[np.ndarray, np.ndarray]]] = None,
+) -> np.ndarray:
+    """
+    Normal draws clipped at 0 (as _backup/simulate_lineups.py), float32.
+    blocks: (columns, Cholesky factor) per game (correlation_model.correlation_blocks);
+    their columns are correlated, everything else is independent.
+    """
+    draws = rng.standard_normal((n_sims, len(mu)), dtype=np.float32)
+    for cols, factor in blocks or ():
+        draws[:, cols] = draws[:, cols] @ factor.T
+    draws *= sigma.astype(np.float32)
+    draws += mu.astype(np.float32)
+    return np.maximum(draws, 0.0, out=draws)
+
+
+def simulate_slate(
+    players_df: pd.DataFrame,
+    n_sims: int = DEFAULT_SIMS,
+    seed: Optional[int] = None,
+    extra: Optional[pd.DataFrame] = None,
+    correlation: Optional[Dict[str, Any]] = None,
+) -> SlateOutcomes:
+    """
+    Draw the outcome matrix for every player of the slate (players_df order),
+    plus `extra` players (player_id, mu, sigma) not in it.
+    correlation: the sport's entry of the `correlation` section of
+    configs/analysis.yaml; players of one game are then correlated by team and
+    position pair (correlation_model.correlation_blocks). Extra players stay independent.
+    Same players + same seed -> same matrix, whichever lineups are scored.
+    """
+    frame = players_df.assign(player_id=players_df["player_id"].astype(str))
+    frame = frame.drop_duplicates("player_id", keep="last").reset_index(drop=True)
+    dist = player_distribution(frame)
+    blocks = correlation_blocks(frame, correlation)
+    if extra is not None and len(extra):
+        dist = pd.concat([dist, extra[~extra["player_id"].isin(dist["player_id"])]], ignore_index=True)
+    mu = dist["mu"].to_numpy(dtype=float)
+    sigma = dist["sigma"].to_numpy(dtype=float)
+    outcomes = draw_outcomes(mu, sigma, int(n_sims), np.random.default_rng(seed), blocks)
+    ids = dist["player_id"].tolist()
+    return SlateOutcomes(ids, {p: i for i, p in enumerate(ids)}, mu, sigma, outcomes)
+
+
+def _missing_players(lineups: List[Dict[str, Any]], players_df: pd.DataFrame) -> pd.DataFrame:
+    """Lineup players absent from players_df, with the lineup's projection and the default sigma."""
+    known = set(players_df["player_id"].astype(str))
+    rows = {}
+    for lu in lineups:
+        for s in lu["slots"]:
+            pid = str(s.get("base_player_id", s["player_id"]))
+            if pid not in known and pid not in rows:
+                mu = max(float(s.get("proj_points", 0.0)), 0.0)
+                rows[pid] = {"player_id": pid, "mu": mu, "sigma": max(0.25 * mu, 1.0)}
+    return pd.DataFrame(list(rows.values()), columns=["player_id", "mu", "sigma"])
+
+
+def membership(
+    lineups: List[Dict[str, Any]],
+    index: Dict[str, int],
+    points_multipliers: Optional[Dict[str, float]] = None,
+) -> tuple:
+    """
+    (player_idx, weights) arrays of shape (lineups, slots): a lineup's total is
+    sum(weights * outcome[player_idx]). weights are the slot points multipliers
+    (e.g. Showdown {"CPT": 1.5}), 1.0 otherwise.
+    """
+    mult = points_multipliers or {}
+    size = max((len(lu["slots"]) for lu in lineups), default=0)
+    idx = np.zeros((len(lineups), size), dtype=np.int64)
+    weights = np.zeros((len(lineups), size), dtype=np.float32)
+    for i, lu in enumerate(lineups):
+        for j, s in enumerate(lu["slots"]):
+            idx[i, j] = index[str(s.get("base_player_id", s["player_id"]))]   # Showdown CPT: the pool id
+            weights[i, j] = float(mult.get(s.get("slot"), 1.0))
+    return idx, weights
+
+
+def lineup_totals(outcomes: np.ndarray, idx: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    """(n_sims, lineups) totals = outcomes @ M with M the sparse players x lineups membership matrix."""
+    n_lineups, size = idx.shape
+    if sparse is not None:
+        m = sparse.csc_matrix(
+            (weights.ravel(), idx.ravel(), np.arange(0, n_lineups * size + 1, size)),
+            shape=(outcomes.shape[1], n_lineups),
+        )
+        return np.asarray(outcomes @ m, dtype=np.float32)
+    # Without scipy: the same product as a gather over the membership lists
+    totals = np.zeros((outcomes.shape[0], n_lineups), dtype=np.float32)
+    for j in range(size):
+        totals += outcomes[:, idx[:, j]] * weights[:, j]
+    return totals
+
+
+def simulate_lineups(
+    lineups: List[Dict[str, Any]],
+    players_df: pd.DataFrame,
+    *,
+    n_sims: int = DEFAULT_SIMS,
+    seed: Optional[int] = None,
+    slate: Optional[SlateOutcomes] = None,
+    points_multipliers: Optional[Dict[str, float]] = None,
+    correlation: Optional[Dict[str, Any]] = None,
+    chunk: int = 1024,
+) -> pd.DataFrame:
+    """
+    Score engine lineups under shared simulated player outcomes.
+    Pass `slate` (simulate_slate) to reuse one outcome matrix across calls;
+    `correlation` is passed to simulate_slate otherwise.
+    Returns DataFrame: [Lineup, Proj, EV, Std, P10, P90, Sharpe, Top%]
+      - Sharpe: EV / Std
+      - Top%: share of simulations in which the lineup is the best of `lineups`
+    """
+    cols = ["Lineup", "Proj", "EV", "Std", "P10", "P90", "Sharpe", "Top%"]
+    if not lineups:
+        return pd.DataFrame(columns=cols)
+    if slate is None:
+        slate = simulate_slate(players_df, n_sims, seed, extra=_missing_players(lineups, players_df),
+                               correlation=correlation)
+    idx, weights = membership(lineups, slate.index, points_multipliers)
+
+    # Lineup chunks bound the (n_sims x chunk) totals held at once
+    n = len(lineups)
+    ev, std, p10, p90 = (np.zeros(n) for _ in range(4))
+    best = np.full(slate.n_sims, -np.inf, dtype=np.float32)
+    best_at = np.zeros(slate.n_sims, dtype=np.int64)
+    for lo in range(0, n, chunk):
+        hi = min(lo + chunk, n)
+        totals = lineup_totals(slate.outcomes, idx[lo:hi], weights[lo:hi])
+        ev[lo:hi] = totals.mean(axis=0)
+        std[lo:hi] = totals.std(axis=0, ddof=1) if slate.n_sims > 1 else 0.0
+        p10[lo:hi], p90[lo:hi] = np.quantile(totals, [0.10, 0.90], axis=0)
+        top = totals.argmax(axis=1)
+        val = totals[np.arange(slate.n_sims), top]
+        better = val > best
+        best[better] = val[better]
+        best_at[better] = top[better] + lo
+
+    return pd.DataFrame({
+        "Lineup": np.arange(1, n + 1),
+        "Proj": [lu["total_proj"] for lu in lineups],
+        "EV": ev,
+        "Std": std,
+        "P10": p10,
+        "P90": p90,
+        "Sharpe": ev / (std + 1e-9),
+        "Top%": 100.0 * np.bincount(best_at, minlength=n) / slate.n_sims,
+    }, columns=cols)
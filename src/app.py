@@ -3,12 +3,14 @@ import pandas as pd
 import yaml
 import os
 import json
+import time
 import matplotlib.pyplot as plt
 from pathlib import Path
 from datetime import datetime
 
 # Optimizer & Source Modules
 from optimizer.engine import OptimizerEngine
+from optimizer.session import OptimizerSession
 from sources.downloader import resolve_downloads_dir, find_latest_file, copy_to_data_auto
 from sources.normalize import normalize_df
 from sources.schema import validate_df
@@ -31,6 +33,7 @@ from analysis.exposure import calculate_exposure
 from analysis.backtest import backtest_lineups
 from analysis.distribution import estimate_distribution_parameters
 from analysis.ev import calculate_ev
+from analysis.simulation import DEFAULT_SIMS, simulate_lineups
 # AI Modules
 from ai.llm_client import OllamaChatClient
 from ai.prompts import make_slate_summary_prompt, make_lineup_critique_prompt, make_strategy_coach_prompt, make_edge_finder_prompt
@@ -67,7 +70,9 @@ source_config, analysis_config = load_configs()
 
 # --- Initialize Engine ---
 try:
-    engine = OptimizerEngine(rules_dir="rules/dk")
+    engine = OptimizerEngine(rules_dir="rules/dk", cache_dir=Path("data") / "cache" / "lineups")
+    # One cache object per browser session, so hit / miss counts survive reruns
+    engine.cache = st.session_state.setdefault("lineup_cache", engine.cache)
     sports_list = engine.list_sports()
 except Exception as e:
     st.error(f"Failed to initialize engine: {e}")
@@ -600,9 +605,14 @@ with tabs[4]:
 
         c1, c2, c3 = st.columns(3)
         with c1:
-            num_lineups = st.number_input("Lineups Count", 1, 150, rules.num_lineups)
+            top_k = st.checkbox("Top-K", help="The best N distinct lineups, best first (ignores Max Overlap)")
+            sim_mode = st.checkbox("Sim-Optimize", disabled=top_k,
+                                   help="One lineup per projection draw from _proj / _stddev, solved in parallel; "
+                                        "the most frequent distinct lineups are kept")
+            num_lineups = st.number_input("Lineups Count", 1, 1000 if top_k else 150, rules.num_lineups)
         with c2:
-            max_overlap = st.number_input("Max Overlap", 0, rules.lineup_size, 6)
+            max_overlap = st.number_input("Max Overlap", 0, rules.lineup_size, 6, disabled=top_k)
+            num_sims = st.number_input("Projection Draws", 1, 10000, 200, 50, disabled=not sim_mode)
         with c3:
             objective_mode = st.selectbox("Objective Mode", ["Cash (Proj)", "GPP (Ceiling Weighted)"])
         
@@ -658,41 +668,186 @@ with tabs[4]:
                     if st.button("🔄 Recalculate EV"):
                         # Re-run EV calc on current_df
                         st.session_state["current_df"] = calculate_ev(st.session_state["current_df"], ev_settings_curr)
+                        session = st.session_state.get("optimizer_session")
+                        if session is not None:
+                            # New EV column: only the objective of the compiled model changes
+                            session.update_objective(players_df=st.session_state["current_df"])
                         st.success("EV Updated!")
                         st.rerun()
 
+            # Turnaround: anytime solves keep their best incumbent when a limit hits
+            st.markdown("---")
+            st.markdown("**Solver Limits**")
+            c_t1, c_t2, c_t3 = st.columns(3)
+            time_limit = c_t1.number_input("Time Limit per Lineup (s)", 0.0, 600.0, 0.0, 1.0, help="0 = no limit")
+            time_budget = c_t2.number_input("Total Time Budget (s)", 0.0, 3600.0, 0.0, 10.0, help="0 = no limit")
+            mip_gap_pct = c_t3.number_input("MIP Gap (%)", 0.0, 10.0, 0.0, 0.1, help="0 = solver default")
+
             # Legacy options
             # use_own = st.checkbox(... ) --> migrated to GPP weights above or kept as separate constraints?
             # Keeping legacy logic in engine, but UI is cleaner if we just use GPP weights for "Chalk Penalty".
             # The user asked for "Max Chalk Count" (hard constraint) AND "EV" (soft objective).
             # We implemented Max Chalk above.
         
+        # Locks / exclusions are column bounds on the session model (no rebuild)
+        name_of = dict(zip(df["player_id"].astype(str), df["player_name"].astype(str)))
+        c_lock, c_excl = st.columns(2)
+        lock_ids = c_lock.multiselect("Lock Players", list(name_of), format_func=lambda pid: name_of[pid])
+        exclude_ids = c_excl.multiselect("Exclude Players", [p for p in name_of if p not in lock_ids],
+                                         format_func=lambda pid: name_of[pid])
+
+        # Portfolio exposure: enforced while the lineups are generated
+        with st.expander("Portfolio Exposure"):
+            c_emin, c_emax, c_team = st.columns(3)
+            min_exp_ids = c_emin.multiselect("Min Exposure Players", [p for p in name_of if p not in exclude_ids],
+                                             format_func=lambda pid: name_of[pid])
+            min_exp_pct = c_emin.slider("Min Exposure (%)", 0, 100, 30, 5)
+            max_exp_ids = c_emax.multiselect("Max Exposure Players", [p for p in name_of if p not in min_exp_ids],
+                                             format_func=lambda pid: name_of[pid])
+            max_exp_pct = c_emax.slider("Max Exposure (%)", 0, 100, 40, 5)
+            team_ids = sorted(df["_team"].dropna().astype(str).unique()) if "_team" in df.columns else []
+            max_exp_teams = c_team.multiselect("Max Exposure Teams", team_ids)
+            team_exp_pct = c_team.slider("Team Max Exposure (%)", 0, 100, 50, 5)
+
+        with st.expander("Stacks"):
+            file_stacks = [f"{r.name} ({r.type}, {r.min_players}+)" for r in getattr(rules, "stacks", ())]
+            use_file_stacks = st.checkbox(f"Rules file stacks: {', '.join(file_stacks) or 'none'}", value=True,
+                                          disabled=not file_stacks)
+            c_tstack, c_gstack = st.columns(2)
+            team_stack = c_tstack.number_input("Min Players From One Team", 0, 8, 0,
+                                               help="0 = off. Adds a team stack rule.")
+            game_stack = c_gstack.number_input("Min Players From One Game", 0, 10, 0,
+                                               help="0 = off. Needs opponent / Game Info data.")
+            slot_positions = sorted(set().union(*(sr.eligible for sr in rules.slots)))
+            c_side, c_vs = st.columns(2)
+            no_opp_side = c_side.multiselect("No Opponents Of", slot_positions,
+                                             default=sorted(set().union(*(r.positions for r in rules.no_opponents))))
+            no_opp_vs = c_vs.multiselect("Excluded Opponent Positions", slot_positions,
+                                         default=sorted(set().union(*(r.versus for r in rules.no_opponents))),
+                                         help="Empty = every opponent. Needs opponent / Game Info data.")
+
+        if st.session_state.pop("optimizer_running", False):
+            # A rerun while a run was in progress means it was cancelled (Stop or any other widget)
+            partial = st.session_state.get("generated_lineups", [])
+            st.warning(f"Optimization stopped after {len(partial)} lineup(s). Partial results are kept in Results.")
+
         if st.button("🚀 Run Optimizer", type="primary"):
-            with st.spinner("Optimizing..."):
-                try:
-                    # Prepare Settings
-                    settings = {
-                        "num_lineups": num_lineups,
-                        "max_overlap": max_overlap,
-                        "objective_mode": objective_mode,
-                        "max_chalk_count": max_chalk if max_chalk > 0 else None,
-                        "min_total_ceiling": min_ceil_val if min_ceil_val > 0 else None,
-                    }
-                    if total_own_cap > 0:
-                        settings["total_ownership_cap"] = total_own_cap
-                    
-                    # Run
-                    lineups = engine.optimize_df(df, rules, settings=settings)
-                    
-                    if not lineups:
-                        st.error("No lineups generated (Infeasible). Check constraints.")
+            try:
+                # Prepare Settings
+                settings = {
+                    "num_lineups": num_lineups,
+                    "max_overlap": max_overlap,
+                    "objective_mode": objective_mode,
+                    "max_chalk_count": max_chalk if max_chalk > 0 else None,
+                    "min_total_ceiling": min_ceil_val if min_ceil_val > 0 else None,
+                    # Explicit None: the session keeps settings that are left out
+                    "total_ownership_cap": total_own_cap if total_own_cap > 0 else None,
+                    "time_limit": time_limit if time_limit > 0 else None,
+                    "time_budget": time_budget if time_budget > 0 else None,
+                    "mip_gap": mip_gap_pct / 100 if mip_gap_pct > 0 else None,
+                }
+                stacks = [r for r in getattr(rules, "stacks", ()) if use_file_stacks]
+                if team_stack > 0:
+                    stacks.append({"name": "team", "type": "team", "min_players": int(team_stack)})
+                if game_stack > 0:
+                    stacks.append({"name": "game", "type": "game", "min_players": int(game_stack)})
+                settings["stacks"] = stacks
+                settings["no_opponents"] = (
+                    [{"name": "ui", "positions": no_opp_side, "versus": no_opp_vs}] if no_opp_side else []
+                )
+                if top_k:
+                    settings["top_k"] = True
+                elif not sim_mode:
+                    settings.update(
+                        min_exposure={pid: min_exp_pct / 100 for pid in min_exp_ids} or None,
+                        max_exposure={pid: max_exp_pct / 100 for pid in max_exp_ids} or None,
+                        team_max_exposure={t: team_exp_pct / 100 for t in max_exp_teams} or None,
+                    )
+
+                # Run: lineups are rendered as they are solved. Clicking Stop reruns the
+                # script, which interrupts this loop; finished lineups stay in session_state.
+                st.button("⏹ Stop", help="Cancel the run and keep the lineups generated so far")
+                progress = st.progress(0.0, text="Optimizing...")
+                live_table = st.empty()
+                lineups = []
+                st.session_state["generated_lineups"] = lineups
+                st.session_state["optimizer_running"] = True
+                if sim_mode:
+                    # Draws are solved across a process pool; the lineups arrive together, most frequent first
+                    sim_df = df if "_stddev" in df.columns else estimate_distribution_parameters(df)
+                    settings.update(lock_player_ids=lock_ids, exclude_player_ids=exclude_ids,
+                                    num_sims=num_sims, max_lineups=num_lineups)
+                    stream = iter(engine.sim_optimize(sim_df, rules, settings=settings))
+                    run_engine = engine
+                elif top_k:
+                    settings.update(lock_player_ids=lock_ids, exclude_player_ids=exclude_ids)
+                    stream = engine.iter_optimize(df, rules, settings=settings)
+                    run_engine = engine
+                else:
+                    # Keep the compiled model between runs; it is rebuilt only for a new slate / sport
+                    session = st.session_state.get("optimizer_session")
+                    if session is None or session.players_df is not df or session.rules.sport != rules.sport:
+                        session = OptimizerSession(engine, df, rules)
+                        st.session_state["optimizer_session"] = session
+                    stream = session.iter_resolve(**settings, lock_player_ids=lock_ids, exclude_player_ids=exclude_ids)
+                    run_engine = session.engine   # holds last_diagnosis / last_exposure of the run
+                t_run = time.perf_counter()
+                for lu in stream:
+                    lineups.append(lu)
+                    meta = lu["meta"]
+                    progress.progress(
+                        len(lineups) / num_lineups,
+                        text=f"Lineup {len(lineups)}/{num_lineups} ({meta['elapsed_s']:.1f}s elapsed, "
+                             f"{meta['lineups_per_s']:.1f} lineups/s)",
+                    )
+                    live_table.dataframe(pd.DataFrame([
+                        {
+                            "Rank": m["meta"]["lineup_index"],
+                            "Total Proj": round(m["total_proj"], 2),
+                            "Total Salary": m["total_salary"],
+                            "Solve (s)": round(m["meta"]["solve_s"], 2),
+                            "Optimal": "yes" if m["meta"]["optimal"] else f"gap {100 * (m['meta']['mip_gap'] or 0):.2f}%",
+                            "Players": ", ".join(s["player_name"] for s in m["slots"]),
+                        }
+                        for m in lineups
+                    ]))
+                st.session_state["optimizer_running"] = False
+                st.session_state["exposure_report"] = run_engine.last_exposure
+
+                if not lineups:
+                    progress.empty()
+                    diagnosis = run_engine.last_diagnosis
+                    if diagnosis is not None and not diagnosis.feasible:
+                        st.error("No lineups generated (Infeasible).")
+                        for reason in diagnosis.reasons:
+                            involved = f" Constraints: {', '.join(reason.constraints)}." if reason.constraints else ""
+                            st.markdown(f"- **{reason.code}**: {reason.message}{involved}")
                     else:
-                        st.session_state["generated_lineups"] = lineups
-                        st.success(f"Generated {len(lineups)} Lineups!")
-                        
-                except Exception as e:
-                    st.error(f"Optimization Error: {e}")
-                    st.exception(e)
+                        st.error("No lineups generated (Infeasible). Check constraints.")
+                else:
+                    if len(lineups) < num_lineups and time_budget > 0 and time.perf_counter() - t_run >= time_budget:
+                        st.warning(f"Time budget reached after {len(lineups)} of {num_lineups} lineups.")
+                    elif sim_mode:
+                        meta = lineups[0]["meta"]
+                        st.info(f"{len(lineups)} distinct lineups kept from {meta['draws']} draws "
+                                f"({meta['draws_per_s']:.1f} draws/s on {meta['workers']} worker(s)).")
+                    elif len(lineups) < num_lineups:
+                        st.warning(f"Only {len(lineups)} of {num_lineups} lineups are feasible with these constraints.")
+                        if run_engine.last_diagnosis is not None and run_engine.last_diagnosis.reasons:
+                            st.caption("Conflict: " + run_engine.last_diagnosis.summary())
+                    st.success(f"Generated {len(lineups)} Lineups!")
+                    cache_meta = lineups[0]["meta"].get("cache")
+                    if cache_meta is not None and cache_meta["hit"]:
+                        st.caption(f"Loaded from the lineup cache (same inputs as an earlier run; "
+                                   f"{cache_meta['hits']} hit(s) / {cache_meta['misses']} miss(es) this session).")
+                    not_proven = sum(not lu["meta"]["optimal"] for lu in lineups)
+                    if not_proven:
+                        st.info(f"{not_proven} lineup(s) hit the time limit and are the best found, not proven optimal.")
+
+            except Exception as e:
+                st.session_state["optimizer_running"] = False
+                st.error(f"Optimization Error: {e}")
+                st.exception(e)
 
 # ==========================================
 # TAB 6: RESULTS
@@ -721,8 +876,8 @@ with tabs[5]:
             if df is not None:
                 pid_to_own = dict(zip(df["player_id"].astype(str), df["_ownership"]))
                 
-                total_own = sum(pid_to_own.get(str(s["player_id"]), 0) for s in lu["slots"])
-                chalk_cnt = sum(1 for s in lu["slots"] if pid_to_own.get(str(s["player_id"]), 0) > 0.20)
+                total_own = sum(pid_to_own.get(str(s.get("base_player_id", s["player_id"])), 0) for s in lu["slots"])
+                chalk_cnt = sum(1 for s in lu["slots"] if pid_to_own.get(str(s.get("base_player_id", s["player_id"])), 0) > 0.20)
                 
             rows.append({
                 "Rank": i,
@@ -737,13 +892,26 @@ with tabs[5]:
         st.table(pd.DataFrame(rows).head(20)) 
         
         # Visuals for Results
-        if lineups:
+        if lineups and df is not None:
             st.markdown("#### Lineup Performance Metrics")
-            l_df = pd.DataFrame(lineups)
-            # engine lineups might not have ceiling sum in dict, only total_proj.
-            # But we can calculate it if we iterate slots?
-            # Ideally calculate in loop above and store in 'rows'.
-            # For now just show standard results.
+            sim_col1, sim_col2 = st.columns([1, 3])
+            with sim_col1:
+                n_sims = st.number_input("Simulations", 1000, 100000, DEFAULT_SIMS, step=1000)
+                sim_seed = st.number_input("Sim Seed", 0, 2**31 - 1, 2025)
+                sort_by = st.selectbox("Sort By", ["EV", "P90", "Sharpe", "Top%"])
+                corr_cfg = analysis_config.get("correlation", {}).get(rules.sport)
+                correlated = st.checkbox("Correlated (same game)", value=corr_cfg is not None,
+                                         disabled=corr_cfg is None,
+                                         help="Team / opponent position-pair correlations from configs/analysis.yaml")
+            # One shared outcome matrix for every lineup (analysis/simulation.py)
+            sim_df = simulate_lineups(
+                lineups, df, n_sims=int(n_sims), seed=int(sim_seed),
+                points_multipliers={sr.name: sr.points_multiplier for sr in rules.slots},
+                correlation=corr_cfg if correlated else None,
+            )
+            with sim_col2:
+                st.dataframe(sim_df.sort_values(sort_by, ascending=False).round(2), hide_index=True)
+            st.caption("Top%: share of simulations in which the lineup scores highest of this set.")
         
         # 2. Exposure Report
         st.markdown("### Exposure Report")
@@ -762,6 +930,16 @@ with tabs[5]:
                 ax.invert_yaxis()  # Top on top
                 st.pyplot(fig)
 
+        exposure_report = st.session_state.get("exposure_report")
+        if exposure_report:
+            st.markdown("#### Requested vs Achieved Exposure")
+            report_df = pd.DataFrame(exposure_report)
+            for col in ("min_exposure", "max_exposure", "exposure"):
+                report_df[col] = (100 * report_df[col]).round(1)
+            st.dataframe(report_df.rename(columns={
+                "min_exposure": "Min %", "max_exposure": "Max %", "exposure": "Achieved %", "ok": "Met",
+            }))
+
         # 3. Export
         st.markdown("### Export")
         import_df = build_dk_import_csv(lineups, rules)
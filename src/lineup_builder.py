@@ -7,6 +7,10 @@ r"""DraftKings MLB lineup builder — minimal reliable version
   必須列: Position, Name, ID, Roster Position, Salary, TeamAbbrev, AvgPointsPerGame
 使い方:
   python -m src.lineup_builder --in ".\data\dk_salaries.csv" --rules "rules/dk/mlb.yaml" --out "output/MLB/submit_lineups.csv"
+フィールドシミュレーション（大量のランダムラインナップ）:
+  arrays = PoolArrays(pool, rules["expanded_slots"])
+  idx, stats = sample_lineups(arrays, 100_000, cap, max_team, min_teams, seed=1)   # (本数, スロット数)
+  stats["acceptance"]  # 試行のうち有効だった割合
 """
 
 from __future__ import annotations
@@ -14,12 +18,19 @@ from __future__ import annotations
 import argparse
 import os
 import random
+import time
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 
+import numpy as np
 import pandas as pd
 import yaml
 
+try:  # python -m src.lineup_builder
+    from .optimizer.signature import LineupIndex
+except ImportError:  # src を sys.path に入れた場合（テスト）
+    from optimizer.signature import LineupIndex
+
 
 # =============================================================================
 # 1) フレキシブルCSVローダ（インライン化：import問題を完全回避）
@@ -133,117 +144,205 @@ def load_pool(csv_path: str, proj_col: str, sport: str) -> pd.DataFrame:
 
 
 # =============================================================================
-# 4) ラインナップ構築（シンプル貪欲）
+# 4) ラインナップ構築（配列ベースのランダム貪欲）
 # =============================================================================
-def build_one(pool: pd.DataFrame, expanded_slots: List[str], cap: int,
-              max_team: int, min_teams: int, rng: random.Random) -> Optional[List[dict]]:
-    # スロット別候補
-    by_pos: Dict[str, pd.DataFrame] = {}
-    for rp in sorted(pool["Roster Position"].unique()):
-        by_pos[rp] = pool[pool["Roster Position"] == rp].copy()
-
-    all_df = pool.copy()
-    chosen: List[dict] = []
-    used = set()
-    team_cnt: Dict[str, int] = {}
-    salary = 0
-
-    order = expanded_slots[:]
-    rng.shuffle(order)
-
-    for slot in order:
-                # ❶ 候補抽出（UTIL は全員、それ以外は該当ポジ）
-        cands = all_df if slot == "UTIL" else by_pos.get(slot, pd.DataFrame())
-        if cands.empty:
-            return None
-
-        # 未使用のみ
-        cands = cands[~cands["ID"].isin(used)].copy()
-        if cands.empty:
-            return None
-
-        # ❷ まず「残りサラリー」「チーム上限」で前処理フィルタ
-        remaining = cap - salary
-        cands = cands[cands["Salary"] <= remaining]
-        if cands.empty:
-            return None
-
-        if team_cnt:
-            full_teams = [t for (t, cnt) in team_cnt.items() if cnt >= max_team]
-            if full_teams:
-                cands = cands[~cands["TeamAbbrev"].isin(full_teams)]
-                if cands.empty:
-                    return None
-
-        # ❸ スコアで並べる（純投影と値段比のハイブリッド）
-        cands = cands.assign(_ratio=cands["__PROJ__"] / cands["Salary"].clip(lower=1))
-        cands = cands.sort_values(["__PROJ__", "_ratio"], ascending=False)
-
-        # ❹ 上位を広めに見てランダムに試す
-        head = min(1000, len(cands))          # ← 200 → 1000 に拡張
-        idxs = list(range(head))
-        rng.shuffle(idxs)
-
-        picked = None
-        for i in idxs:
-            row = cands.iloc[i]
-            team = str(row["TeamAbbrev"])
-            sal  = int(row["Salary"])
-            if salary + sal > cap:
-                continue
-            if team_cnt.get(team, 0) + 1 > max_team:
-                continue
-            picked = {
+# load_pool の DataFrame を選手単位の NumPy 配列に一度だけ変換し、スロットごとの
+# 候補インデックス（投影→値段比の降順、上位 head 人）を前計算する。
+# 生成は B 本ずつのバッチ: 使用済み選手 (B, 選手数)・チーム人数 (B, チーム数)・
+# 残りサラリー (B,) を配列で持ち、スロットごとに「条件を満たす候補から一様ランダム」
+# を全ラインナップ同時に選ぶ。1 本ずつの build_one と同じ選び方で、
+# フィールドシミュレーション用に毎分 10 万本以上を生成できる。
+#
+# スロットの適格: "UTIL" は全員、それ以外はスロット名を "/" で分けた
+# ポジションのいずれか（"C/1B" → C または 1B）。
+
+class PoolArrays:
+    """選手単位の配列とスロット別の候補インデックス（build_batch の入力）"""
+
+    def __init__(self, pool: pd.DataFrame, expanded_slots: List[str], head: int = 1000) -> None:
+        ids = pool["ID"].astype(str)
+        players = pool.drop_duplicates("ID").reset_index(drop=True)
+        self.ids = players["ID"].astype(str).to_numpy()
+        self.names = players["Name"].astype(str).to_numpy()
+        self.salary = pd.to_numeric(players["Salary"], errors="coerce").fillna(0).to_numpy(dtype=np.int64)
+        self.proj = pd.to_numeric(players["__PROJ__"], errors="coerce").fillna(0.0).to_numpy(dtype=float)
+        self.team_code, teams = pd.factorize(players["TeamAbbrev"].astype(str))
+        self.teams = [str(t) for t in teams]
+        self.slots = list(expanded_slots)
+
+        # 選手 → ロスターポジション集合（load_pool は複合ポジを行展開済み）
+        index_of = pd.Series(np.arange(len(players)), index=self.ids)
+        pos_player = index_of[ids].to_numpy()
+        ratio = self.proj / np.maximum(self.salary, 1)
+        order = np.lexsort((-ratio, -self.proj))          # 投影 → 値段比の降順
+        self.cands: Dict[str, np.ndarray] = {}
+        for slot in dict.fromkeys(self.slots):
+            if slot == "UTIL":
+                elig = np.ones(len(players), dtype=bool)
+            else:
+                toks = {t.strip() for t in slot.split("/") if t.strip()}
+                elig = np.zeros(len(players), dtype=bool)
+                elig[pos_player[pool["Roster Position"].isin(toks).to_numpy()]] = True
+            self.cands[slot] = order[elig[order]][:head]
+        # 先読み用: スロットごとの安い順の候補（使用済みは最大 スロット数-1 人なので +1 人分）
+        # と最大投影
+        self.cheap: Dict[str, np.ndarray] = {}
+        self.max_proj: Dict[str, float] = {}
+        for slot, cand in self.cands.items():
+            self.cheap[slot] = cand[np.argsort(self.salary[cand], kind="stable")][: len(self.slots) + 1]
+            self.max_proj[slot] = float(self.proj[cand].max()) if len(cand) else 0.0
+
+    @property
+    def size(self) -> int:
+        return len(self.ids)
+
+    def lineup(self, row: np.ndarray) -> List[dict]:
+        """選手インデックスの行（expanded_slots 順）→ build_one と同じ dict のリスト"""
+        return [
+            {
                 "Slot": slot,
-                "Name": str(row["Name"]),
-                "ID": str(row["ID"]),
-                "TeamAbbrev": team,
-                "Salary": sal,
-                "Proj": float(row["__PROJ__"]),
+                "Name": str(self.names[p]),
+                "ID": str(self.ids[p]),
+                "TeamAbbrev": self.teams[self.team_code[p]],
+                "Salary": int(self.salary[p]),
+                "Proj": float(self.proj[p]),
             }
-            break
+            for slot, p in zip(self.slots, row.tolist())
+        ]
+
+
+def build_batch(arrays: PoolArrays, batch: int, cap: int, max_team: int, min_teams: int,
+                rng: np.random.Generator, lookahead: bool = True,
+                min_proj: Optional[float] = None) -> np.ndarray:
+    """
+    ランダムラインナップを batch 本試し、有効なものだけ返す。
+    戻り値: (有効本数, スロット数) の選手インデックス（列は expanded_slots 順）
+
+    lookahead=True: 各ステップで「残りスロットを埋められる」候補だけから引く
+      - サラリー: 残りスロットごとの最安の空き候補（未使用・チーム上限未満）の合計を
+        残しておく（各スロットの安い順 cheap リストの先頭から探す）
+      - min_teams: 残りスロットで新しいチームを足しても届かない候補は除く
+      - min_proj（任意）: 残りスロットの最大投影の合計を足しても届かない候補は除く
+    下限・上限は重複選手を無視した見積もりなので、まれに最後で弾かれる。
+    """
+    n_slots = len(arrays.slots)
+    rows = np.arange(batch)
+    used = np.zeros((batch, arrays.size), dtype=bool)
+    team_cnt = np.zeros((batch, len(arrays.teams)), dtype=np.int64)
+    n_teams = np.zeros(batch, dtype=np.int64)
+    remaining = np.full(batch, int(cap), dtype=np.int64)
+    proj = np.zeros(batch)
+    alive = np.ones(batch, dtype=bool)
+    out = np.full((batch, n_slots), -1, dtype=np.int64)
+
+    order = rng.permutation(n_slots)                   # 埋める順（バッチ内で共通）
+    for k, s in enumerate(order):
+        cand = arrays.cands[arrays.slots[s]]
+        if len(cand) == 0:
+            return out[:0]
+        # 未使用・残りサラリー内・チーム上限未満の候補から一様ランダム
+        budget = remaining
+        if lookahead:
+            budget = remaining - sum(_min_open_salary(arrays, arrays.slots[r], used, team_cnt, max_team)
+                                     for r in order[k + 1:])
+        ok = ~used[:, cand]
+        ok &= arrays.salary[cand][None, :] <= budget[:, None]
+        ok &= team_cnt[:, arrays.team_code[cand]] < max_team
+        if lookahead:
+            left = n_slots - k - 1
+            new_team = team_cnt[:, arrays.team_code[cand]] == 0
+            ok &= (n_teams[:, None] + new_team + left) >= min_teams
+            if min_proj is not None:
+                best_after = sum(arrays.max_proj[arrays.slots[r]] for r in order[k + 1:])
+                ok &= (proj[:, None] + arrays.proj[cand][None, :] + best_after) >= min_proj
+        keys = np.where(ok, rng.random(ok.shape), -1.0)
+        pick = keys.argmax(axis=1)
+        alive &= ok[rows, pick]
+        p = cand[pick]
+        out[:, s] = p
+        used[rows, p] = True
+        n_teams += team_cnt[rows, arrays.team_code[p]] == 0
+        team_cnt[rows, arrays.team_code[p]] += 1
+        remaining -= arrays.salary[p]
+        proj += arrays.proj[p]
+
+    alive &= n_teams >= min_teams
+    if min_proj is not None:
+        alive &= proj >= min_proj
+    return out[alive]
+
+
+def _min_open_salary(arrays: PoolArrays, slot: str, used: np.ndarray, team_cnt: np.ndarray,
+                     max_team: int) -> np.ndarray:
+    """スロットの最安の空き候補のサラリー（ラインナップごと）。cheap が全部埋まっていれば末尾の値（下限）"""
+    cheap = arrays.cheap[slot]
+    free = ~used[:, cheap] & (team_cnt[:, arrays.team_code[cheap]] < max_team)
+    first = np.where(free.any(axis=1), free.argmax(axis=1), len(cheap) - 1)
+    return arrays.salary[cheap][first]
+
+
+def sample_lineups(arrays: PoolArrays, n: int, cap: int, max_team: int, min_teams: int,
+                   seed: Optional[int] = None, batch: int = 2048, max_tries: Optional[int] = None,
+                   lookahead: bool = True, min_proj: Optional[float] = None,
+                   unique: bool = False) -> Tuple[np.ndarray, Dict[str, float]]:
+    """
+    有効なランダムラインナップを n 本（フィールドシミュレーション用、重複あり）と統計。
+    unique=True なら同じ選手セットを捨てる（optimizer/signature.py の LineupIndex、100万本で約16MB）。
+    max_tries（既定 max(4000, 800*n)）本試して足りなければ、それまでの分を返す。
+    統計: {"tries", "valid", "duplicates", "acceptance", "seconds", "per_minute"}
+    """
+    t0 = time.perf_counter()
+    rng = np.random.default_rng(seed)
+    max_tries = max(4000, 800 * n) if max_tries is None else max_tries
+    index = LineupIndex(len(arrays.ids), len(arrays.slots), capacity=n) if unique else None
+    found: List[np.ndarray] = []
+    have = tries = valid = 0
+    while have < n and tries < max_tries:
+        size = min(batch, max_tries - tries)
+        got = build_batch(arrays, size, cap, max_team, min_teams, rng, lookahead=lookahead, min_proj=min_proj)
+        tries += size
+        valid += len(got)
+        if index is not None:
+            got = got[index.add(got)]
+        found.append(got)
+        have += len(got)
+    lineups = np.concatenate(found)[:n] if found else np.zeros((0, len(arrays.slots)), dtype=np.int64)
+    seconds = time.perf_counter() - t0
+    stats = {
+        "tries": tries,
+        "valid": valid,
+        "duplicates": valid - have,
+        "acceptance": valid / tries if tries else 0.0,
+        "seconds": seconds,
+        "per_minute": 60.0 * len(lineups) / max(seconds, 1e-9),
+    }
+    return lineups, stats
 
-        if picked is None:
-            return None
 
+def random_lineups(arrays: PoolArrays, n: int, cap: int, max_team: int, min_teams: int,
+                   seed: Optional[int] = None, batch: int = 2048, max_tries: Optional[int] = None,
+                   lookahead: bool = True, min_proj: Optional[float] = None, unique: bool = False) -> np.ndarray:
+    """sample_lineups のラインナップだけ"""
+    return sample_lineups(arrays, n, cap, max_team, min_teams, seed=seed, batch=batch,
+                          max_tries=max_tries, lookahead=lookahead, min_proj=min_proj, unique=unique)[0]
 
-        chosen.append(picked)
-        used.add(picked["ID"])
-        team_cnt[picked["TeamAbbrev"]] = team_cnt.get(picked["TeamAbbrev"], 0) + 1
-        salary += picked["Salary"]
 
-    if len({c["TeamAbbrev"] for c in chosen}) < min_teams:
-        return None
-    return chosen
+def build_one(pool: pd.DataFrame | PoolArrays, expanded_slots: List[str], cap: int,
+              max_team: int, min_teams: int, rng: random.Random) -> Optional[List[dict]]:
+    arrays = pool if isinstance(pool, PoolArrays) else PoolArrays(pool, expanded_slots)
+    got = build_batch(arrays, 1, cap, max_team, min_teams, np.random.default_rng(rng.getrandbits(64)))
+    return arrays.lineup(got[0]) if len(got) else None
 
 
 def build_many(pool: pd.DataFrame, rules: dict, seed: Optional[int]) -> List[List[dict]]:
-    rng = random.Random(seed)
     want = rules["num_lineups"]
-    cap = rules["salary_cap"]
-    max_team = rules["max_from_team"]
-    min_teams = rules["min_teams"]
-    slots = rules["expanded_slots"]
-
-    outs: List[List[dict]] = []
-    best: Optional[List[dict]] = None
-    best_proj = -1.0
-
-    for _ in range(max(4000, 800 * want)):
-        lu = build_one(pool, slots, cap, max_team, min_teams, rng)
-        if lu:
-            outs.append(lu)
-            s = sum(p["Proj"] for p in lu)
-            if s > best_proj:
-                best_proj, best = s, lu
-            if len(outs) >= want:
-                break
-
-    if not outs and best:
-        outs = [best]
-    if not outs:
+    arrays = PoolArrays(pool, rules["expanded_slots"])
+    found, stats = sample_lineups(arrays, want, rules["salary_cap"], rules["max_from_team"], rules["min_teams"],
+                                  seed=seed, batch=min(2048, max(64, 8 * want)), unique=True)
+    print(f"[INFO] 採用率 {100 * stats['acceptance']:.1f}% ({stats['valid']}/{stats['tries']}), 重複除外 {stats['duplicates']}")
+    if not len(found):
         raise ValueError("ラインナップを生成できませんでした。ルール/入力を確認してください。")
-    return outs
+    return [arrays.lineup(row) for row in found]
 
 
 # =============================================================================
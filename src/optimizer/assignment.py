@@ -0,0 +1,111 @@
+# src/optimizer/assignment.py
+# Bipartite slot assignment for the aggregated formulation
+#
+# The aggregated model picks a set of players (one binary per player) and only
+# guarantees, through Hall-type coverage rows, that some valid slot assignment
+# exists. This module finds a concrete one with augmenting paths (Kuhn's
+# algorithm). Lineups have <= 10 slots, so this runs in microseconds.
+#
+# min_cost_assignment fills every slot at minimum total cost (Hungarian method,
+# O(slots^2 * players) with NumPy over players). The feasibility checks use it
+# for bounds such as the cheapest valid roster.
+#
+from __future__ import annotations
+
+from typing import List, Optional
+
+import numpy as np
+
+
+def assign_slots(elig: np.ndarray) -> Optional[List[int]]:
+    """
+    elig: bool matrix (chosen players x slot instances).
+    Returns player row index per slot instance (YAML order), or None if no
+    perfect matching exists.
+    """
+    n_players, n_slots = elig.shape
+    if n_players < n_slots:
+        return None
+
+    # Try the least flexible players first so specific slots are not taken by
+    # players that could only fill UTIL/FLEX.
+    flex = elig.sum(axis=1)
+    slot_cands = [
+        sorted(np.nonzero(elig[:, s])[0].tolist(), key=lambda p: (flex[p], p)) for s in range(n_slots)
+    ]
+    player_slot = [-1] * n_players
+    slot_player = [-1] * n_slots
+
+    def augment(s: int, seen: List[bool]) -> bool:
+        for p in slot_cands[s]:
+            if seen[p]:
+                continue
+            seen[p] = True
+            if player_slot[p] < 0 or augment(player_slot[p], seen):
+                player_slot[p] = s
+                slot_player[s] = p
+                return True
+        return False
+
+    for s in range(n_slots):
+        if not augment(s, [False] * n_players):
+            return None
+    return slot_player
+
+
+def min_cost_assignment(cost: np.ndarray) -> Optional[np.ndarray]:
+    """
+    cost: slot instances x players, np.inf where a player cannot fill the slot.
+    Returns the player index per slot of a minimum-cost assignment (distinct
+    players), or None if the slots cannot all be filled.
+    """
+    n_slots, n_players = cost.shape
+    if n_slots > n_players:
+        return None
+    finite = np.isfinite(cost)
+    if not finite.any(axis=1).all():
+        return None
+    # Forbidden pairs get a cost no complete assignment can afford
+    span = float(np.abs(cost[finite]).max()) if finite.any() else 0.0
+    forbidden = (span + 1.0) * (n_slots + 1)
+    c = np.where(finite, cost, forbidden)
+
+    # e-maxx Hungarian with 1-based potentials; column 0 is the virtual start
+    u = np.zeros(n_slots + 1)
+    v = np.zeros(n_players + 1)
+    owner = np.zeros(n_players + 1, dtype=int)   # slot (1-based) holding each player
+    way = np.zeros(n_players + 1, dtype=int)
+    for i in range(1, n_slots + 1):
+        owner[0] = i
+        j0 = 0
+        minv = np.full(n_players + 1, np.inf)
+        used = np.zeros(n_players + 1, dtype=bool)
+        while True:
+            used[j0] = True
+            i0 = owner[j0]
+            cur = c[i0 - 1] - u[i0] - v[1:]
+            free = ~used[1:]
+            better = free & (cur < minv[1:])
+            minv[1:][better] = cur[better]
+            way[1:][better] = j0
+            cand = np.where(free, minv[1:], np.inf)
+            j1 = int(np.argmin(cand)) + 1
+            delta = cand[j1 - 1]
+            done = np.nonzero(used)[0]
+            u[owner[done]] += delta
+            v[done] -= delta
+            minv[1:][free] -= delta
+            j0 = j1
+            if owner[j0] == 0:
+                break
+        while j0:
+            j1 = way[j0]
+            owner[j0] = owner[j1]
+            j0 = j1
+
+    players = np.zeros(n_slots, dtype=int)
+    cols = np.nonzero(owner[1:])[0]
+    players[owner[1:][cols] - 1] = cols
+    if not finite[np.arange(n_slots), players].all():
+        return None
+    return players
@@ -0,0 +1,281 @@
+# src/optimizer/benchmark.py
+# Benchmarks for OptimizerEngine on the bundled slates
+#
+# Usage:
+#   python -m src.optimizer.benchmark                 # all slates, all installed solvers
+#   python -m src.optimizer.benchmark --lineups 50 --solvers cbc highs
+#
+# Sections:
+#   - Model build:   vectorized CSR assembly time and model size, before / after dominance presolve
+#   - Formulations:  per-instance (player x slot) vs slot-type aggregated model
+#   - Solvers:       wall / solve time per backend
+#   - Warm start:    B&B nodes and solve time, cold vs warm-started from the repaired previous lineup
+#   - Top-K:         lineups/s as K grows, top_k partitioning vs max_overlap = lineup_size - 1 cuts
+#   - Sim-optimize:  draws/s of sim_optimize (one compiled model per worker) vs
+#                    optimize_parallel randomized tasks (one model build per task)
+#
+# Slates:
+#   - NBA: data/sample_nba.csv (25 players)
+#   - MLB: data/raw/DKSalaries.csv (746-row DK salary export)
+#
+from __future__ import annotations
+
+import argparse
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .engine import DkRules, OptimizerEngine
+from .model import FORMULATIONS, PlayerPool, build_lineup_model, expand_slots
+from .presolve import presolve_pool
+from .solvers import available_solvers
+
+SLATES: List[Tuple[str, str]] = [
+    ("NBA", "data/sample_nba.csv"),
+    ("MLB", "data/raw/DKSalaries.csv"),
+]
+
+
+def load_slate(engine: OptimizerEngine, sport: str, csv_path: str) -> Tuple[DkRules, pd.DataFrame]:
+    rules = engine.load_rules(sport)
+    df = engine.load_players_df(csv_path, rules)
+    return rules, df
+
+
+def bench_build(rules: DkRules, df: pd.DataFrame, *, repeats: int = 20) -> Dict[str, Any]:
+    """Time the vectorized model build (pool arrays + CSR assembly) for one slate."""
+    t0 = time.perf_counter()
+    for _ in range(repeats):
+        pool = PlayerPool.from_df(df)
+        model = build_lineup_model(pool, expand_slots(rules.slots), rules, {})
+    per_build = (time.perf_counter() - t0) / repeats
+
+    slot_instances = expand_slots(rules.slots)
+    pre = presolve_pool(pool, slot_instances, rules, {})
+    reduced = build_lineup_model(pool.subset(pre.keep), slot_instances, rules, {})
+    return {
+        "sport": rules.sport,
+        "players": pool.size,
+        "cols": model.n_cols,
+        "rows": model.n_rows,
+        "nnz": len(model.data),
+        "build_ms": round(1000 * per_build, 2),
+        "presolve_players": pre.after,
+        "presolve_cols": reduced.n_cols,
+        "presolve_ms": round(1000 * pre.seconds, 2),
+    }
+
+
+def bench_formulations(
+    engine: OptimizerEngine,
+    rules: DkRules,
+    df: pd.DataFrame,
+    solvers: Sequence[str],
+    *,
+    num_lineups: int,
+    max_overlap: Optional[int],
+) -> List[Dict[str, Any]]:
+    """Compare the per-instance and slot-type aggregated formulations on the same request."""
+    pool = PlayerPool.from_df(df)
+    slot_instances = expand_slots(rules.slots)
+    rows: List[Dict[str, Any]] = []
+    for formulation in FORMULATIONS:
+        model = build_lineup_model(pool, slot_instances, rules, {"formulation": formulation})
+        for name in solvers:
+            settings: Dict[str, Any] = {"num_lineups": num_lineups, "solver": name, "formulation": formulation}
+            if max_overlap is not None:
+                settings["max_overlap"] = max_overlap
+            lineups = engine.optimize_df(df, rules, settings=settings)
+            solve_s = sum(lu["meta"]["solve_s"] for lu in lineups)
+            rows.append({
+                "sport": rules.sport,
+                "formulation": formulation,
+                "solver": name,
+                "cols": model.n_cols,
+                "rows": model.n_rows,
+                "nnz": len(model.data),
+                "lineups": len(lineups),
+                "solve_ms_per_lineup": round(1000 * solve_s / max(1, len(lineups)), 1),
+                "best_proj": round(lineups[0]["total_proj"], 2) if lineups else None,
+                "last_proj": round(lineups[-1]["total_proj"], 2) if lineups else None,
+            })
+    return rows
+
+
+def bench_solvers(
+    engine: OptimizerEngine,
+    rules: DkRules,
+    df: pd.DataFrame,
+    solvers: Sequence[str],
+    *,
+    num_lineups: int,
+    max_overlap: Optional[int],
+) -> List[Dict[str, Any]]:
+    """Run the same request through each solver backend and collect timings."""
+    rows: List[Dict[str, Any]] = []
+    for name in solvers:
+        settings: Dict[str, Any] = {"num_lineups": num_lineups, "solver": name}
+        if max_overlap is not None:
+            settings["max_overlap"] = max_overlap
+
+        t0 = time.perf_counter()
+        lineups = engine.optimize_df(df, rules, settings=settings)
+        wall = time.perf_counter() - t0
+
+        rows.append({
+            "sport": rules.sport,
+            "players": len(df),
+            "solver": name,
+            "lineups": len(lineups),
+            "wall_s": round(wall, 3),
+            "build_s": round(sum(lu["meta"]["build_s"] for lu in lineups), 3),
+            "solve_s": round(sum(lu["meta"]["solve_s"] for lu in lineups), 3),
+            "ms_per_lineup": round(1000 * wall / max(1, len(lineups)), 1),
+            "best_proj": round(lineups[0]["total_proj"], 2) if lineups else None,
+        })
+    return rows
+
+
+def bench_warm_start(
+    engine: OptimizerEngine,
+    rules: DkRules,
+    df: pd.DataFrame,
+    solvers: Sequence[str],
+    *,
+    num_lineups: int,
+    max_overlap: Optional[int],
+) -> List[Dict[str, Any]]:
+    """Solve each lineup cold and warm-started on the same model (warm_start_baseline)."""
+    rows: List[Dict[str, Any]] = []
+    for name in solvers:
+        settings: Dict[str, Any] = {
+            "num_lineups": num_lineups, "solver": name, "warm_start": True, "warm_start_baseline": True,
+        }
+        if max_overlap is not None:
+            settings["max_overlap"] = max_overlap
+        lineups = engine.optimize_df(df, rules, settings=settings)
+        metas = [lu["meta"] for lu in lineups if "cold_nodes" in lu["meta"]]
+        rows.append({
+            "sport": rules.sport,
+            "solver": name,
+            "warm_started": f"{len(metas)}/{max(0, len(lineups) - 1)}",
+            "cold_nodes": sum(m["cold_nodes"] or 0 for m in metas),
+            "warm_nodes": sum(m["nodes"] or 0 for m in metas),
+            "cold_solve_s": round(sum(m["cold_solve_s"] for m in metas), 3),
+            "warm_solve_s": round(sum(m["solve_s"] for m in metas), 3),
+        })
+    return rows
+
+
+def bench_top_k(
+    engine: OptimizerEngine,
+    rules: DkRules,
+    df: pd.DataFrame,
+    solvers: Sequence[str],
+    *,
+    k: int,
+) -> List[Dict[str, Any]]:
+    """Cumulative lineups/s at growing K: top_k vs emulating it with no-good overlap cuts."""
+    checkpoints = sorted({max(1, k // 10), max(1, k // 4), max(1, k // 2), k})
+    lineup_size = len(expand_slots(rules.slots))
+    methods = {
+        "top_k": {"top_k": True},
+        "top_k+presolve": {"top_k": True, "presolve": True},
+        "overlap_cuts": {"formulation": "aggregated", "max_overlap": lineup_size - 1},
+    }
+    rows: List[Dict[str, Any]] = []
+    for name in solvers:
+        for method, extra in methods.items():
+            settings: Dict[str, Any] = dict(extra, num_lineups=k, solver=name, engine="milp")
+            lineups = engine.optimize_df(df, rules, settings=settings)
+            row: Dict[str, Any] = {"sport": rules.sport, "solver": name, "method": method, "lineups": len(lineups)}
+            for n in checkpoints:
+                meta = lineups[n - 1]["meta"] if len(lineups) >= n else None
+                row[f"K={n}"] = round(meta["lineups_per_s"], 1) if meta else None
+            row["last_proj"] = round(lineups[-1]["total_proj"], 2) if lineups else None
+            rows.append(row)
+    return rows
+
+
+def bench_sim(
+    engine: OptimizerEngine,
+    rules: DkRules,
+    df: pd.DataFrame,
+    solvers: Sequence[str],
+    *,
+    draws: int,
+    workers: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """Projection draws solved per second: sim_optimize vs one optimize_df task per draw."""
+    # Same default spread as analysis/distribution.py
+    df = df.assign(_stddev=np.maximum(0.25 * df["_proj"], 1.0))
+    rows: List[Dict[str, Any]] = []
+    for name in solvers:
+        for method in ("sim_optimize", "parallel_tasks"):
+            t0 = time.perf_counter()
+            if method == "sim_optimize":
+                lineups = engine.sim_optimize(df, rules, settings={"num_sims": draws, "seed": 0, "solver": name, "workers": workers})
+            else:
+                lineups = engine.optimize_parallel(df, rules, settings={
+                    "num_lineups": draws, "seed": 0, "solver": name, "workers": workers, "projection_noise": 0.25,
+                })
+            wall = time.perf_counter() - t0
+            rows.append({
+                "sport": rules.sport, "solver": name, "method": method, "draws": draws,
+                "distinct": len(lineups), "wall_s": round(wall, 2), "draws_per_s": round(draws / wall, 1),
+            })
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="OptimizerEngine benchmarks")
+    parser.add_argument("--rules-dir", default="rules/dk")
+    parser.add_argument("--lineups", type=int, default=20)
+    parser.add_argument("--max-overlap", type=int, default=None, help="Default: lineup_size - 2")
+    parser.add_argument("--solvers", nargs="*", default=None, help="Default: every installed backend")
+    parser.add_argument("--top-k", type=int, default=100, help="K for the top-K section (0 skips it)")
+    parser.add_argument("--sims", type=int, default=100, help="Draws for the sim-optimize section (0 skips it)")
+    parser.add_argument("--workers", type=int, default=None, help="Processes for the sim section (default: all cores)")
+    args = parser.parse_args()
+
+    engine = OptimizerEngine(rules_dir=args.rules_dir)
+    solvers = args.solvers or available_solvers()
+
+    build_rows: List[Dict[str, Any]] = []
+    form_rows: List[Dict[str, Any]] = []
+    warm_rows: List[Dict[str, Any]] = []
+    top_k_rows: List[Dict[str, Any]] = []
+    sim_rows: List[Dict[str, Any]] = []
+    rows: List[Dict[str, Any]] = []
+    for sport, path in SLATES:
+        rules, df = load_slate(engine, sport, path)
+        build_rows.append(bench_build(rules, df))
+        max_overlap = args.max_overlap if args.max_overlap is not None else (rules.lineup_size or 2) - 2
+        form_rows += bench_formulations(engine, rules, df, solvers, num_lineups=args.lineups, max_overlap=max_overlap)
+        rows += bench_solvers(engine, rules, df, solvers, num_lineups=args.lineups, max_overlap=max_overlap)
+        warm_rows += bench_warm_start(engine, rules, df, solvers, num_lineups=args.lineups, max_overlap=max_overlap)
+        if args.top_k > 0:
+            top_k_rows += bench_top_k(engine, rules, df, solvers, k=args.top_k)
+        if args.sims > 0:
+            sim_rows += bench_sim(engine, rules, df, solvers, draws=args.sims, workers=args.workers)
+
+    print("== Model build")
+    print(pd.DataFrame(build_rows).to_string(index=False))
+    print("\n== Formulations")
+    print(pd.DataFrame(form_rows).to_string(index=False))
+    print("\n== Solvers")
+    print(pd.DataFrame(rows).to_string(index=False))
+    print("\n== Warm start")
+    print(pd.DataFrame(warm_rows).to_string(index=False))
+    if top_k_rows:
+        print("\n== Top-K (cumulative lineups/s)")
+        print(pd.DataFrame(top_k_rows).to_string(index=False))
+    if sim_rows:
+        print("\n== Sim-optimize (projection draws)")
+        print(pd.DataFrame(sim_rows).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+# src/optimizer/cache.py
+# On-disk lineup cache for repeated runs with identical inputs
+#
+# A run is keyed by a SHA-256 over
+#   - the player columns the model reads (player_id, _salary, _proj, _ev,
+#     _positions, _team, _ownership, _ceiling, plus names / opponent / game /
+#     Showdown CPT id columns and their raw fallbacks when present), in row order
+#   - the DkRules dataclass (slots, team limits, stacks, ...)
+#   - the settings, normalized: None values dropped (they mean "default"),
+#     lock / exclude id lists sorted, sets sorted, cache controls removed
+# so a rerun after a tab switch or a page refresh, or a batch job rerun, returns
+# the stored lineups without building or solving anything.
+#
+# One JSON file per key. LRU: a hit touches the file; after each store the
+# least recently used files are deleted until the cache is within max_entries
+# and max_bytes. Runs that return fewer lineups than asked (cancelled,
+# infeasible, time budget spent), or lineups a time limit stopped before
+# optimality (meta["optimal"] False), are not stored.
+#
+# Runs with projection_noise and no seed draw new projections every time, and
+# runs checked against a caller's signature_index depend on what it holds; they
+# are never cached (reproducible() is False).
+#
+# Hit / miss counts are kept per LineupCache object and reported in every
+# lineup's meta["cache"] = {"hit", "key", "hits", "misses"}.
+#
+from __future__ import annotations
+
+import dataclasses
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .engine import DkRules, OptimizerEngine
+
+# Player columns hashed into the key (those present in the frame)
+KEY_COLUMNS = (
+    "player_id", "_salary", "_proj", "_ev", "_positions", "_team", "_ownership", "_ceiling",
+    "player_name", "_opp", "_game", "position", "salary", "team", "cpt_player_id",
+)
+# Settings that control the cache, not the lineups
+_CACHE_KEYS = ("cache",)
+# Settings holding id / team collections whose order does not matter
+_SET_KEYS = ("lock_player_ids", "exclude_player_ids", "started_teams", "started_games")
+
+
+def _canonical(value: Any) -> Any:
+    """JSON-ready value with a stable order (sets sorted, dataclasses as dicts)."""
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return {f.name: _canonical(getattr(value, f.name)) for f in dataclasses.fields(value)}
+    if isinstance(value, dict):
+        return {str(k): _canonical(v) for k, v in sorted(value.items(), key=lambda kv: str(kv[0]))}
+    if isinstance(value, (set, frozenset)):
+        return sorted((_canonical(v) for v in value), key=repr)
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, float) and np.isnan(value):
+        return None
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    return repr(value)
+
+
+def normalize_settings(settings: Dict[str, Any]) -> Dict[str, Any]:
+    """Settings as they enter the key."""
+    out: Dict[str, Any] = {}
+    for k, v in (settings or {}).items():
+        if v is None or k in _CACHE_KEYS:
+            continue
+        if k in _SET_KEYS:
+            v = sorted({str(x) for x in v})
+        out[k] = _canonical(v)
+    return out
+
+
+def reproducible(settings: Dict[str, Any]) -> bool:
+    """False for randomized runs without a seed or with a shared signature_index: a rerun must not replay them."""
+    settings = settings or {}
+    if settings.get("signature_index") is not None:
+        return False
+    noise = float(settings.get("projection_noise") or 0.0)
+    return noise <= 0 or settings.get("seed") is not None
+
+
+def players_digest(players_df: pd.DataFrame) -> bytes:
+    """Digest of the key columns of players_df (row order included)."""
+    frame = players_df[[c for c in KEY_COLUMNS if c in players_df.columns]].copy()
+    # Defaults the engine fills in (in place) when the columns are missing
+    if "_proj" in frame.columns:
+        for c in ("_ev", "_ceiling"):
+            if c not in frame.columns:
+                frame[c] = frame["_proj"]
+        if "_ownership" not in frame.columns:
+            frame["_ownership"] = 0.0
+    cols = [c for c in KEY_COLUMNS if c in frame.columns]
+    frame = frame[cols]
+    if "_positions" in frame.columns:
+        frame["_positions"] = [
+            "/".join(sorted(p)) if isinstance(p, (set, frozenset, list, tuple)) else str(p)
+            for p in frame["_positions"]
+        ]
+    for c in frame.columns:
+        if frame[c].dtype == object:
+            frame[c] = frame[c].astype(str)
+    h = hashlib.sha256(json.dumps(cols).encode())
+    h.update(pd.util.hash_pandas_object(frame, index=False).to_numpy().tobytes())
+    return h.digest()
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    raise TypeError(f"Not JSON serializable: {type(value).__name__}")
+
+
+class LineupCache:
+    """Lineups per input fingerprint, stored as JSON files under `path`."""
+
+    def __init__(self, path: str | Path, *, max_entries: int = 256, max_bytes: int = 256 * 2**20) -> None:
+        self.path = Path(path)
+        self.max_entries = int(max_entries)
+        self.max_bytes = int(max_bytes)
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, players_df: pd.DataFrame, rules: "DkRules", settings: Dict[str, Any]) -> str:
+        h = hashlib.sha256(players_digest(players_df))
+        h.update(json.dumps(_canonical(rules), sort_keys=True).encode())
+        h.update(json.dumps(normalize_settings(settings), sort_keys=True).encode())
+        return h.hexdigest()
+
+    def _file(self, key: str) -> Path:
+        return self.path / f"{key}.json"
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Stored entry ({"lineups", "exposure"}) or None; counts the hit / miss."""
+        f = self._file(key)
+        try:
+            with f.open() as fh:
+                entry = json.load(fh)
+            os.utime(f)   # most recently used
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry
+
+    def put(self, key: str, lineups: List[Dict[str, Any]], exposure: Optional[List[Dict[str, Any]]] = None) -> None:
+        self.path.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+        with os.fdopen(fd, "w") as fh:
+            json.dump({"lineups": lineups, "exposure": exposure}, fh, default=_json_default)
+        os.replace(tmp, self._file(key))
+        self.evict()
+
+    def evict(self) -> int:
+        """Delete least recently used entries beyond max_entries / max_bytes. Returns the count."""
+        files = []
+        for f in self.path.glob("*.json"):
+            try:
+                st = f.stat()
+            except OSError:
+                continue
+            files.append((st.st_mtime, st.st_size, f))
+        files.sort(key=lambda t: t[0], reverse=True)   # newest first
+        total, removed = 0, 0
+        for i, (_mtime, size, f) in enumerate(files):
+            total += size
+            if i >= self.max_entries or total > self.max_bytes:
+                try:
+                    f.unlink()
+                    removed += 1
+                except OSError:
+                    pass
+        return removed
+
+    def clear(self) -> None:
+        for f in self.path.glob("*.json"):
+            f.unlink()
+
+    def stats(self, key: str, hit: bool) -> Dict[str, Any]:
+        return {"hit": hit, "key": key[:16], "hits": self.hits, "misses": self.misses}
+
+
+def cached_run(
+    cache: Optional[LineupCache],
+    engine: "OptimizerEngine",
+    key_inputs: Optional[tuple],
+    run: Callable[[], Iterator[Dict[str, Any]]],
+    num_lineups: int,
+    complete: Optional[Callable[[List[Dict[str, Any]]], bool]] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Yield the lineups of run(), through the cache. key_inputs is
+    (players_df, rules, settings); None (or no cache) bypasses it.
+    The lineups are stored when complete(lineups) holds, by default when
+    there are num_lineups of them and every solve proved optimality.
+    """
+    if cache is None or key_inputs is None:
+        yield from run()
+        return
+    key = cache.key(*key_inputs)
+    entry = cache.get(key)
+    if entry is not None:
+        engine.last_diagnosis = None
+        engine.last_exposure = entry.get("exposure")
+        stats = cache.stats(key, True)
+        for lu in entry["lineups"]:
+            lu["meta"]["cache"] = stats
+            yield lu
+        return
+    stats = cache.stats(key, False)
+    lineups: List[Dict[str, Any]] = []
+    for lu in run():
+        lu["meta"]["cache"] = stats
+        lineups.append(lu)
+        yield lu
+    # Only complete runs: a cancelled run never gets here, a short one (infeasible,
+    # time budget) or a time-limited incumbent may not be what a rerun returns
+    if complete is not None:
+        done = complete(lineups)
+    else:
+        done = len(lineups) >= num_lineups and all(lu["meta"].get("optimal", True) for lu in lineups)
+    if done:
+        cache.put(key, lineups, engine.last_exposure)
@@ -2,16 +2,19 @@
 # DraftKings Multi-Sport Optimizer (Rule-driven via rules/dk/*.yaml)
 #
 # Requires:
-#   pip install pandas pyyaml pulp
+#   pip install pandas numpy pyyaml pulp
 #
 # Notes:
 # - This engine reads your YAML format exactly as shown in screenshots:
 #     sport, site, slate, salary_cap, lineup_size, projection_column, num_lineups
 #     roster_slots:
-#       slots: [{slot, eligible, count}, ...]
+#       slots: [{slot, eligible, count, salary_multiplier, points_multiplier}, ...]
 #     team_limits: {max_from_team, min_teams}
+#     stacks: [{name, type, positions, anchor, min_players, count}, ...]   (optional)
+#     no_opponents: [{name, positions, versus}, ...]                        (optional)
 # - It supports multi-lineup generation with optional max_overlap setting
 # - Team constraints are auto-skipped if team column is missing
+# - The MILP is assembled from NumPy arrays as one CSR matrix (see optimizer/model.py)
 #
 # Example usage (from UI or CLI):
 #   from src.optimizer.engine import OptimizerEngine
@@ -20,22 +23,30 @@
 #
 from __future__ import annotations
 
+import time
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
 
+import numpy as np
 import pandas as pd
 import yaml
-from pulp import (
-    LpBinary,
-    LpMaximize,
-    LpProblem,
-    LpStatusOptimal,
-    LpVariable,
-    lpSum,
-    value,
-    PULP_CBC_CMD,
+
+from .cache import LineupCache, cached_run, reproducible
+from .exposure import ExposureTracker, has_exposure_bounds
+from .feasibility import FeasibilityReport, Infeasibility, check_feasibility, find_conflict
+from .knapsack import CardinalityKnapsack, knapsack_applicable
+from .model import (
+    LineupModel, PlayerPool, build_lineup_model, eligibility_mask, expand_slots, has_slot_multipliers,
+    player_objective, slot_multipliers,
 )
+from .opponents import OpponentRule, opponent_rules, parse_opponent_rules
+from .presolve import presolve_pool
+from .signature import ID_SPACE, LineupIndex, lineup_codes, signature_hex
+from .solvers import SolveResult, SolverBackend, get_backend, time_left
+from .stacking import StackRule, parse_stack_rules
+from .topk import TopKSearch
+from .warmstart import repair_lineup
 
 # ----------------------------
 # Utilities
@@ -83,6 +94,44 @@ def _safe_float(x: Any, default: float = 0.0) -> float:
     except Exception:
         return default
 
+def _given(col: pd.Series) -> pd.Series:
+    """Upper-cased strings, None where the value is missing or empty."""
+    out = col.astype(str).str.strip().str.upper()
+    return out.where(col.notna() & ~out.isin(["", "NAN", "NONE"]), None)
+
+def _game_columns(df: pd.DataFrame) -> Tuple[pd.Series, pd.Series]:
+    """
+    Opponent team and game key per player, from "opp" / "game_id" columns when
+    given, else from the DK "Game Info" field ("AWAY@HOME 09/08/2025 07:15PM ET").
+    Without a game key, the game is the sorted team pair ("ATL@CHC").
+    """
+    team = df["_team"]
+    opp = pd.Series(None, index=df.index, dtype=object)
+    game = pd.Series(None, index=df.index, dtype=object)
+    if "Game Info" in df.columns:
+        matchup = df["Game Info"].astype(str).str.extract(r"^\s*([A-Za-z0-9]+)@([A-Za-z0-9]+)")
+        away, home = matchup[0].str.upper(), matchup[1].str.upper()
+        opp = opp.mask(team == away, home).mask(team == home, away)
+        game = game.mask(away.notna() & home.notna(), away + "@" + home)
+    if "opp" in df.columns:
+        opp = _given(df["opp"]).combine_first(opp)
+    if "game_id" in df.columns:
+        game = _given(df["game_id"]).combine_first(game)
+    pair = game.isna() & opp.notna() & team.notna()
+    game[pair] = ["@".join(sorted((t, o))) for t, o in zip(team[pair], opp[pair])]
+    return opp.astype(object), game.astype(object)
+
+# DraftKings salary export (DKSalaries.csv) -> engine columns.
+# "Roster Position" is used instead of "Position" because it carries DK slot
+# eligibility (e.g. SP/RP -> P).
+_DK_EXPORT_COLUMNS = {
+    "ID": "player_id",
+    "Name": "player_name",
+    "Roster Position": "position",
+    "Salary": "salary",
+    "TeamAbbrev": "team",
+}
+
 # ----------------------------
 # Rules model
 # ----------------------------
@@ -92,6 +141,8 @@ class SlotRule:
     name: str
     eligible: Set[str]
     count: int
+    salary_multiplier: float = 1.0    # e.g. Showdown CPT: 1.5x salary and points
+    points_multiplier: float = 1.0
 
 @dataclass(frozen=True)
 class TeamLimits:
@@ -109,14 +160,124 @@ class DkRules:
     num_lineups: int
     slots: List[SlotRule]
     team_limits: TeamLimits
+    stacks: Tuple[StackRule, ...] = ()
+    no_opponents: Tuple[OpponentRule, ...] = ()
+
+def _gap_setting(settings: Dict[str, Any]) -> Optional[float]:
+    gap = settings.get("mip_gap")
+    return _safe_float(gap) if gap is not None else None
+
+
+def _overlap_setting(settings: Dict[str, Any], max_overlap: Optional[int], lineup_size: int) -> Optional[int]:
+    """max_overlap, tightened to lineup_size - 1 by unique (default on) so no lineup repeats."""
+    if settings.get("unique", True):
+        return lineup_size - 1 if max_overlap is None else min(int(max_overlap), lineup_size - 1)
+    return max_overlap
+
+
+def _signature_index(settings: Dict[str, Any], lineup_size: int) -> Optional[LineupIndex]:
+    """
+    Index new lineups are checked against: settings["signature_index"] (shared
+    across runs and merges) or a fresh one. None with unique off (repeats asked for).
+    """
+    if not settings.get("unique", True):
+        return None
+    seen = settings.get("signature_index")
+    if seen is None:
+        return LineupIndex.for_ids(lineup_size)
+    if seen.n_players != ID_SPACE:
+        raise ValueError("signature_index must be a LineupIndex.for_ids(lineup_size) index.")
+    return seen
+
+
+def _sign_lineup(lineup: Dict[str, Any], rules: DkRules, seen: Optional[LineupIndex]) -> bool:
+    """Set meta["signature"]; False when `seen` already holds the lineup (else it is added)."""
+    multiplied = {sr.name for sr in rules.slots if sr.salary_multiplier != 1 or sr.points_multiplier != 1}
+    index = seen if seen is not None else LineupIndex.for_ids(len(lineup["slots"]))
+    sig = index.signature(lineup_codes(lineup, multiplied))
+    lineup.setdefault("meta", {})["signature"] = signature_hex(sig)
+    return seen is None or bool(seen.add_signatures(np.array([sig], dtype=np.uint64))[0])
+
+
+def _time_settings(settings: Dict[str, Any], t_start: float) -> Tuple[Optional[float], Optional[float]]:
+    """(per-solve time_limit, deadline) from settings; the budget counts from t_start."""
+    limit, budget = settings.get("time_limit"), settings.get("time_budget")
+    return (
+        _safe_float(limit) if limit is not None else None,
+        t_start + _safe_float(budget) if budget is not None else None,
+    )
+
+
+def _make_lineup(
+    rules: DkRules,
+    pool: PlayerPool,
+    slot_instances: List[Tuple[str, Set[str]]],
+    chosen: List[Tuple[int, int]],
+) -> Dict[str, Any]:
+    """Turn (player_idx, slot_idx) pairs into the lineup dict returned by optimize_df."""
+    # Build ordered slot list: preserve YAML slot order
+    # slot_instances already respects YAML order and count expansion.
+    instance_to_player: Dict[int, int] = {s: p for (p, s) in chosen}
+    sal_mult, pts_mult = slot_multipliers(rules.slots)
+    if len(sal_mult) != len(slot_instances):
+        sal_mult = pts_mult = np.ones(len(slot_instances))
+
+    slot_rows: List[Dict[str, Any]] = []
+    total_salary = 0
+    total_proj = 0.0
+    for s, (sname, _elig) in enumerate(slot_instances):
+        p = instance_to_player.get(s)
+        if p is None:
+            continue
+        sal = int(round(pool.salary[p] * sal_mult[s]))
+        prj = float(pool.proj[p] * pts_mult[s])
+        total_salary += sal
+        total_proj += prj
+
+        # Showdown CPT: DK expects the player's CPT entry ID in a multiplied slot
+        pid = pool.ids[p]
+        if sal_mult[s] != 1 and pool.cpt_ids is not None and pool.cpt_ids[p] is not None:
+            pid = pool.cpt_ids[p]
+
+        row = {
+            "slot": sname.split("__")[0],
+            "slot_instance": sname,
+            "player_id": pid,
+            "player_name": pool.names[p],
+            "salary": sal,
+            "proj_points": prj,
+            "position": "/".join(sorted(pool.positions[p])),
+        }
+        if pid != pool.ids[p]:
+            row["base_player_id"] = pool.ids[p]   # the pool (FLEX) player_id
+        if pool.has_team:
+            row["team"] = pool.team[p]
+        slot_rows.append(row)
+
+    return {
+        "sport": rules.sport,
+        "site": rules.site,
+        "slate": rules.slate,
+        "salary_cap": rules.salary_cap,
+        "projection_column": rules.projection_column,
+        "total_salary": total_salary,
+        "total_proj": float(total_proj),
+        "slots": slot_rows,
+    }
 
 # ----------------------------
 # Engine
 # ----------------------------
 
 class OptimizerEngine:
-    def __init__(self, rules_dir: str | Path = "rules/dk") -> None:
+    def __init__(self, rules_dir: str | Path = "rules/dk", cache_dir: str | Path | None = None) -> None:
         self.rules_dir = Path(rules_dir)
+        # On-disk lineup cache shared by optimize_df / iter_optimize / sessions (None: off)
+        self.cache: Optional[LineupCache] = LineupCache(cache_dir) if cache_dir is not None else None
+        # Why the last run produced fewer lineups than asked (None if it did not stop early)
+        self.last_diagnosis: Optional[FeasibilityReport] = None
+        # Requested vs achieved exposure of the last run with exposure bounds (ExposureTracker.report)
+        self.last_exposure: Optional[List[Dict[str, Any]]] = None
 
     # --------
     # Rules
@@ -200,11 +361,16 @@ class OptimizerEngine:
                 raise ValueError(f"Slot entry missing 'slot' name: {s}")
             if count <= 0:
                 raise ValueError(f"Slot '{name}' has non-positive count: {count}")
-            elig_set = set(_as_upper(x) for x in eligible) if isinstance(eligible, list) else _parse_positions(eligible)
+            # Combined entries such as "C/1B" accept either token (players carry "C" or "1B")
+            elig_set = set().union(*(_parse_positions(x) for x in eligible)) if isinstance(eligible, list) else _parse_positions(eligible)
             if not elig_set:
                 raise ValueError(f"Slot '{name}' has empty eligible list: {s}")
 
-            slots.append(SlotRule(name=_as_upper(name), eligible=elig_set, count=count))
+            multipliers = {k: _safe_float(s.get(k), 1.0) for k in ("salary_multiplier", "points_multiplier")}
+            if min(multipliers.values()) <= 0:
+                raise ValueError(f"Slot '{name}' multipliers must be positive: {s}")
+
+            slots.append(SlotRule(name=_as_upper(name), eligible=elig_set, count=count, **multipliers))
             total_count += count
 
         lineup_size = raw.get("lineup_size")
@@ -231,6 +397,8 @@ class OptimizerEngine:
             num_lineups=_safe_int(raw.get("num_lineups"), 1),
             slots=slots,
             team_limits=tl,
+            stacks=tuple(parse_stack_rules(raw.get("stacks") or [])),
+            no_opponents=tuple(parse_opponent_rules(raw.get("no_opponents") or [])),
         )
 
     # --------
@@ -248,6 +416,22 @@ class OptimizerEngine:
         else:
             df = pd.read_csv(df_or_path)
 
+        # Raw DK salary export: map its headers when the engine columns are absent
+        if "player_id" not in df.columns and "ID" in df.columns:
+            roster = df["Roster Position"].astype(str) if "Roster Position" in df.columns else None
+            if roster is not None and "Position" in df.columns and roster.isin(["CPT", "FLEX"]).all():
+                # Showdown export lists every player twice (CPT row at 1.5x salary, FLEX row),
+                # each with its own DK ID. Keep the FLEX rows (the CPT slot's multipliers in
+                # the rules do the rest) and carry the CPT row's ID for the captain slot.
+                key = [c for c in ("Name", "TeamAbbrev") if c in df.columns]
+                cpt = df.loc[roster == "CPT", key + ["ID"]].rename(columns={"ID": "cpt_player_id"})
+                cpt["cpt_player_id"] = cpt["cpt_player_id"].astype(str)
+                df = df[roster == "FLEX"].copy()
+                if key:
+                    df = df.merge(cpt.drop_duplicates(key), on=key, how="left")
+                df["Roster Position"] = df["Position"]
+            df = df.rename(columns={k: v for k, v in _DK_EXPORT_COLUMNS.items() if v not in df.columns})
+
         # Normalize column names for robustness
         # (We keep originals too; only enforce required existence)
         required = ["player_id", "player_name", "position", "salary", rules.projection_column]
@@ -277,6 +461,8 @@ class OptimizerEngine:
             df["_team"] = df["team"].astype(str).str.upper()
         else:
             df["_team"] = None
+        # Optional opponent / game (bring-back and game stacks)
+        df["_opp"], df["_game"] = _game_columns(df)
 
         # Filter unusable rows
         df = df[df["_salary"] > 0].copy()
@@ -302,33 +488,16 @@ class OptimizerEngine:
         df = self.load_players_df(csv_path, rules, sport=sport)
         return self.optimize_df(df, rules, settings=settings)
 
-    def optimize_df(
+    def _prepare_pool(
         self,
         players_df: pd.DataFrame,
         rules: DkRules,
-        *,
-        settings: Optional[Dict[str, Any]] = None,
-    ) -> List[Dict[str, Any]]:
+        settings: Dict[str, Any],
+    ) -> Tuple[PlayerPool, List[Tuple[str, Set[str]]], np.ndarray]:
         """
-        Returns a list of lineups (dicts).
-        Settings:
-          - num_lineups: int
-          - max_overlap: int
-          - lock_player_ids: List[str]
-          - exclude_player_ids: List[str]
-          - objective_mode: "cash" | "gpp" (default cash)
-          - gpp_alpha: float (DEPRECATED in favor of EV col, but kept for back-compat)
-          - max_chalk_count: int (Max players with > chalk_threshold ownership)
-          - chalk_threshold: float (default 0.20)
-          - min_total_ceiling: float (Constraint)
-          - total_ownership_cap: float (sum of ownership <= X)
-          - use_ownership: bool (Enable ownership optimized objective - legacy penalty method)
-          - ownership_weight: float (Penalty weight)
+        Clean players_df into the array-backed PlayerPool used by the model builder.
+        Applies exclusions and validates locks. Returns (pool, slot_instances, locked_idx).
         """
-        settings = settings or {}
-        num_lineups = _safe_int(settings.get("num_lineups"), rules.num_lineups)
-        num_lineups = max(1, num_lineups)
-
         # Ensure Internal Columns
         # If specific columns like _ev are missing but Mode=GPP, we might want to default to Proj
         # But ideally the caller (App) prepares _ev.
@@ -342,12 +511,6 @@ class OptimizerEngine:
                 elif c == "_team": pass # Handled below
                 else: pass
 
-        # Optional generation controls
-        # max_overlap: maximum number of shared players between any new lineup and ALL previous lineups
-        #   - if None, no overlap constraint applied
-        max_overlap = settings.get("max_overlap")
-        max_overlap = _safe_int(max_overlap, None) if max_overlap is not None else None
-
         # optional lock/exclude
         locked_ids = set(str(x) for x in (settings.get("lock_player_ids") or []))
         excluded_ids = set(str(x) for x in (settings.get("exclude_player_ids") or []))
@@ -390,337 +553,499 @@ class OptimizerEngine:
         if df.empty:
             raise ValueError("All players excluded; nothing left to optimize.")
 
-        # Build slot instances (expand counts)
-        slot_instances: List[Tuple[str, Set[str]]] = []
-        for sr in rules.slots:
-            for i in range(sr.count):
-                # Each instance has a unique name to enforce exact count
-                inst_name = f"{sr.name}__{i+1}"
-                slot_instances.append((inst_name, sr.eligible))
-
-        # Precompute player eligibility by slot instance
-        player_ids = df["player_id"].tolist()
-        player_pos: Dict[str, Set[str]] = dict(zip(df["player_id"], df["_positions"]))
-        player_salary: Dict[str, int] = dict(zip(df["player_id"], df["_salary"]))
-        player_proj: Dict[str, float] = dict(zip(df["player_id"], df["_proj"]))
-        player_name: Dict[str, str] = dict(zip(df["player_id"], df["player_name"]))
-        
-        # GPP / Ownership Data
-        player_ceiling: Dict[str, float] = {}
-        player_own: Dict[str, float] = {}
-        
-        if "_ceiling" in df.columns:
-            player_ceiling = dict(zip(df["player_id"], df["_ceiling"]))
-        else:
-            # default to proj check logic? Or just 0.
-            # If GPP mode requested but no ceiling, fallback to proj
-            player_ceiling = player_proj.copy()
-            
-        if "_ownership" in df.columns:
-            player_own = dict(zip(df["player_id"], df["_ownership"]))
-        else:
-            # Default 0
-            player_own = {pid: 0.0 for pid in player_ids}
-
-        # Check for valid team data
-        # _team is guaranteed to exist now (though values might be None)
-        has_team = df["_team"].notna().any()
-        player_team: Dict[str, Optional[str]] = dict(zip(df["player_id"], df["_team"])) if has_team else {}
-
-        # For min_teams we need team->players list
-        teams: List[str] = []
-        team_to_players: Dict[str, List[str]] = {}
-        if has_team:
-            teams = sorted(df["_team"].dropna().unique().tolist())
-            for t in teams:
-                team_to_players[t] = df.loc[df["_team"] == t, "player_id"].tolist()
+        pool = PlayerPool.from_df(df)
+        slot_instances = expand_slots(rules.slots)
 
         # Validate locked players feasibility quickly (optional)
         if locked_ids:
-            missing_locks = [pid for pid in locked_ids if pid not in player_ids]
+            missing_locks = [pid for pid in locked_ids if pid not in set(pool.ids)]
             if missing_locks:
                 raise ValueError(f"Locked player_ids not found in input after exclusions: {missing_locks}")
+        locked_idx = pool.index_of(sorted(locked_ids))
+        return pool, slot_instances, locked_idx
 
-        lineups: List[Dict[str, Any]] = []
-        previous_lineup_player_sets: List[Set[str]] = []
-
-        for k in range(num_lineups):
-            prob = LpProblem(f"dk_optimizer_{rules.sport}_{k+1}", LpMaximize)
-
-            # Decision vars: x[p, s] indicates player p assigned to slot-instance s
-            x: Dict[Tuple[str, str], LpVariable] = {}
-            for pid in player_ids:
-                for (sname, selig) in slot_instances:
-                    # eligibility check
-                    if player_pos[pid].intersection(selig):
-                        x[(pid, sname)] = LpVariable(f"x_{pid}_{sname}", lowBound=0, upBound=1, cat=LpBinary)
-
-            if not x:
-                try:
-                    # Fallback attempt: if only 1 lineup and fails, try to see constraints
-                    print("Debug: No eligibility variables created. Check positions.")
-                except:
-                    pass
-                raise ValueError("No feasible (player,slot) assignments from eligibility rules.")
-
-            # Each slot instance must be filled by exactly 1 player
-            for (sname, _selig) in slot_instances:
-                prob += (
-                    lpSum(x[(pid, sname)] for pid in player_ids if (pid, sname) in x) == 1,
-                    f"fill_{sname}",
-                )
-
-            # Each player can be used at most once across all slot instances
-            for pid in player_ids:
-                prob += (
-                    lpSum(x[(pid, sname)] for (sname, _selig) in slot_instances if (pid, sname) in x) <= 1,
-                    f"player_once_{pid}",
-                )
-
-            # Salary cap
-            prob += (
-                lpSum(
-                    player_salary[pid] * x[(pid, sname)]
-                    for (pid, sname) in x.keys()
-                )
-                <= rules.salary_cap,
-                "salary_cap",
-            )
+    def optimize_df(
+        self,
+        players_df: pd.DataFrame,
+        rules: DkRules,
+        *,
+        settings: Optional[Dict[str, Any]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Returns a list of lineups (dicts). Same as list(iter_optimize(...)).
+        Settings:
+          - num_lineups: int
+          - max_overlap: int Most players a new lineup may share with any earlier one.
+            Capped at lineup size - 1 by `unique` (on by default): without max_overlap,
+            num_lineups lineups are distinct player sets, not the best lineup repeated.
+          - lock_player_ids: List[str]
+          - exclude_player_ids: List[str]
+          - objective_mode: "cash" | "gpp" (default cash)
+          - gpp_alpha: float (DEPRECATED in favor of EV col, but kept for back-compat)
+          - max_chalk_count: int (Max players with > chalk_threshold ownership)
+          - chalk_threshold: float (default 0.20)
+          - min_total_ceiling: float (Constraint)
+          - total_ownership_cap: float (sum of ownership <= X)
+          - use_ownership: bool (Enable ownership optimized objective - legacy penalty method)
+          - ownership_weight: float (Penalty weight)
+          - reuse_model: bool (default True) Build the MILP once and only append the
+            overlap cut for each new lineup. False rebuilds the model per lineup.
+          - solver: "cbc" | "highs" (default cbc). See optimizer/solvers.py;
+            a backend that is not installed falls back to CBC, an unknown name raises ValueError.
+          - formulation: "instances" (default, one binary per player x slot instance)
+            | "aggregated" (one binary per player + slot-type coverage rows; slots are
+            assigned by bipartite matching after the solve). See optimizer/model.py.
+            Rules with slot multipliers (Showdown CPT) always use "instances".
+          - projection_noise: float (default 0) Relative stdev of Gaussian noise added to
+            the objective coefficients (randomized projections). Reported totals stay unperturbed.
+          - seed: int Random seed for projection_noise.
+          - warm_start: bool (default False) Start each solve after the first from the
+            previous lineup, repaired to satisfy the new overlap cut (optimizer/warmstart.py).
+          - warm_start_baseline: bool (default False) Also solve each warm-started lineup
+            cold to measure the savings (doubles solve time; for benchmarking).
+          - presolve: bool (default False) Drop dominated players before building the
+            model (optimizer/presolve.py). Locked players are kept.
+          - engine: "auto" (default) | "milp" | "knapsack". auto routes single-position
+            sports (GOLF / NASCAR / TENNIS: one slot type, no binding team rules) to the
+            knapsack branch-and-bound in optimizer/knapsack.py; meta["solver"] is "knapsack".
+          - time_limit: float seconds per lineup solve. A solve that hits it returns
+            its best incumbent with meta["optimal"] = False.
+          - mip_gap: float relative gap at which a solve counts as optimal (default:
+            the solver's own, 0 for CBC and 1e-4 for HiGHS).
+          - time_budget: float seconds for the whole batch. Each solve is capped by
+            the time left, and no new lineup is started once it is spent.
+          - feasibility_check: bool (default True) Vectorized pre-checks before any model
+            is built (optimizer/feasibility.py); a failed check returns no lineups.
+          - diagnose: bool (default True) When a solve is infeasible, find a minimal
+            conflicting set of constraint groups (a few extra solves).
+          - min_exposure / max_exposure: {player_id: fraction} of the num_lineups lineups
+            a player must / may appear in; max_exposure can also be one float for all players.
+          - team_min_exposure / team_max_exposure: {team: fraction} of lineups with at least
+            one player from the team. Enforced during generation by rows rebuilt before each
+            solve (optimizer/exposure.py); engine.last_exposure reports achieved vs requested.
+          - stacks: list of stack rule dicts (same fields as the rules YAML `stacks`, see
+            optimizer/stacking.py). Replaces the rules file stacks; [] disables them.
+            game / bring_back rules need opp or game_id columns (or DK "Game Info").
+          - no_opponents: list of {name, positions, versus} dicts: no `versus` player facing
+            a selected `positions` player (optimizer/opponents.py). Replaces the rules file
+            list; [] disables it. Needs opponent / game data, otherwise nothing is added.
+          - top_k: bool (default False) Return the num_lineups best distinct lineups in
+            order of objective value (optimizer/topk.py). max_overlap is ignored; presolve
+            only drops players that cannot be in the top num_lineups. The MILP path always
+            uses the aggregated formulation at mip_gap 0.
+          - unique: bool (default True) Never return the same player set twice. Without
+            max_overlap this caps the overlap at lineup size - 1 (one no-good cut per
+            lineup); False repeats the best lineup num_lineups times (the behavior
+            before this setting existed).
+          - signature_index: LineupIndex.for_ids(lineup_size) (optimizer/signature.py)
+            shared across runs, sessions and optimize_parallel merges. Lineups it already
+            holds are cut and not returned (at most one extra solve each); returned ones
+            are added. Needs unique; such runs are not cached.
+          - cache: bool (default True) Use the engine's lineup cache (OptimizerEngine
+            cache_dir; optimizer/cache.py) when there is one. A rerun with the same
+            players, rules and settings returns the stored lineups. Runs with
+            projection_noise and no seed are not cached.
+
+        Each lineup carries a "meta" dict with per-lineup timings:
+          {"lineup_index", "build_s", "solve_s", "elapsed_s", "lineups_per_s", "reused_model",
+           "solver", "nodes", "warm_start", "optimal", "mip_gap", "signature"}
+        "signature" is the hex lineup signature over the player_ids (slot order ignored;
+        a Showdown CPT counts apart), equal across runs for the same lineup.
+        "optimal" is False when the solve stopped on a time limit before proving
+        optimality; "mip_gap" is the relative gap it stopped at (None if unknown).
+        When fewer lineups than asked come back, engine.last_diagnosis holds a
+        FeasibilityReport with the reasons (pre-check failure or conflict set).
+        With top_k on the MILP path, meta["subproblems"] counts the solves behind each lineup.
+        With presolve, meta["presolve"] = {"before", "after", "removed", "seconds"}.
+        With a cache, meta["cache"] = {"hit", "key", "hits", "misses"}; a hit returns the
+        stored lineups, meta included.
+        With warm_start_baseline, warm-started lineups also get
+          {"cold_nodes", "cold_solve_s", "node_savings", "time_savings_s"}
+        """
+        return list(self.iter_optimize(players_df, rules, settings=settings))
+
+    def iter_optimize(
+        self,
+        players_df: pd.DataFrame,
+        rules: DkRules,
+        *,
+        settings: Optional[Dict[str, Any]] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Generator version of optimize_df: yields each lineup as soon as its solve
+        finishes. Stop iterating (break / close()) to cancel the remaining solves.
+        meta["elapsed_s"] is the wall time since the call started.
+        Settings are the same as optimize_df.
+        """
+        settings = settings or {}
+        num_lineups = max(1, _safe_int(settings.get("num_lineups"), rules.num_lineups))
+        cache = self.cache if settings.get("cache", True) else None
+        key_inputs = (players_df, rules, settings) if reproducible(settings) else None
+        yield from cached_run(cache, self, key_inputs,
+                              lambda: self._iter_optimize(players_df, rules, settings), num_lineups)
 
-            # Locked players (must appear exactly once)
-            # Implementation: sum over slot instances == 1
-            for pid in locked_ids:
-                prob += (
-                    lpSum(x[(pid, sname)] for (sname, _selig) in slot_instances if (pid, sname) in x) == 1,
-                    f"lock_{pid}",
-                )
-                
-            # Ownership Cap (Sum of ownership <= Cap)
-            total_own_cap = settings.get("total_ownership_cap")
-            if total_own_cap is not None:
-                prob += (
-                    lpSum(
-                        player_own[pid] * x[(pid, sname)]
-                        for (pid, sname) in x.keys()
-                    )
-                    <= float(total_own_cap),
-                    "total_ownership_cap"
-                )
-                
-            # Min Total Ceiling (GPP)
-            min_ceil = settings.get("min_total_ceiling")
-            if min_ceil is not None:
-                 prob += (
-                    lpSum(
-                        player_ceiling[pid] * x[(pid, sname)]
-                        for (pid, sname) in x.keys()
-                    )
-                    >= float(min_ceil),
-                    "min_total_ceiling"
-                )
-                
-            # Max Chalk Count
-            # Constraint: Sum of (is_chalk * x) <= max_chalk
-            max_chalk = settings.get("max_chalk_count")
-            if max_chalk is not None:
-                chalk_thresh = float(settings.get("chalk_threshold", 0.20))
-                # Precompute chalk status
-                is_chalk = {pid: (1 if player_own[pid] >= chalk_thresh else 0) for pid in player_ids}
-                
-                prob += (
-                    lpSum(
-                        is_chalk[pid] * x[(pid, sname)]
-                        for (pid, sname) in x.keys()
-                    )
-                    <= int(max_chalk),
-                    "max_chalk_count"
-                )
-
-            # Team limits (auto-skip if no team data)
-            if has_team:
-                if rules.team_limits.max_from_team is not None:
-                    max_ft = int(rules.team_limits.max_from_team)
-                    for t in teams:
-                        prob += (
-                            lpSum(
-                                x[(pid, sname)]
-                                for pid in team_to_players.get(t, [])
-                                for (sname, _selig) in slot_instances
-                                if (pid, sname) in x
-                            )
-                            <= max_ft,
-                            f"max_from_team_{t}",
-                        )
-
-                if rules.team_limits.min_teams is not None:
-                    # Use binary y[t] indicating whether team t is used
-                    # link: sum_x_team >= y[t] and sum_x_team <= M * y[t]
-                    min_teams = int(rules.team_limits.min_teams)
-                    M = len(slot_instances)  # max players in lineup
-                    y: Dict[str, LpVariable] = {t: LpVariable(f"y_team_{t}", 0, 1, LpBinary) for t in teams}
-
-                    for t in teams:
-                        team_pick_sum = lpSum(
-                            x[(pid, sname)]
-                            for pid in team_to_players.get(t, [])
-                            for (sname, _selig) in slot_instances
-                            if (pid, sname) in x
-                        )
-                        prob += (team_pick_sum >= y[t], f"team_used_lb_{t}")
-                        prob += (team_pick_sum <= M * y[t], f"team_used_ub_{t}")
-
-                    prob += (lpSum(y[t] for t in teams) >= min_teams, "min_teams")
+    def _iter_optimize(
+        self,
+        players_df: pd.DataFrame,
+        rules: DkRules,
+        settings: Dict[str, Any],
+    ) -> Iterator[Dict[str, Any]]:
+        num_lineups = _safe_int(settings.get("num_lineups"), rules.num_lineups)
+        num_lineups = max(1, num_lineups)
+
+        # Optional generation controls
+        # max_overlap: maximum number of shared players between any new lineup and ALL previous lineups
+        #   - if None, no overlap constraint applied
+        max_overlap = settings.get("max_overlap")
+        max_overlap = _safe_int(max_overlap, None) if max_overlap is not None else None
+        top_k = bool(settings.get("top_k", False))
+
+        self.last_diagnosis = None
+        self.last_exposure = None
+        if top_k and has_exposure_bounds(settings):
+            raise ValueError("top_k returns the K best lineups in order; it cannot take exposure bounds.")
+        if top_k and has_slot_multipliers(rules):
+            raise ValueError("top_k needs one column per player; slot multipliers need per-slot columns.")
+        pool, slot_instances, locked_idx = self._prepare_pool(players_df, rules, settings)
+        if settings.get("feasibility_check", True):
+            report = check_feasibility(pool, slot_instances, rules, settings, locked=locked_idx)
+            if not report.feasible:
+                self.last_diagnosis = report
+                return
+        if top_k:
+            # Every lineup may share all but one player with another one
+            max_overlap = len(slot_instances) - 1
+        max_overlap = _overlap_setting(settings, max_overlap, len(slot_instances))
+
+        presolve_meta = None
+        if settings.get("presolve", False):
+            # Top-K needs more dominators per dropped player to keep the K best lineups
+            pre = presolve_pool(pool, slot_instances, rules, settings, locked=locked_idx, k=num_lineups if top_k else 1)
+            pool = pool.subset(pre.keep)
+            locked_idx = np.nonzero(np.isin(pre.keep, locked_idx))[0]
+            presolve_meta = pre.as_meta()
+
+        t_start = time.perf_counter()
+
+        engine_name = str(settings.get("engine", "auto")).lower()
+        if engine_name == "knapsack" or (engine_name == "auto" and knapsack_applicable(rules, pool, settings)):
+            if not knapsack_applicable(rules, pool, settings):
+                raise ValueError("engine='knapsack' needs a single slot type and no binding team/ownership/ceiling rules.")
+            yield from self._iter_knapsack(
+                rules, pool, slot_instances, locked_idx, settings,
+                num_lineups=num_lineups, max_overlap=max_overlap, t_start=t_start, presolve_meta=presolve_meta,
+            )
+            return
+        if top_k:
+            yield from self._iter_top_k(rules, pool, slot_instances, locked_idx, settings,
+                                        num_lineups=num_lineups, t_start=t_start, presolve_meta=presolve_meta)
+            return
+        yield from self._iter_milp(
+            rules, pool, slot_instances, locked_idx, settings,
+            num_lineups=num_lineups, max_overlap=max_overlap, t_start=t_start, presolve_meta=presolve_meta,
+        )
 
+    def _iter_milp(
+        self,
+        rules: DkRules,
+        pool: PlayerPool,
+        slot_instances: List[Tuple[str, Set[str]]],
+        locked_idx: np.ndarray,
+        settings: Dict[str, Any],
+        *,
+        num_lineups: int,
+        max_overlap: Optional[int],
+        t_start: float,
+        presolve_meta: Optional[Dict[str, Any]] = None,
+        model: Optional[LineupModel] = None,
+        backend: Optional[SolverBackend] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        One MILP solve per lineup with overlap cuts. A compiled `model` (and the
+        `backend` holding it) can be passed in; it is reused and gains the cuts.
+        Exposure bounds (optimizer/exposure.py) add rows that are replaced before
+        every solve; they always sit after the overlap cuts.
+        """
+        previous_lineups: List[np.ndarray] = []
+        exposure = ExposureTracker(pool, settings, num_lineups) if has_exposure_bounds(settings) else None
+        exposure_rows: Optional[int] = None   # first exposure row of the reused model
+        self.last_exposure = exposure.report() if exposure is not None else None
+
+        reuse_model = bool(settings.get("reuse_model", True)) or model is not None
+        backend = backend or get_backend(settings.get("solver"), mip_gap=_gap_setting(settings))
+        time_limit, deadline = _time_settings(settings, t_start)
+        given_model = model is not None
+
+        warm_start = bool(settings.get("warm_start", False))
+        warm_baseline = bool(settings.get("warm_start_baseline", False))
+        coef = player_objective(pool, settings) if warm_start else None
+        no_opp = opponent_rules(rules, settings) if warm_start else []
+        # Lineups of a shared index (earlier runs / merges) are cut but not returned:
+        # at most len(seen) extra solves
+        seen = _signature_index(settings, len(slot_instances))
+        attempts = num_lineups + (len(seen) if seen is not None else 0)
+
+        k = 0   # lineups returned so far
+        for attempt in range(attempts):
+            if k >= num_lineups:
+                break
+            t_build = time.perf_counter()
             # Overlap constraint with previous lineups (optional)
             # We constrain overlap against EACH previous lineup to be <= max_overlap
-            if max_overlap is not None and previous_lineup_player_sets:
-                max_ov = int(max_overlap)
-                # Create helper z[pid] = whether pid is selected in this lineup
-                # z[pid] = sum_s x[pid,s]
-                # To avoid excessive variables, we can just use the sum directly in the constraint
-                # But creating a z variable makes it cleaner if used multiple times. 
-                # Here we only use it for overlap check.
-                # Let's iterate previous sets.
-                
-                for j, prev_set in enumerate(previous_lineup_player_sets, start=1):
-                     # sum of x for p in prev_set <= max_overlap
-                    prob += (
-                         lpSum(
-                             x[(pid, sname)]
-                             for pid in prev_set
-                             for (sname, _selig) in slot_instances
-                             if (pid, sname) in x
-                         ) <= max_ov,
-                        f"max_overlap_prev_{j}",
-                    )
-
-            # Objective
-            mode = settings.get("objective_mode", "cash").lower()
-            
-            if mode == "gpp":
-                # Maximize EV (Expected Value)
-                # Ensure _ev is populated in DF (or fallback to proj above)
-                player_ev = dict(zip(df["player_id"], df["_ev"]))
-                
-                prob += lpSum(
-                    player_ev[pid] * x[(pid, sname)]
-                    for (pid, sname) in x.keys()
-                )
+            if reuse_model and model is not None:
+                if exposure_rows is not None:
+                    model.truncate_rows(exposure_rows)
+                    backend.drop_rows(exposure_rows)
+                if max_overlap is not None and previous_lineups:
+                    j = len(previous_lineups)
+                    model.add_player_row(previous_lineups[-1], -np.inf, int(max_overlap), f"max_overlap_prev_{j}")
             else:
-                # Cash / Standard: Maximize Projection
-                prob += lpSum(
-                    player_proj[pid] * x[(pid, sname)]
-                    for (pid, sname) in x.keys()
-                )
-            
-            # --- Legacy/Extra Objective Modifiers ---
-            # Even in GPP/Cash mode, user might want to subtract Ownership penalty on top
-            if settings.get("use_ownership", False):
-                own_weight = float(settings.get("ownership_weight", 0.0))
-                lev_mode = settings.get("leverage_mode", "penalize_high_own")
-                
-                if own_weight > 0:
-                    if lev_mode == "penalize_high_own":
-                        # Objective -= weight * Sum(Ownership)
-                        # We want to LOWER ownership sum, so we SUBTRACT it from max objective.
-                        # (Maximize Proj - Weight * SumOwn)
-                        prob += -1 * own_weight * lpSum(
-                            player_own[pid] * x[(pid, sname)]
-                            for (pid, sname) in x.keys()
-                        )
-                    elif lev_mode == "target_leverage":
-                        # Minimize deviation from Target Sum
-                        # This requires absolute value linearization
-                        # |SumOwn - TargetSum| 
-                        # TargetSum = target_avg * rules.lineup_size
-                        
-                        target_avg = float(settings.get("target_ownership", 0.15))
-                        target_sum = target_avg * rules.lineup_size
-                        
-                        # Define slack vars for this specific problem
-                        # Since `x` is dict keys, we need a unique name for this solve if run multiple times?
-                        # Pulp variables are global to the problem. 
-                        
-                        # Delta Pos, Delta Neg >= 0
-                        d_pos = LpVariable(f"delta_pos_{len(prob.variables())}", lowBound=0)
-                        d_neg = LpVariable(f"delta_neg_{len(prob.variables())}", lowBound=0)
-                        
-                        # Constraint: Sum(Own) - TargetSum = d_pos - d_neg
-                        prob += (
-                             lpSum(player_own[pid] * x[(pid, sname)] for (pid, sname) in x.keys()) 
-                             - target_sum 
-                             == d_pos - d_neg,
-                             "target_leverage_def"
-                        )
-                        
-                        # Objective penalty: - weight * (d_pos + d_neg)
-                        prob += -1 * own_weight * (d_pos + d_neg)
-
-            # Solve
-            solver = PULP_CBC_CMD(msg=False)
-            status = prob.solve(solver)
-
-            if status != LpStatusOptimal:
-                # Stop generating more lineups if infeasible
+                model = build_lineup_model(pool, slot_instances, rules, settings, locked=locked_idx)
+                if max_overlap is not None:
+                    for j, prev in enumerate(previous_lineups, start=1):
+                        model.add_player_row(prev, -np.inf, int(max_overlap), f"max_overlap_prev_{j}")
+            if exposure is not None:
+                exposure_rows = model.n_rows
+                for players, lb, ub, name in exposure.rows():
+                    model.add_player_row(players, lb, ub, name)
+            build_s = time.perf_counter() - t_build
+
+            # Warm start from the repaired previous lineup (None if the repair fails)
+            start = None
+            if warm_start and previous_lineups:
+                start = repair_lineup(model, previous_lineups[-1], coef, max_overlap=max_overlap, locked=locked_idx,
+                                      opponents=no_opp)
+            limit = time_left(time_limit, deadline)
+            if limit is not None and limit <= 0:
+                break  # time_budget spent
+            cold = backend.solve(model, time_limit=limit) if start is not None and warm_baseline else None
+
+            # Solve (stopped at the time limit, the best incumbent is kept)
+            result = backend.solve(model, start=start, time_limit=time_left(time_limit, deadline))
+            solve_s = result.seconds
+
+            if result.x is None:
+                # Stop generating more lineups if infeasible (or nothing found in time)
+                self.last_diagnosis = self._diagnose_failure(model, result, k + 1, settings)
                 break
 
-            # Extract lineup
-            chosen: List[Tuple[str, str]] = []
-            for (pid, sname), var in x.items():
-                if var.value() is not None and var.value() > 0.5:
-                    chosen.append((pid, sname))
-
-            # Map slot instance to slot base name
-            slot_base = {sname: sname.split("__")[0] for (sname, _elig) in slot_instances}
-
-            # Build ordered slot list: preserve YAML slot order
-            # We'll assign in the order of slot_instances list, which already respects YAML order and count expansion.
-            instance_order = [sname for (sname, _elig) in slot_instances]
-            instance_to_player: Dict[str, str] = {sname: pid for (pid, sname) in chosen}
-
-            slot_rows: List[Dict[str, Any]] = []
-            total_salary = 0
-            total_proj = 0.0
-            selected_player_ids: Set[str] = set()
-
-            for sname in instance_order:
-                pid = instance_to_player.get(sname)
-                if pid is None:
-                    continue
-                selected_player_ids.add(pid)
-                sal = player_salary[pid]
-                prj = player_proj[pid]
-                total_salary += sal
-                total_proj += prj
+            chosen = model.selected(result.x)
+            lineup = _make_lineup(rules, pool, slot_instances, chosen)
+            elapsed = time.perf_counter() - t_start
+            lineup["meta"] = {
+                "lineup_index": k + 1,
+                "build_s": build_s,
+                "solve_s": solve_s,
+                "elapsed_s": elapsed,
+                "lineups_per_s": (k + 1) / max(elapsed, 1e-9),
+                "reused_model": reuse_model and (attempt > 0 or given_model),
+                "solver": result.backend,
+                "nodes": result.nodes,
+                "warm_start": result.warm_start,
+                "optimal": result.optimal,
+                "mip_gap": result.gap,
+            }
+            if presolve_meta is not None:
+                lineup["meta"]["presolve"] = presolve_meta
+            if cold is not None and cold.x is not None:
+                lineup["meta"].update({
+                    "cold_nodes": cold.nodes,
+                    "cold_solve_s": cold.seconds,
+                    "node_savings": (cold.nodes - result.nodes) if cold.nodes is not None and result.nodes is not None else None,
+                    "time_savings_s": cold.seconds - solve_s,
+                })
+
+            previous_lineups.append(np.array(sorted(p for p, _s in chosen), dtype=int))
+            if not _sign_lineup(lineup, rules, seen):
+                continue
+            if exposure is not None:
+                exposure.record(previous_lineups[-1])
+                self.last_exposure = exposure.report()
+            k += 1
+            yield lineup
+
+    def _diagnose_failure(
+        self, model: LineupModel, result: SolveResult, lineup_index: int, settings: Dict[str, Any],
+    ) -> FeasibilityReport:
+        """Reason for a solve without a lineup; infeasible models get a conflict set (find_conflict)."""
+        t0 = time.perf_counter()
+        details = {"lineup_index": lineup_index, "status": result.status}
+        if not result.status.lower().startswith("infeasible"):
+            reason = Infeasibility("time_limit", f"No lineup {lineup_index} found within the time limit.", details=details)
+        elif not settings.get("diagnose", True):
+            reason = Infeasibility("solver", f"Lineup {lineup_index} is infeasible.", details=details)
+        else:
+            conflict = find_conflict(model, solver=settings.get("solver"))
+            reason = Infeasibility(
+                "solver",
+                f"Lineup {lineup_index} is infeasible. Conflicting constraints: {', '.join(conflict) or 'unknown'}.",
+                constraints=conflict, details=details,
+            )
+        return FeasibilityReport(reasons=[reason], seconds=time.perf_counter() - t0)
 
-                row = {
-                    "slot": slot_base[sname],
-                    "slot_instance": sname,
-                    "player_id": pid,
-                    "player_name": player_name[pid],
-                    "salary": sal,
-                    "proj_points": prj,
-                    "position": "/".join(sorted(player_pos[pid])),
-                }
-                if has_team:
-                    row["team"] = player_team.get(pid)
-                slot_rows.append(row)
-
-            lineup = {
-                "sport": rules.sport,
-                "site": rules.site,
-                "slate": rules.slate,
-                "salary_cap": rules.salary_cap,
-                "projection_column": rules.projection_column,
-                "total_salary": total_salary,
-                "total_proj": float(total_proj),
-                "slots": slot_rows,
+    def _iter_knapsack(
+        self,
+        rules: DkRules,
+        pool: PlayerPool,
+        slot_instances: List[Tuple[str, Set[str]]],
+        locked_idx: np.ndarray,
+        settings: Dict[str, Any],
+        *,
+        num_lineups: int,
+        max_overlap: Optional[int],
+        t_start: float,
+        presolve_meta: Optional[Dict[str, Any]],
+    ) -> Iterator[Dict[str, Any]]:
+        """Single-position sports: solve as a cardinality knapsack (optimizer/knapsack.py)."""
+        t_build = time.perf_counter()
+        players = np.nonzero(eligibility_mask(pool.positions, slot_instances).any(axis=1))[0]
+        if not np.isin(locked_idx, players).all():
+            return  # a locked player cannot fill the slot: infeasible
+        ks = CardinalityKnapsack(
+            player_objective(pool, settings)[players],
+            pool.salary[players],
+            len(slot_instances),
+            rules.salary_cap,
+            locked=np.searchsorted(players, locked_idx),
+        )
+        build_s = time.perf_counter() - t_build
+
+        _time_limit, deadline = _time_settings(settings, t_start)
+        seen = _signature_index(settings, len(slot_instances))
+        attempts = num_lineups + (len(seen) if seen is not None else 0)
+        t_solve = time.perf_counter()
+        nodes = 0
+        k = 0
+        for picked in ks.iter_lineups(attempts, max_overlap):
+            chosen = [(int(players[p]), s) for s, p in enumerate(picked.tolist())]
+            lineup = _make_lineup(rules, pool, slot_instances, chosen)
+            elapsed = time.perf_counter() - t_start
+            lineup["meta"] = {
+                "lineup_index": k + 1,
+                "build_s": build_s if k == 0 else 0.0,
+                "solve_s": time.perf_counter() - t_solve,
+                "elapsed_s": elapsed,
+                "lineups_per_s": (k + 1) / max(elapsed, 1e-9),
+                "reused_model": k > 0,
+                "solver": "knapsack",
+                "nodes": ks.nodes - nodes,
+                "warm_start": False,
+                "optimal": True,
+                "mip_gap": 0.0,
             }
+            if presolve_meta is not None:
+                lineup["meta"]["presolve"] = presolve_meta
+            nodes = ks.nodes
+            if _sign_lineup(lineup, rules, seen):
+                k += 1
+                yield lineup
+                if k >= num_lineups:
+                    return
+            if deadline is not None and time.perf_counter() >= deadline:
+                return
+            t_solve = time.perf_counter()
+
+    def _iter_top_k(
+        self,
+        rules: DkRules,
+        pool: PlayerPool,
+        slot_instances: List[Tuple[str, Set[str]]],
+        locked_idx: np.ndarray,
+        settings: Dict[str, Any],
+        *,
+        num_lineups: int,
+        t_start: float,
+        presolve_meta: Optional[Dict[str, Any]],
+    ) -> Iterator[Dict[str, Any]]:
+        """Exact top-K by partitioning on one reused model (optimizer/topk.py)."""
+        t_build = time.perf_counter()
+        model = build_lineup_model(pool, slot_instances, rules, dict(settings, formulation="aggregated"), locked=locked_idx)
+        search = TopKSearch(model, get_backend(settings.get("solver"), mip_gap=0.0), locked=locked_idx)
+        build_s = time.perf_counter() - t_build
+
+        solves, nodes, solve_s = 0, 0, 0.0
+        time_limit, deadline = _time_settings(settings, t_start)
+        seen = _signature_index(settings, len(slot_instances))
+        attempts = num_lineups + (len(seen) if seen is not None else 0)
+        lineups = search.iter_lineups(attempts, time_limit=time_limit, deadline=deadline)
+        k = 0
+        for _value, x, optimal in lineups:
+            lineup = _make_lineup(rules, pool, slot_instances, model.selected(x))
+            elapsed = time.perf_counter() - t_start
+            lineup["meta"] = {
+                "lineup_index": k + 1,
+                "build_s": build_s if k == 0 else 0.0,
+                "solve_s": search.solve_s - solve_s,
+                "elapsed_s": elapsed,
+                "lineups_per_s": (k + 1) / max(elapsed, 1e-9),
+                "reused_model": k > 0,
+                "solver": search.backend.name,
+                "nodes": search.nodes - nodes,
+                "warm_start": False,
+                "optimal": optimal,
+                "mip_gap": 0.0 if optimal else None,
+                "subproblems": search.solves - solves,
+            }
+            if presolve_meta is not None:
+                lineup["meta"]["presolve"] = presolve_meta
+            solves, nodes, solve_s = search.solves, search.nodes, search.solve_s
+            if _sign_lineup(lineup, rules, seen):
+                k += 1
+                yield lineup
+                if k >= num_lineups:
+                    return
+
+    def optimize_parallel(
+        self,
+        players_df: pd.DataFrame,
+        rules: DkRules,
+        *,
+        settings: Optional[Dict[str, Any]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Generate lineups from independent sub-problems across a process pool
+        (randomized projections, different locked cores, ...), then merge and
+        deduplicate them. Deterministic for a fixed settings["seed"].
+        See optimizer/parallel.py for the task settings.
+        """
+        from .parallel import optimize_parallel
 
-            lineups.append(lineup)
-            previous_lineup_player_sets.append(selected_player_ids)
+        return optimize_parallel(self, players_df, rules, settings=settings)
 
-        return lineups
+    def sim_optimize(
+        self,
+        players_df: pd.DataFrame,
+        rules: DkRules,
+        *,
+        settings: Optional[Dict[str, Any]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Sample settings["num_sims"] projection vectors from _proj / _stddev and solve
+        one lineup per draw on one compiled model, across a process pool. Returns the
+        distinct lineups, most frequent first. See optimizer/simopt.py.
+        """
+        from .simopt import sim_optimize
+
+        return sim_optimize(self, players_df, rules, settings=settings)
+
+    def late_swap(
+        self,
+        players_df: pd.DataFrame,
+        rules: DkRules,
+        entries: Any,
+        *,
+        settings: Optional[Dict[str, Any]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Re-optimize existing entries after lock: players whose games started
+        (settings["started_teams"] / ["started_games"] / ["lock_time"]) stay in
+        their slots, the other slots are re-solved from players not yet started.
+        entries: optimize_df lineups, a DK entries / import DataFrame or CSV path,
+        or an export_lineups_csv file. See optimizer/lateswap.py.
+        """
+        from .lateswap import late_swap
+
+        return late_swap(self, players_df, rules, entries, settings=settings)
 
     # --------
     # Convenience: export
@@ -730,6 +1055,7 @@ class OptimizerEngine:
         Flatten lineups to a CSV.
         Columns:
           lineup_index, slot, player_id, player_name, team?, salary, proj_points, position, total_salary, total_proj
+        player_id is the DK ID for the slot: a Showdown CPT slot carries the player's CPT entry ID.
         """
         rows: List[Dict[str, Any]] = []
         for i, lu in enumerate(lineups, start=1):
@@ -765,13 +1091,30 @@ if __name__ == "__main__":
     parser.add_argument("--sport", required=True, help="Sport name, e.g., NBA, NFL, LOL, MLB")
     parser.add_argument("--csv", required=True, help="Path to player CSV")
     parser.add_argument("--rules-dir", default="rules/dk", help="Rules directory (default: rules/dk)")
+    parser.add_argument("--cache-dir", default=None, help="Lineup cache directory; reruns with the same inputs are instant")
     parser.add_argument("--num-lineups", type=int, default=None, help="Number of lineups to generate (default: from YAML)")
     parser.add_argument("--max-overlap", type=int, default=None, help="Max shared players vs previous lineups")
     parser.add_argument("--out", default="results/lineups.csv", help="Output CSV path")
+    parser.add_argument("--rebuild-model", action="store_true", help="Rebuild the MILP for every lineup (no model reuse)")
+    parser.add_argument("--solver", default=None, help="Solver backend: cbc (default) | highs")
+    parser.add_argument("--engine", default=None, help="auto (default) | milp | knapsack (single-position sports)")
+    parser.add_argument("--time-limit", type=float, default=None, help="Seconds per lineup solve (keeps the best incumbent)")
+    parser.add_argument("--time-budget", type=float, default=None, help="Seconds for the whole batch")
+    parser.add_argument("--mip-gap", type=float, default=None, help="Relative MIP gap, e.g. 0.01")
+    parser.add_argument("--top-k", action="store_true", help="The num-lineups best distinct lineups, best first")
+    parser.add_argument("--max-exposure", type=float, default=None, help="Max fraction of lineups per player, e.g. 0.4")
+    parser.add_argument("--presolve", action="store_true", help="Drop dominated players before building the model")
+    parser.add_argument("--warm-start", action="store_true", help="Start each solve from the repaired previous lineup")
+    parser.add_argument("--parallel", action="store_true", help="Randomized-projection lineups solved across a process pool")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes for --parallel (default: all cores)")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed for --parallel")
+    parser.add_argument("--late-swap", default=None, help="Entries CSV (DK entries / import file or --out file) to late swap")
+    parser.add_argument("--started-teams", default=None, help="Comma-separated teams already started, for --late-swap")
+    parser.add_argument("--lock-time", default=None, help="Games starting at or before this time have started, for --late-swap")
 
     args = parser.parse_args()
 
-    engine = OptimizerEngine(rules_dir=args.rules_dir)
+    engine = OptimizerEngine(rules_dir=args.rules_dir, cache_dir=args.cache_dir)
     rules = engine.load_rules(args.sport)
     df = engine.load_players_df(args.csv, rules, sport=args.sport)
 
@@ -780,7 +1123,52 @@ if __name__ == "__main__":
         settings["num_lineups"] = args.num_lineups
     if args.max_overlap is not None:
         settings["max_overlap"] = args.max_overlap
-
-    lineups = engine.optimize_df(df, rules, settings=settings)
+    if args.rebuild_model:
+        settings["reuse_model"] = False
+    if args.solver is not None:
+        settings["solver"] = args.solver
+    if args.warm_start:
+        settings["warm_start"] = True
+    if args.presolve:
+        settings["presolve"] = True
+    if args.engine is not None:
+        settings["engine"] = args.engine
+    if args.top_k:
+        settings["top_k"] = True
+    for key in ("time_limit", "time_budget", "mip_gap", "max_exposure"):
+        if getattr(args, key) is not None:
+            settings[key] = getattr(args, key)
+
+    if args.late_swap:
+        settings["workers"] = args.workers
+        settings["started_teams"] = [t for t in (args.started_teams or "").split(",") if t.strip()]
+        settings["lock_time"] = args.lock_time
+        lineups = engine.late_swap(df, rules, args.late_swap, settings=settings)
+    elif args.parallel:
+        settings["workers"] = args.workers
+        settings["seed"] = args.seed
+        lineups = engine.optimize_parallel(df, rules, settings=settings)
+    else:
+        lineups = engine.optimize_df(df, rules, settings=settings)
     engine.export_lineups_csv(lineups, args.out)
     print(f"Generated {len(lineups)} lineup(s) -> {args.out}")
+    if lineups:
+        build_total = sum(lu["meta"]["build_s"] for lu in lineups)
+        solve_total = sum(lu["meta"]["solve_s"] for lu in lineups)
+        print(f"Timing: build={build_total:.3f}s solve={solve_total:.3f}s")
+        if args.late_swap:
+            changed = sum(lu["meta"]["changed"] for lu in lineups)
+            kept = sum(lu["meta"]["status"] != "swapped" for lu in lineups)
+            print(f"Late swap: {changed} entr(ies) changed, {kept} could not be swapped; "
+                  f"{lineups[0]['meta']['entries_per_s']:.1f} entries/s")
+        elif not args.parallel:
+            print(f"Throughput: {lineups[-1]['meta']['lineups_per_s']:.1f} lineups/s")
+        not_proven = sum(not lu["meta"].get("optimal", True) for lu in lineups)
+        if not_proven:
+            print(f"Not proven optimal (time limit): {not_proven} lineup(s)")
+        if "cache" in lineups[0]["meta"]:
+            c = lineups[0]["meta"]["cache"]
+            print(f"Cache: {'hit' if c['hit'] else 'miss'} ({c['key']})")
+    for row in engine.last_exposure or []:
+        print(f"Exposure {row['name']}: {100 * row['exposure']:.0f}% "
+              f"(requested {100 * row['min_exposure']:.0f}-{100 * row['max_exposure']:.0f}%)")
@@ -0,0 +1,172 @@
+# src/optimizer/exposure.py
+# Portfolio exposure bounds for sequential lineup generation
+#
+# Settings, as fractions of num_lineups:
+#   min_exposure / max_exposure:           {player_id: fraction}; max_exposure can
+#                                          also be one float for every player
+#   team_min_exposure / team_max_exposure: {team: fraction} of lineups with at
+#                                          least one player from the team
+# Over N lineups a fraction f allows at most floor(f * N) lineups (max) and
+# needs at least ceil(f * N) (min).
+#
+# The lineups are still solved one at a time, but each solve gets rows built
+# from the counts so far (ExposureTracker.rows):
+#   - a player / team at its max count is banned:       sum x <= 0
+#   - a player / team behind its min schedule is forced: sum x >= 1
+# The schedule is pro rata: after k of N lineups, floor(min_count * k / N)
+# appearances. It never lags what the remaining lineups can still make up,
+# and it spreads forced players over the run instead of piling them into the
+# last lineups, where they would compete for the same slots.
+# The engine drops the previous lineup's exposure rows before adding the new
+# ones, so a player is forced only while behind schedule.
+#
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .model import PlayerPool
+
+EXPOSURE_KEYS = ("min_exposure", "max_exposure", "team_min_exposure", "team_max_exposure")
+
+
+def has_exposure_bounds(settings: Dict[str, Any]) -> bool:
+    return any(settings.get(k) not in (None, {}) for k in EXPOSURE_KEYS)
+
+
+def _fraction(value: Any, key: str) -> float:
+    f = float(value)
+    if not 0.0 <= f <= 1.0:
+        raise ValueError(f"{key} values are fractions of the portfolio in [0, 1], got {value!r}")
+    return f
+
+
+@dataclass
+class ExposureBounds:
+    """Requested exposure fractions per player and per team (defaults 0 and 1)."""
+
+    player_min: np.ndarray
+    player_max: np.ndarray
+    team_min: np.ndarray
+    team_max: np.ndarray
+    all_players_max: Optional[float] = None    # max_exposure given as one float
+
+    @classmethod
+    def from_settings(cls, pool: PlayerPool, settings: Dict[str, Any]) -> "ExposureBounds":
+        player_min = np.zeros(pool.size)
+        player_max = np.ones(pool.size)
+        team_min = np.zeros(len(pool.teams))
+        team_max = np.ones(len(pool.teams))
+
+        max_exp = settings.get("max_exposure")
+        if isinstance(max_exp, (int, float)):
+            player_max[:] = _fraction(max_exp, "max_exposure")
+        else:
+            for pid, f in (max_exp or {}).items():
+                player_max[pool.index_of([pid])] = _fraction(f, "max_exposure")
+        min_exp = settings.get("min_exposure") or {}
+        missing = [str(pid) for pid in min_exp if not len(pool.index_of([pid]))]
+        if missing:
+            raise ValueError(f"min_exposure player_ids not found in input after exclusions: {missing}")
+        for pid, f in min_exp.items():
+            player_min[pool.index_of([pid])] = _fraction(f, "min_exposure")
+
+        team_index = {t: i for i, t in enumerate(pool.teams)}
+        for key, arr in (("team_min_exposure", team_min), ("team_max_exposure", team_max)):
+            for team, f in (settings.get(key) or {}).items():
+                t = team_index.get(str(team).strip().upper())
+                if t is None:
+                    if key == "team_min_exposure" and float(f) > 0:
+                        raise ValueError(f"team_min_exposure team not in the player pool: {team}")
+                    continue
+                arr[t] = _fraction(f, key)
+
+        if (player_min > player_max).any() or (team_min > team_max).any():
+            raise ValueError("min exposure above max exposure")
+        all_max = float(max_exp) if isinstance(max_exp, (int, float)) else None
+        return cls(player_min, player_max, team_min, team_max, all_max)
+
+
+class ExposureTracker:
+    """Exposure counts of a sequential run and the rows the next lineup must satisfy."""
+
+    def __init__(self, pool: PlayerPool, settings: Dict[str, Any], num_lineups: int) -> None:
+        self.pool = pool
+        self.num_lineups = int(num_lineups)
+        self.bounds = ExposureBounds.from_settings(pool, settings)
+        n = self.num_lineups
+        b = self.bounds
+        # Fractions -> lineup counts (tolerance so 0.3 * 10 is 3, not 2.9999)
+        self.player_min_count = np.ceil(b.player_min * n - 1e-9).astype(int)
+        self.player_max_count = np.floor(b.player_max * n + 1e-9).astype(int)
+        self.team_min_count = np.ceil(b.team_min * n - 1e-9).astype(int)
+        self.team_max_count = np.floor(b.team_max * n + 1e-9).astype(int)
+        self.player_count = np.zeros(pool.size, dtype=int)
+        self.team_count = np.zeros(len(pool.teams), dtype=int)
+        self.lineups = 0
+        self._team_players = [np.nonzero(pool.team_code == t)[0] for t in range(len(pool.teams))]
+
+    @property
+    def active(self) -> bool:
+        return bool(
+            (self.player_min_count > 0).any() or (self.player_max_count < self.num_lineups).any()
+            or (self.team_min_count > 0).any() or (self.team_max_count < self.num_lineups).any()
+        )
+
+    def _behind(self, min_count: np.ndarray, count: np.ndarray) -> np.ndarray:
+        # Appearances due once the next lineup is built
+        due = (min_count * (self.lineups + 1)) // self.num_lineups
+        return count < due
+
+    def rows(self) -> List[Tuple[np.ndarray, float, float, str]]:
+        """(players, lb, ub, name) rows for the next lineup, in LineupModel.add_player_row order."""
+        out: List[Tuple[np.ndarray, float, float, str]] = []
+        ids, teams = self.pool.ids, self.pool.teams
+        for p in np.nonzero(self.player_count >= self.player_max_count)[0].tolist():
+            out.append((np.array([p]), -np.inf, 0.0, f"max_exposure_{ids[p]}"))
+        for p in np.nonzero(self._behind(self.player_min_count, self.player_count))[0].tolist():
+            out.append((np.array([p]), 1.0, np.inf, f"min_exposure_{ids[p]}"))
+        for t in np.nonzero(self.team_count >= self.team_max_count)[0].tolist():
+            out.append((self._team_players[t], -np.inf, 0.0, f"team_max_exposure_{teams[t]}"))
+        for t in np.nonzero(self._behind(self.team_min_count, self.team_count))[0].tolist():
+            out.append((self._team_players[t], 1.0, np.inf, f"team_min_exposure_{teams[t]}"))
+        return out
+
+    def record(self, players: np.ndarray) -> None:
+        """Count a finished lineup (player indices)."""
+        players = np.asarray(players, dtype=int)
+        self.player_count[players] += 1
+        codes = np.unique(self.pool.team_code[players])
+        self.team_count[codes[codes >= 0]] += 1
+        self.lineups += 1
+
+    def report(self) -> List[Dict[str, Any]]:
+        """
+        Requested vs achieved exposure for every bounded player and team.
+        "exposure" is over the lineups built so far; "ok" compares the counts
+        with the bounds for the full num_lineups.
+        """
+        b, n = self.bounds, max(self.lineups, 1)
+        out: List[Dict[str, Any]] = []
+
+        def add(kind: str, key: str, name: str, lo: float, hi: float, count: int, lo_n: int, hi_n: int) -> None:
+            out.append({
+                "kind": kind, "id": key, "name": name,
+                "min_exposure": lo, "max_exposure": hi,
+                "count": count, "exposure": count / n,
+                "ok": lo_n <= count <= hi_n,
+            })
+
+        listed = (b.player_min > 0) | (b.player_max < 1)
+        if b.all_players_max is not None:
+            # One cap for everybody: report the players it held back
+            listed = (b.player_min > 0) | (self.player_count >= self.player_max_count)
+        for p in np.nonzero(listed)[0].tolist():
+            add("player", str(self.pool.ids[p]), str(self.pool.names[p]), float(b.player_min[p]), float(b.player_max[p]),
+                int(self.player_count[p]), int(self.player_min_count[p]), int(self.player_max_count[p]))
+        for t in np.nonzero((b.team_min > 0) | (b.team_max < 1))[0].tolist():
+            add("team", self.pool.teams[t], self.pool.teams[t], float(b.team_min[t]), float(b.team_max[t]),
+                int(self.team_count[t]), int(self.team_min_count[t]), int(self.team_max_count[t]))
+        return out
@@ -0,0 +1,288 @@
+# src/optimizer/feasibility.py
+# Infeasibility pre-checks and conflict diagnosis
+#
+# check_feasibility runs before any MILP is built. Each check is a relaxation of
+# the lineup model, so a failed check proves the model infeasible:
+#   - slot_coverage:  too few eligible players for a set of slot types (Hall)
+#   - locks_*:        locked players that cannot share one roster
+#   - team_limits:    max_from_team / min_teams cannot be met by the pool
+#   - stacks:         too few teams / games with enough stack players, or
+#                     opponent data missing for game / bring_back stacks
+#   - salary_cap / total_ownership_cap / max_chalk_count / min_total_ceiling:
+#                     the best roster for that one quantity (locks included,
+#                     min-cost slot assignment) already violates the limit
+# Passing every check does not prove feasibility (limits can conflict with
+# each other); the solver then decides.
+#
+# find_conflict explains a model the solver reported infeasible: a deletion
+# filter over constraint groups (salary cap, each lock, team limits, overlap
+# cuts, ...) that keeps only groups whose removal makes the model feasible.
+# The result is an irreducible conflicting set at group level (IIS-style).
+#
+from __future__ import annotations
+
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from .assignment import assign_slots, min_cost_assignment
+from .model import LineupModel, PlayerPool, eligibility_mask, hall_coverage, slot_multipliers
+from .solvers import get_backend
+from .stacking import stack_groups, stack_members, stack_rules
+
+
+@dataclass
+class Infeasibility:
+    code: str
+    message: str
+    constraints: List[str] = field(default_factory=list)   # model row names / groups involved
+    details: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class FeasibilityReport:
+    reasons: List[Infeasibility]
+    seconds: float
+
+    @property
+    def feasible(self) -> bool:
+        """True when no check found a conflict (not a proof of feasibility)."""
+        return not self.reasons
+
+    def summary(self) -> str:
+        return "; ".join(r.message for r in self.reasons) or "no conflict found"
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"feasible": self.feasible, "seconds": self.seconds, "reasons": [asdict(r) for r in self.reasons]}
+
+
+def _best_roster(
+    values: np.ndarray, elig: np.ndarray, locked: np.ndarray, *, maximize: bool = False,
+    slot_mult: Optional[np.ndarray] = None,
+) -> Optional[float]:
+    """
+    Min (or max) total of `values` over valid rosters containing every locked
+    player. slot_mult scales a player's value per slot instance.
+    """
+    sign = -1.0 if maximize else 1.0
+    mult = slot_mult if slot_mult is not None else np.ones(elig.shape[1])
+    scaled = values[None, :] * mult[:, None]
+    cost = np.where(elig.T, sign * scaled, np.inf)
+    if len(locked):
+        # A discount larger than any roster total forces locked players in
+        spread = float(np.abs(values).sum() * np.abs(mult).max()) + 1.0
+        cost[:, locked] -= spread
+    picked = min_cost_assignment(cost)
+    if picked is None or (len(locked) and not np.isin(locked, picked).all()):
+        return None
+    return float(scaled[np.arange(len(picked)), picked].sum())
+
+
+def check_feasibility(
+    pool: PlayerPool,
+    slot_instances: Sequence[Tuple[str, Set[str]]],
+    rules: Any,
+    settings: Dict[str, Any],
+    *,
+    locked: Optional[np.ndarray] = None,
+) -> FeasibilityReport:
+    """Vectorized necessary conditions for a lineup to exist. Runs in milliseconds."""
+    t0 = time.perf_counter()
+    reasons: List[Infeasibility] = []
+    locked = np.asarray(locked if locked is not None else [], dtype=int)
+    lock_rows = [f"lock_{pool.ids[p]}" for p in locked]
+    n_slots = len(slot_instances)
+    elig = eligibility_mask(pool.positions, slot_instances)
+    usable = elig.any(axis=1)
+
+    # Slot coverage: enough players overall and for every set of slot types
+    if usable.sum() < n_slots:
+        reasons.append(Infeasibility(
+            "slot_coverage", f"Only {int(usable.sum())} eligible players for {n_slots} slots.",
+            details={"eligible": int(usable.sum()), "needed": n_slots},
+        ))
+    else:
+        for mask, demand, name in hall_coverage(elig[usable], slot_instances):
+            if mask.sum() < demand:
+                slots = name[len("cover_"):].replace("+", ", ")
+                reasons.append(Infeasibility(
+                    "slot_coverage", f"Only {int(mask.sum())} players can fill {slots} ({demand} needed).",
+                    constraints=[name], details={"slots": slots, "eligible": int(mask.sum()), "needed": demand},
+                ))
+
+    # Locks
+    if len(locked):
+        if len(locked) > n_slots:
+            reasons.append(Infeasibility(
+                "locks_count", f"{len(locked)} locked players for {n_slots} slots.", constraints=lock_rows,
+            ))
+        elif assign_slots(elig[locked].T) is None:
+            # assign_slots matches slots to players; on the transpose, players to slots
+            no_slot = [str(pool.names[p]) for p in locked if not elig[p].any()]
+            msg = (f"Locked players fit no slot: {', '.join(no_slot)}." if no_slot
+                   else "Locked players cannot all be given distinct slots.")
+            reasons.append(Infeasibility("locks_slots", msg, constraints=lock_rows))
+
+    # Team limits
+    limits = getattr(rules, "team_limits", None)
+    if pool.has_team and limits is not None:
+        has_team = pool.team_code >= 0
+        per_team = np.bincount(pool.team_code[usable & has_team], minlength=len(pool.teams))
+        teamless = int((usable & ~has_team).sum())
+        max_team = limits.max_from_team
+        if max_team is not None:
+            capacity = int(np.minimum(per_team, int(max_team)).sum()) + teamless
+            if capacity < n_slots:
+                reasons.append(Infeasibility(
+                    "team_limits", f"max_from_team={max_team} leaves room for only {capacity} of {n_slots} players.",
+                    constraints=["max_from_team"], details={"capacity": capacity},
+                ))
+            if len(locked):
+                lock_counts = np.bincount(pool.team_code[locked[has_team[locked]]], minlength=len(pool.teams))
+                for t in np.nonzero(lock_counts > int(max_team))[0]:
+                    reasons.append(Infeasibility(
+                        "locks_team_limit",
+                        f"{int(lock_counts[t])} locked players from {pool.teams[t]} (max_from_team={max_team}).",
+                        constraints=[f"lock_{pool.ids[p]}" for p in locked if pool.team_code[p] == t]
+                        + [f"max_from_team_{pool.teams[t]}"],
+                    ))
+        if limits.min_teams is not None and int((per_team > 0).sum()) < int(limits.min_teams):
+            reasons.append(Infeasibility(
+                "team_limits", f"min_teams={limits.min_teams} but only {int((per_team > 0).sum())} teams have eligible players.",
+                constraints=["min_teams"],
+            ))
+
+    # Stacks: enough teams / games with enough eligible players, and opponent data
+    for rule in stack_rules(rules, settings):
+        row = f"stack_{rule.name}"
+        members, _anchors = stack_members(pool, rule)
+        if rule.type in ("game", "bring_back") and not pool.has_games:
+            reasons.append(Infeasibility(
+                "stacks", f"Stack '{rule.name}' ({rule.type}) needs opponent / game data (opp, game_id or Game Info).",
+                constraints=[row],
+            ))
+            continue
+        if rule.type not in ("team", "game"):
+            continue
+        max_team = limits.max_from_team if limits is not None and rule.type == "team" else None
+        if max_team is not None and int(max_team) < rule.min_players:
+            reasons.append(Infeasibility(
+                "stacks", f"Stack '{rule.name}' needs {rule.min_players} players from one team (max_from_team={max_team}).",
+                constraints=[row, "max_from_team"],
+            ))
+            continue
+        group, labels = stack_groups(pool, rule)
+        sizes = np.bincount(group[usable & members & (group >= 0)], minlength=len(labels))
+        stacked = int((sizes >= rule.min_players).sum())
+        if stacked < rule.count or rule.min_players * rule.count > n_slots:
+            reasons.append(Infeasibility(
+                "stacks",
+                f"Stack '{rule.name}' needs {rule.count} {rule.type}(s) with {rule.min_players} players; "
+                f"{stacked} qualify in the pool.",
+                constraints=[row], details={"qualifying": stacked, "needed": rule.count},
+            ))
+
+    # Single-quantity bounds over valid rosters (locks included)
+    sal_mult, pts_mult = slot_multipliers(rules.slots)
+    if len(sal_mult) != n_slots:
+        sal_mult = pts_mult = np.ones(n_slots)
+    bounds = [("salary_cap", pool.salary, float(rules.salary_cap), False, "salary", sal_mult)]
+    if settings.get("total_ownership_cap") is not None:
+        bounds.append(("total_ownership_cap", pool.own, float(settings["total_ownership_cap"]), False, "ownership", None))
+    if settings.get("max_chalk_count") is not None:
+        is_chalk = (pool.own >= float(settings.get("chalk_threshold", 0.20))).astype(float)
+        bounds.append(("max_chalk_count", is_chalk, float(settings["max_chalk_count"]), False, "chalk players", None))
+    if settings.get("min_total_ceiling") is not None:
+        bounds.append(("min_total_ceiling", pool.ceiling, float(settings["min_total_ceiling"]), True, "ceiling", pts_mult))
+
+    if not reasons:   # the rosters below need slot coverage and compatible locks
+        for row, values, limit, maximize, label, mult in bounds:
+            best = _best_roster(values, elig, locked, maximize=maximize, slot_mult=mult)
+            if best is None:
+                continue
+            if (best < limit - 1e-9) if maximize else (best > limit + 1e-9):
+                # Without the locks, is the limit reachable? Then the locks are part of the conflict.
+                alone = _best_roster(values, elig, locked[:0], maximize=maximize, slot_mult=mult) if len(locked) else best
+                ok_alone = alone is not None and ((alone >= limit - 1e-9) if maximize else (alone <= limit + 1e-9))
+                word = "highest" if maximize else "lowest"
+                reasons.append(Infeasibility(
+                    row, f"The {word} possible {label} of a valid roster is {best:g} ({row} = {limit:g}).",
+                    constraints=[row] + (lock_rows if ok_alone else []),
+                    details={"best": best, "limit": limit},
+                ))
+
+    return FeasibilityReport(reasons=reasons, seconds=time.perf_counter() - t0)
+
+
+# ----------------------------
+# Conflict diagnosis (after a failed solve)
+# ----------------------------
+
+# Row name prefix -> constraint group. Rows outside these groups define the
+# lineup itself (slot fill, player once, coverage, team indicators) and are kept.
+_GROUP_PREFIXES = (
+    ("salary_cap", "salary_cap"),
+    ("lock_", None),                      # one group per lock
+    ("total_ownership_cap", "total_ownership_cap"),
+    ("min_total_ceiling", "min_total_ceiling"),
+    ("max_chalk_count", "max_chalk_count"),
+    ("max_from_team_", "max_from_team"),
+    ("min_teams", "min_teams"),
+    ("max_overlap_prev_", "max_overlap"),
+    ("min_exposure_", None),              # one group per player / team exposure row
+    ("max_exposure_", None),
+    ("team_min_exposure_", None),
+    ("team_max_exposure_", None),
+    ("stack_", None),                     # one group per stack rule (stack_<name>)
+    ("no_opp_", None),                    # one group per no_opponents rule
+)
+
+
+def constraint_group(row_name: str) -> Optional[str]:
+    """Constraint group of a model row, or None for structural rows."""
+    for prefix, group in _GROUP_PREFIXES:
+        if row_name.startswith(prefix):
+            return group or row_name.split(":")[0]
+    return None
+
+
+def _with_rows(model: LineupModel, keep: np.ndarray) -> LineupModel:
+    """Copy of model with only the rows in `keep` and a zero objective (feasibility only)."""
+    lengths = np.diff(model.indptr)
+    nz = np.repeat(keep, lengths)
+    indptr = np.concatenate([[0], np.cumsum(lengths[keep])])
+    return LineupModel(
+        pool=model.pool, slot_instances=model.slot_instances, n_x=model.n_x,
+        col_player=model.col_player, col_slot=model.col_slot, c=np.zeros(model.n_cols),
+        col_lb=model.col_lb, col_ub=model.col_ub, integrality=model.integrality,
+        indptr=indptr, indices=model.indices[nz], data=model.data[nz],
+        row_lb=model.row_lb[keep], row_ub=model.row_ub[keep],
+        row_names=[n for n, k in zip(model.row_names, keep.tolist()) if k],
+        elig=model.elig, formulation=model.formulation, aux_names=list(model.aux_names),
+    )
+
+
+def find_conflict(model: LineupModel, *, solver: Optional[str] = None, time_limit: Optional[float] = 10.0) -> List[str]:
+    """
+    Deletion filter over constraint groups of an infeasible model. Returns an
+    irreducible set of groups that is infeasible together with the structural
+    rows, or [] if the model solves (or no group can be blamed).
+    A sub-solve that hits time_limit counts as feasible, which keeps the group.
+    """
+    groups = [constraint_group(n) for n in model.row_names]
+    order = list(dict.fromkeys(g for g in groups if g is not None))
+
+    def infeasible(active: Set[str]) -> bool:
+        keep = np.array([g is None or g in active for g in groups], dtype=bool)
+        result = get_backend(solver).solve(_with_rows(model, keep), time_limit=time_limit)
+        return result.x is None and result.status.lower().startswith("infeasible")
+
+    active = set(order)
+    if not infeasible(active):
+        return []
+    for g in order:
+        if infeasible(active - {g}):
+            active.discard(g)
+    return [g for g in order if g in active]
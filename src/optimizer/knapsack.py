@@ -0,0 +1,367 @@
+# src/optimizer/knapsack.py
+# Fast engine for single-position sports (GOLF / NASCAR / TENNIS)
+#
+# With one slot type (e.g. 6 x G) and no binding team rules, a lineup is any
+# k players under the salary cap: a cardinality-constrained knapsack. This
+# module solves it with a depth-first branch-and-bound over players sorted by
+# objective value, without building a MILP:
+#   - bound: a NumPy DP over salary buckets gives, for every suffix of the
+#     player order, count r and remaining salary, the best achievable value
+#     (exact for DK salaries, which are multiples of 100)
+#   - the last player of a lineup is picked with one NumPy mask over the suffix
+#
+# Multi-lineup runs with max_overlap enumerate every lineup in a value band
+# [lo, hi) in one search, sort them and accept greedily against max_overlap,
+# then move on to the next band down. This matches the sequential MILP (the
+# k-th MILP lineup is the best lineup compatible with lineups 1..k-1) up to
+# ties. Band widths adapt to the enumeration budget; if even a tiny band is too
+# large, the remaining lineups are solved one at a time with overlap pruning
+# inside the search.
+#
+from __future__ import annotations
+
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .exposure import has_exposure_bounds
+from .model import has_slot_multipliers
+from .opponents import opponent_rules
+from .stacking import stack_rules
+
+ENUM_BUDGET = 200_000
+
+
+MAX_BUCKETS = 5_000
+
+
+def _salary_unit(values: np.ndarray) -> float:
+    """Largest unit dividing every salary (and the cap), coarsened to at most MAX_BUCKETS buckets."""
+    ints = np.round(values).astype(np.int64)
+    unit = float(np.gcd.reduce(ints)) if np.allclose(values, ints) and ints.any() else 1.0
+    cap = float(values[-1])
+    if cap / unit > MAX_BUCKETS:
+        unit = cap / MAX_BUCKETS
+    return max(unit, 1e-9)
+
+
+class CardinalityKnapsack:
+    """Pick exactly k of n players, salary <= cap, maximizing value. Locked players are forced in."""
+
+    def __init__(
+        self,
+        value: np.ndarray,
+        salary: np.ndarray,
+        k: int,
+        cap: float,
+        *,
+        locked: Optional[Sequence[int]] = None,
+    ) -> None:
+        n = len(value)
+        locked_arr = np.unique(np.asarray(locked if locked is not None else [], dtype=int))
+        free = np.setdiff1d(np.arange(n), locked_arr)
+
+        # Search space: free players sorted by value desc (ties by index for determinism)
+        order = free[np.lexsort((free, -value[free]))]
+        self.n_players = n
+        self.order = order
+        self.value = value[order].astype(float)
+        self.salary = salary[order].astype(float)
+        self.locked = locked_arr
+        self.k = int(k) - len(locked_arr)
+        self.cap = float(cap) - float(salary[locked_arr].sum())
+        self.base_value = float(value[locked_arr].sum())
+        self.nodes = 0
+
+        # Salary buckets: exact when salaries share a unit (DK: multiples of 100),
+        # otherwise rounded down, which keeps the bound optimistic.
+        m = len(order)
+        self.unit = _salary_unit(np.append(self.salary, self.cap))
+        self.w = np.floor(self.salary / self.unit + 1e-9).astype(int)
+        n_buckets = int(np.floor(max(self.cap, 0.0) / self.unit + 1e-9)) + 1
+
+        # bound[i, r, b]: best value of r players from order[i:] with bucket weight <= b
+        r_max = max(self.k, 0)
+        bound = np.full((m + 1, r_max + 1, n_buckets), -np.inf)
+        bound[m, 0, :] = 0.0
+        for i in range(m - 1, -1, -1):
+            bound[i] = bound[i + 1]
+            w, v = self.w[i], self.value[i]
+            if w < n_buckets:
+                take = bound[i + 1, :-1, : n_buckets - w] + v
+                np.maximum(bound[i, 1:, w:], take, out=bound[i, 1:, w:])
+        self.bound = bound
+
+    @property
+    def feasible_size(self) -> bool:
+        return 0 <= self.k <= len(self.order) and self.cap >= 0
+
+    def _children(self, start: int, r: int, val: float, rem: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Candidates for the next pick at a node: (index, upper bound, salary left), affordable only."""
+        i = np.arange(start, len(self.order) - r + 1)
+        rem_after = rem - self.salary[i]
+        ok = rem_after >= 0
+        i, rem_after = i[ok], rem_after[ok]
+        b = np.floor(rem_after / self.unit + 1e-9).astype(int)
+        return i, val + self.value[i] + self.bound[i + 1, r - 1, b], rem_after
+
+    def _to_players(self, picks: Sequence[int]) -> np.ndarray:
+        return np.sort(np.concatenate([self.locked, self.order[list(picks)]]).astype(int))
+
+    # ------------------------------------------------------------------
+    # Enumeration of all lineups with value >= threshold
+    # ------------------------------------------------------------------
+    def enumerate(
+        self,
+        threshold: float,
+        budget: int = ENUM_BUDGET,
+        *,
+        upper: float = np.inf,
+    ) -> Tuple[List[Tuple[float, np.ndarray]], bool]:
+        """
+        All lineups with threshold <= value < upper as (value, sorted player
+        indices), best first. Returns (lineups, complete); complete is False when
+        the budget stopped the search early.
+        """
+        if not self.feasible_size:
+            return [], True
+        if self.k == 0:
+            ok = threshold <= self.base_value < upper
+            return ([(self.base_value, self._to_players([]))] if ok else []), True
+
+        k, m = self.k, len(self.order)
+        need0 = threshold - self.base_value
+        upper0 = upper - self.base_value
+        picks: List[int] = []
+        # Leaves are collected in blocks: (picks so far, last-pick indices, values)
+        blocks: List[Tuple[Tuple[int, ...], np.ndarray, np.ndarray]] = []
+        found = 0
+        stopped = False
+
+        def rec(start: int, r: int, val: float, rem: float) -> None:
+            nonlocal found, stopped
+            self.nodes += 1
+            if r == 1:
+                sl = slice(start, m)
+                leaf = val + self.value[sl]
+                ok = (self.salary[sl] <= rem) & (leaf >= need0) & (leaf < upper0)
+                js = np.nonzero(ok)[0] + start
+                if len(js):
+                    blocks.append((tuple(picks), js, val + self.value[js]))
+                    found += len(js)
+                    stopped = found > budget
+                return
+            i, ub, rem_after = self._children(start, r, val, rem)
+            keep = ub >= need0
+            for j, ra in zip(i[keep].tolist(), rem_after[keep].tolist()):
+                if stopped:
+                    return
+                picks.append(j)
+                rec(j + 1, r - 1, val + self.value[j], ra)
+                picks.pop()
+
+        rec(0, k, 0.0, self.cap)
+        if not blocks:
+            return [], not stopped
+
+        sizes = np.array([len(js) for _p, js, _v in blocks])
+        prefix = np.repeat(np.array([p for p, _js, _v in blocks], dtype=int).reshape(len(blocks), k - 1), sizes, axis=0)
+        picks_arr = np.hstack([prefix, np.concatenate([js for _p, js, _v in blocks])[:, None]])
+        values = np.concatenate([v for _p, _js, v in blocks])
+        # Best first; ties broken by pick order (search order) for determinism
+        order = np.lexsort(tuple(picks_arr[:, c] for c in range(k - 1, -1, -1)) + (-values,))
+        players = self.order[picks_arr[order]]
+        if len(self.locked):
+            players = np.hstack([np.broadcast_to(self.locked, (len(order), len(self.locked))), players])
+        players = np.sort(players, axis=1)
+        return list(zip((values[order] + self.base_value).tolist(), players)), not stopped
+
+    # ------------------------------------------------------------------
+    # Single best lineup under overlap cuts
+    # ------------------------------------------------------------------
+    def best(
+        self,
+        previous: Optional[np.ndarray] = None,
+        max_overlap: Optional[int] = None,
+    ) -> Optional[Tuple[float, np.ndarray]]:
+        """
+        previous: bool matrix (n_previous x n_players) of earlier lineups.
+        Returns the best lineup sharing at most max_overlap players with each.
+        """
+        if not self.feasible_size:
+            return None
+        k, m = self.k, len(self.order)
+        P = None
+        counts0 = None
+        if previous is not None and len(previous) and max_overlap is not None:
+            P = previous[:, self.order]
+            counts0 = previous[:, self.locked].sum(axis=1) if len(self.locked) else np.zeros(len(previous), dtype=int)
+            if np.any(counts0 > max_overlap):
+                return None
+
+        best_val = -np.inf
+        best_picks: Optional[Tuple[int, ...]] = None
+        picks: List[int] = []
+
+        def rec(start: int, r: int, val: float, rem: float, counts: Optional[np.ndarray]) -> None:
+            nonlocal best_val, best_picks
+            self.nodes += 1
+            if r == 0:
+                if val > best_val:
+                    best_val, best_picks = val, tuple(picks)
+                return
+            if r == 1:
+                sl = slice(start, m)
+                ok = self.salary[sl] <= rem
+                if P is not None:
+                    full = counts >= max_overlap
+                    if full.any():
+                        ok &= ~P[full, sl].any(axis=0)
+                hits = np.nonzero(ok)[0]
+                if len(hits):
+                    j = int(hits[0]) + start  # sorted by value: first hit is best
+                    if val + self.value[j] > best_val:
+                        best_val, best_picks = val + self.value[j], tuple(picks) + (j,)
+                return
+            i, ub, rem_after = self._children(start, r, val, rem)
+            for j, u, ra in zip(i.tolist(), ub.tolist(), rem_after.tolist()):
+                if u <= best_val:
+                    continue
+                c = None
+                if P is not None:
+                    c = counts + P[:, j]
+                    if np.any(c > max_overlap):
+                        continue
+                picks.append(j)
+                rec(j + 1, r - 1, val + self.value[j], ra, c)
+                picks.pop()
+
+        rec(0, k, 0.0, self.cap, counts0)
+        if best_picks is None:
+            return None
+        return best_val + self.base_value, self._to_players(best_picks)
+
+    # ------------------------------------------------------------------
+    # Sequential lineups (same semantics as OptimizerEngine.optimize_df)
+    # ------------------------------------------------------------------
+    def iter_lineups(
+        self,
+        num: int,
+        max_overlap: Optional[int] = None,
+        *,
+        budget: int = ENUM_BUDGET,
+    ) -> Iterator[np.ndarray]:
+        """
+        Yield up to num lineups (sorted player indices), each the best one sharing
+        at most max_overlap players with every earlier lineup. Without max_overlap
+        the best lineup is repeated, as in the MILP loop with unique off.
+        """
+        first = self.best()
+        if first is None:
+            return
+        if max_overlap is None:
+            for _ in range(num):
+                yield first[1]
+            return
+
+        members = np.zeros((num, self.n_players), dtype=bool)
+        count = 0
+
+        def accept(players: np.ndarray) -> np.ndarray:
+            nonlocal count
+            members[count, players] = True
+            count += 1
+            return players
+
+        # Phase 1: value bands [lo, hi), enumerated completely and accepted
+        # greedily best first, so every accepted lineup is exact.
+        top = first[0]
+        floor = self.base_value + float(np.sort(self.value)[: self.k].sum())
+        hi = np.inf
+        width = max(abs(top) * 0.0025, 1e-6)
+        min_width = max(abs(top) * 1e-6, 1e-9)
+        while count < num:
+            lo = (top if hi == np.inf else hi) - width
+            lineups, complete = self.enumerate(lo, budget, upper=hi)
+            if not complete:
+                if width <= min_width:
+                    break
+                width /= 2
+                continue
+            for players in self._accept_band(lineups, members, count, max_overlap, num):
+                yield accept(players)
+            if lo <= floor:
+                return
+            hi = lo
+            if len(lineups) < budget // 4:
+                width *= 1.5
+
+        # Phase 2: one lineup at a time with overlap pruning inside the search
+        while count < num:
+            res = self.best(members[:count], max_overlap)
+            if res is None:
+                return
+            yield accept(res[1])
+
+    def _accept_band(
+        self,
+        lineups: List[Tuple[float, np.ndarray]],
+        members: np.ndarray,
+        count: int,
+        max_overlap: int,
+        num: int,
+    ) -> Iterator[np.ndarray]:
+        """Greedy acceptance of a best-first band against the accepted lineups (members[:count])."""
+        if not lineups:
+            return
+        picks = np.array([p for _v, p in lineups], dtype=int)
+        ok = np.ones(len(picks), dtype=bool)
+        if count:
+            # Overlap with every earlier lineup for the whole band at once (chunked one-hot matmul)
+            prev = members[:count].T.astype(np.float32)
+            for a in range(0, len(picks), 20_000):
+                chunk = picks[a:a + 20_000]
+                onehot = np.zeros((len(chunk), self.n_players), dtype=np.float32)
+                onehot[np.arange(len(chunk))[:, None], chunk] = 1.0
+                ok[a:a + 20_000] = ((onehot @ prev) <= max_overlap).all(axis=1)
+
+        # The caller records each yielded lineup in members[count + n_new] before resuming
+        n_new = 0
+        for j in np.nonzero(ok)[0].tolist():
+            if count + n_new >= num:
+                return
+            players = picks[j]
+            if np.all(members[count:count + n_new, players].sum(axis=1) <= max_overlap):
+                n_new += 1
+                yield players
+
+
+def knapsack_applicable(rules: Any, pool: Any, settings: Dict[str, Any]) -> bool:
+    """
+    True when the request is a plain cardinality knapsack: one slot type, team
+    rules that cannot bind, and no lineup-level ownership / ceiling rows.
+    """
+    if len(rules.slots) != 1 or has_slot_multipliers(rules):
+        return False
+    if any(settings.get(k) is not None for k in ("total_ownership_cap", "min_total_ceiling", "max_chalk_count")):
+        return False
+    if settings.get("use_ownership") and settings.get("leverage_mode") == "target_leverage":
+        return False
+    if has_exposure_bounds(settings) or stack_rules(rules, settings):
+        return False
+    if pool.has_games and opponent_rules(rules, settings):
+        return False
+
+    n_slots = int(rules.slots[0].count)
+    limits = rules.team_limits
+    if pool.has_team:
+        if limits.max_from_team is not None and int(limits.max_from_team) < n_slots:
+            return False
+        if limits.min_teams is not None and int(limits.min_teams) > 1:
+            # Binds only if min_teams - 1 teams can fill a whole lineup
+            if (pool.team_code < 0).any():
+                return False
+            sizes = np.sort(np.bincount(pool.team_code))[::-1]
+            if sizes[: int(limits.min_teams) - 1].sum() >= n_slots:
+                return False
+    return True
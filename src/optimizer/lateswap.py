@@ -0,0 +1,323 @@
+# src/optimizer/lateswap.py
+# Late swap: re-optimize existing entries around players whose games started
+#
+# Input: previously exported entries (optimize_df lineups, the DK import /
+# entries CSV with one column per slot, or the flat export_lineups_csv file)
+# and what has started:
+#   - started_teams:  {"ATL", "CHC", ...}
+#   - started_games:  {"CHC@ATL", ...}
+#   - lock_time:      timestamp; games whose start (DK "Game Info" or a
+#                     game_time column) is at or before it have started
+#
+# A started player stays in its slot. Every other slot is open and refilled
+# from players whose games have not started; the rules (salary cap, team
+# limits, stacks, opponent exclusions, slot multipliers) still apply to the
+# whole lineup.
+#
+# The lineup model is compiled once, over the not-started players plus the
+# started players that appear in some entry (instances formulation: the fixed
+# players must keep their slot). Each entry only changes column bounds:
+#   - started players outside the entry: ub = 0
+#   - the entry's started players: lb = ub = 1 on their (player, slot) column
+# so the solver presolve removes everything but the open slots. Before the
+# build, dominated players are dropped from the not-started players
+# (presolve.py; started players cannot stand in for anybody, settings
+# presolve=False skips it). Each solve starts from the entry itself when it is
+# still feasible, and entries holding the same started players are solved once.
+# Jobs are spread over a process pool; each worker loads the model once and
+# keeps the solver backend between entries.
+#
+from __future__ import annotations
+
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .model import LineupModel, build_lineup_model, expand_slots
+from .presolve import presolve_pool
+from .solvers import get_backend
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .engine import DkRules, OptimizerEngine
+
+# Per entry: (chosen (player, slot) pairs or None, solve seconds, optimal)
+EntryResult = Tuple[Optional[List[Tuple[int, int]]], float, bool]
+
+_ID_IN_CELL = re.compile(r"\((\d+)\)\s*$")   # DK entries cells: "Name (12345)"
+
+# Per-worker state, set once by _init_worker
+_WORKER: Dict[str, Any] = {}
+
+
+# ----------------------------
+# Entries and start times
+# ----------------------------
+
+def _cell_id(value: Any) -> Optional[str]:
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return None
+    text = str(value).strip()
+    match = _ID_IN_CELL.search(text)
+    if match:
+        return match.group(1)
+    if text.endswith(".0") and text[:-2].isdigit():   # ids read back as floats
+        text = text[:-2]
+    return text or None
+
+
+def read_entries(entries: Any, rules: "DkRules") -> Tuple[List[List[Optional[str]]], List[Dict[str, Any]]]:
+    """
+    Player id per slot instance (expand_slots order) for every entry, plus the
+    entry's extra fields (e.g. DK "Entry ID", kept in meta). Accepts:
+      - optimize_df lineups (dicts with "slots")
+      - a DataFrame / CSV path with one column per slot instance (DK import or
+        entries file; repeated headers such as OF, OF.1, OF.2)
+      - the flat export_lineups_csv file (lineup_index, slot, player_id)
+    """
+    slot_instances = expand_slots(rules.slots)
+    n_slots = len(slot_instances)
+    if isinstance(entries, (str, os.PathLike)):
+        entries = pd.read_csv(entries, dtype=str)
+
+    if isinstance(entries, pd.DataFrame):
+        df = entries
+        if {"lineup_index", "player_id"} <= set(df.columns):
+            ids, extra = [], []
+            for key, group in df.groupby("lineup_index", sort=False):
+                row = [_cell_id(v) for v in group["player_id"]]
+                ids.append((row + [None] * n_slots)[:n_slots])
+                extra.append({"lineup_index": key})
+            return ids, extra
+        slot_names = {sr.name for sr in rules.slots}
+        is_slot = [str(c).split(".")[0].strip().upper() in slot_names for c in df.columns]
+        if sum(is_slot) != n_slots:
+            raise ValueError(f"Expected {n_slots} slot columns ({sorted(slot_names)}), found {list(df.columns)}")
+        slot_part = df.iloc[:, [i for i, flag in enumerate(is_slot) if flag]]
+        other = df.iloc[:, [i for i, flag in enumerate(is_slot) if not flag]]
+        ids = [[_cell_id(v) for v in row] for row in slot_part.itertuples(index=False)]
+        extra = [{k: v for k, v in zip(other.columns, row) if not pd.isna(v)} for row in other.itertuples(index=False)]
+        return ids, extra
+
+    ids, extra = [], []
+    for lu in entries:
+        by_instance = {r.get("slot_instance"): str(r.get("base_player_id", r["player_id"])) for r in lu["slots"]}
+        if all(name in by_instance for name, _ in slot_instances):
+            ids.append([by_instance[name] for name, _ in slot_instances])
+        else:
+            ids.append(([str(r.get("base_player_id", r["player_id"])) for r in lu["slots"]] + [None] * n_slots)[:n_slots])
+        extra.append(dict(lu.get("meta", {}).get("entry", {})))
+    return ids, extra
+
+
+def game_start_times(players_df: pd.DataFrame) -> pd.Series:
+    """Game start per player: game_time column, else the DK "Game Info" date (NaT if unknown)."""
+    if "game_time" in players_df.columns:
+        return pd.to_datetime(players_df["game_time"], errors="coerce")
+    if "Game Info" in players_df.columns:
+        stamp = players_df["Game Info"].astype(str).str.extract(r"(\d{1,2}/\d{1,2}/\d{4}\s+\d{1,2}:\d{2}\s*[AP]M)")[0]
+        return pd.to_datetime(stamp, format="%m/%d/%Y %I:%M%p", errors="coerce")
+    return pd.Series(pd.NaT, index=players_df.index)
+
+
+def started_players(players_df: pd.DataFrame, settings: Dict[str, Any]) -> pd.Series:
+    """Boolean per row of players_df: the player's game has started."""
+    started = pd.Series(False, index=players_df.index)
+    teams = {str(t).strip().upper() for t in settings.get("started_teams") or []}
+    team_col = "_team" if "_team" in players_df.columns else "team"
+    if teams and team_col in players_df.columns:
+        started |= players_df[team_col].astype(str).str.strip().str.upper().isin(teams)
+    games = {str(g).strip().upper() for g in settings.get("started_games") or []}
+    if games and "_game" in players_df.columns:
+        started |= players_df["_game"].isin(games)
+    if settings.get("lock_time") is not None:
+        start = game_start_times(players_df)
+        started |= start.notna() & (start <= pd.Timestamp(settings["lock_time"]))
+    return started
+
+
+# ----------------------------
+# Solve
+# ----------------------------
+
+def _init_worker(model: LineupModel, solver: Optional[str], mip_gap: Optional[float]) -> None:
+    _WORKER["model"] = model
+    _WORKER["backend"] = get_backend(solver, mip_gap=mip_gap)
+    _WORKER["bounds"] = (model.col_lb.copy(), model.col_ub.copy())
+
+
+def _solve_entries(task: Tuple[List[Tuple[np.ndarray, Optional[np.ndarray]]], Optional[float]]) -> List[EntryResult]:
+    """Solve every job of a chunk: its fixed columns set to 1, from its warm start when given."""
+    jobs, time_limit = task
+    model, backend = _WORKER["model"], _WORKER["backend"]
+    base_lb, base_ub = _WORKER["bounds"]
+    out: List[EntryResult] = []
+    for cols, start in jobs:
+        lb, ub = base_lb.copy(), base_ub.copy()
+        lb[cols] = ub[cols] = 1.0
+        model.set_col_bounds(lb, ub)
+        result = backend.solve(model, start, time_limit=time_limit)
+        chosen = model.selected(result.x) if result.x is not None else None
+        out.append((chosen, result.seconds, result.optimal))
+    return out
+
+
+def _entry_start(model: LineupModel, cols: np.ndarray) -> Optional[np.ndarray]:
+    """The entry itself as a warm start (cols: its (player, slot) columns), if still feasible."""
+    if (cols < 0).any():
+        return None   # a player was presolved out or is no longer eligible
+    x = model.point(model.col_player[cols])
+    if x is None:
+        return None
+    x[: model.n_x] = 0.0
+    x[cols] = 1.0
+    return x if model.is_feasible(x) else None
+
+
+def late_swap(
+    engine: "OptimizerEngine",
+    players_df: pd.DataFrame,
+    rules: "DkRules",
+    entries: Any,
+    *,
+    settings: Optional[Dict[str, Any]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Re-optimize the open slots of every entry (see module comment). Settings: the
+    optimize_df model settings (objective, caps, exclusions, stacks, solver,
+    mip_gap, time_limit, ...) plus
+      - started_teams / started_games / lock_time: what has started
+      - workers: int (default os.cpu_count()); 1 solves in-process
+      - presolve / warm_start: bool (default True)
+    Returns one lineup per entry, in entry order. An entry that cannot be
+    completed comes back unchanged with meta["status"] == "infeasible".
+    Each meta has
+      {"entry_index", "entry", "fixed", "open", "changed", "status", "solve_s",
+       "build_s", "presolve", "elapsed_s", "entries_per_s", "workers", "solver", "optimal", "signature"}
+    """
+    from .engine import _gap_setting, _make_lineup, _sign_lineup
+
+    settings = dict(settings or {})
+    t_start = time.perf_counter()
+    entry_ids, entry_extra = read_entries(entries, rules)
+
+    df = players_df.copy()
+    df["player_id"] = df["player_id"].astype(str)
+    if "cpt_player_id" in df.columns:
+        # Showdown entries hold the CPT entry ID in the captain slot: back to the pool player_id
+        alias = dict(zip(df["cpt_player_id"].astype(str), df["player_id"]))
+        entry_ids = [[alias.get(p, p) if p is not None else None for p in row] for row in entry_ids]
+    known = set(df["player_id"])
+    missing = sorted({p for row in entry_ids for p in row if p is not None and p not in known})
+    if missing:
+        raise ValueError(f"Entry player_ids not found in the player pool: {missing[:10]}")
+
+    # Pool: not started, plus the started players some entry holds (fixed in place)
+    started = started_players(df, settings).to_numpy()
+    in_entries = df["player_id"].isin({p for row in entry_ids for p in row if p is not None}).to_numpy()
+    started_ids = set(df.loc[started, "player_id"])
+    sub = df[~started | in_entries]
+    t_build = time.perf_counter()
+    pool, slot_instances, locked_idx = engine._prepare_pool(sub, rules, settings)
+    held = np.isin(pool.ids, sorted(started_ids))
+    presolve_meta = None
+    if settings.get("presolve", True):
+        # Dominance over the players still available; a started player cannot stand in for anybody
+        free = np.nonzero(~held)[0]
+        pre = presolve_pool(pool.subset(free), slot_instances, rules, settings,
+                            locked=np.nonzero(np.isin(free, locked_idx))[0])
+        keep = np.sort(np.concatenate([free[pre.keep], np.nonzero(held)[0]]))
+        pool, held = pool.subset(keep), held[keep]
+        locked_idx = np.nonzero(np.isin(keep, locked_idx))[0]
+        presolve_meta = pre.as_meta()
+    model = build_lineup_model(pool, slot_instances, rules, dict(settings, formulation="instances"), locked=locked_idx)
+    build_s = time.perf_counter() - t_build
+
+    # Started players are never picked; each entry re-opens (and fixes) its own in their slot
+    ub = model.col_ub.copy()
+    x_player, x_slot = model.col_player[: model.n_x], model.col_slot[: model.n_x]
+    ub[: model.n_x][held[x_player]] = 0.0
+    model.set_col_bounds(model.col_lb, ub)
+    col_of = {(int(p), int(s)): j for j, (p, s) in enumerate(zip(x_player, x_slot))}
+    index_of = {pid: i for i, pid in enumerate(pool.ids)}
+    fixed_cols: List[np.ndarray] = []
+    entry_cols: List[np.ndarray] = []
+    for row in entry_ids:
+        cols = [col_of.get((index_of.get(pid, -1), s), -1) if pid is not None else -1 for s, pid in enumerate(row)]
+        entry_cols.append(np.asarray(cols, dtype=int))
+        fixed_cols.append(np.asarray([c for c, pid in zip(cols, row) if pid in started_ids], dtype=int))
+
+    solver, mip_gap = settings.get("solver"), _gap_setting(settings)
+    time_limit = settings.get("time_limit")
+    time_limit = float(time_limit) if time_limit is not None else None
+    n = len(entry_ids)
+    # One job per distinct set of fixed columns: entries holding the same started
+    # players get the same lineup. An entry whose started player cannot keep its
+    # slot (ineligible / excluded) cannot be swapped.
+    job_of: Dict[Tuple[int, ...], int] = {}
+    jobs: List[Tuple[np.ndarray, Optional[np.ndarray]]] = []
+    for i, cols in enumerate(fixed_cols):
+        key = tuple(sorted(cols.tolist()))
+        if (cols < 0).any() or key in job_of:
+            continue
+        job_of[key] = len(jobs)
+        start = _entry_start(model, entry_cols[i]) if settings.get("warm_start", True) else None
+        jobs.append((cols, start))
+    workers = max(1, min(int(settings.get("workers") or os.cpu_count() or 1), max(len(jobs), 1)))
+    chunks = [idx for idx in np.array_split(np.arange(len(jobs)), min(max(len(jobs), 1), 4 * workers)) if len(idx)]
+    tasks = [([jobs[j] for j in idx], time_limit) for idx in chunks]
+    if workers == 1:
+        _init_worker(model, solver, mip_gap)
+        results = [_solve_entries(t) for t in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(model, solver, mip_gap)) as ex:
+            results = list(ex.map(_solve_entries, tasks))   # submission order: job order
+    job_results = [r for chunk in results for r in chunk]
+    solved: Dict[int, EntryResult] = {}
+    for i, cols in enumerate(fixed_cols):
+        j = job_of.get(tuple(sorted(cols.tolist())))
+        if j is not None and not (cols < 0).any():
+            solved[i] = job_results[j]
+
+    elapsed = time.perf_counter() - t_start
+    backend_name = get_backend(solver).name
+    full_pool = None
+    lineups: List[Dict[str, Any]] = []
+    for i, row in enumerate(entry_ids):
+        chosen, solve_s, optimal = solved.get(i, (None, 0.0, False))
+        n_fixed = sum(pid in started_ids for pid in row)
+        if chosen is not None:
+            lineup = _make_lineup(rules, pool, slot_instances, chosen)
+            status = "swapped"
+        else:
+            # Unchanged entry, from the full frame (its players may be outside the model pool)
+            if full_pool is None:
+                full_pool, _, _ = engine._prepare_pool(df, rules, {})
+            filled = [(s, pid) for s, pid in enumerate(row) if pid is not None]
+            idx = full_pool.index_of([pid for _, pid in filled])
+            lineup = _make_lineup(rules, full_pool, slot_instances, [(int(p), s) for p, (s, _) in zip(idx, filled)])
+            status = "infeasible"
+        new_ids = [r.get("base_player_id", r["player_id"]) for r in lineup["slots"]]
+        lineup["meta"] = {
+            "entry_index": i,
+            "entry": entry_extra[i],
+            "fixed": n_fixed,
+            "open": len(slot_instances) - n_fixed,
+            "changed": new_ids != [pid for pid in row if pid is not None],
+            "status": status,
+            "solve_s": solve_s,
+            "build_s": build_s,
+            "presolve": presolve_meta,
+            "elapsed_s": elapsed,
+            "entries_per_s": n / max(elapsed, 1e-9),
+            "workers": workers,
+            "solver": backend_name,
+            "optimal": optimal,
+        }
+        _sign_lineup(lineup, rules, None)
+        lineups.append(lineup)
+    return lineups
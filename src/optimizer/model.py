@@ -0,0 +1,706 @@
+# src/optimizer/model.py
+# Vectorized MILP construction for OptimizerEngine
+#
+# The lineup model is assembled directly from NumPy arrays:
+#   - eligibility mask: players x slot instances
+#   - salary / projection / ownership / ceiling / team-code vectors
+# and stored as one CSR constraint matrix (indptr, indices, data) with row bounds.
+# Solver backends (optimizer/solvers.py) consume the matrix as a single block.
+#
+# Formulations (settings["formulation"]):
+#   - "instances" (default): x[p, s] binaries, one per eligible (player, slot instance)
+#     pair, with fill / player-once rows. OF -> OF__1..OF__3 are interchangeable,
+#     which creates symmetric solutions for branch-and-bound.
+#   - "aggregated": one binary per player, lineup-size row and Hall-type coverage
+#     rows per set of slot types. The concrete slot assignment is found after the
+#     solve by bipartite matching (optimizer/assignment.py).
+#
+# Slot multipliers (SlotRule salary_multiplier / points_multiplier, e.g. the
+# Showdown CPT at 1.5x) scale the salary / ceiling coefficients and the points
+# part of the objective on the (player, slot) columns: no duplicated players, no
+# extra rows. They need per-slot columns, so "aggregated" falls back to
+# "instances" when a slot has a multiplier.
+#
+# Columns:
+#   [0, n_x)   decision binaries (per pair or per player, see above)
+#   [n_x, ..)  auxiliary columns (min_teams indicators, leverage slacks)
+#
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .assignment import assign_slots, min_cost_assignment
+from .opponents import compile_opponent_rows, opponent_rules
+from .stacking import compile_stacks, stack_rules
+
+INF = np.inf
+FORMULATIONS = ("instances", "aggregated")
+
+
+# ----------------------------
+# Player pool (arrays)
+# ----------------------------
+
+@dataclass
+class PlayerPool:
+    ids: np.ndarray            # str
+    names: np.ndarray          # str
+    positions: List[Set[str]]
+    salary: np.ndarray         # float
+    proj: np.ndarray
+    ev: np.ndarray
+    own: np.ndarray
+    ceiling: np.ndarray
+    team: np.ndarray           # object (None when unknown)
+    team_code: np.ndarray      # int, -1 when unknown
+    teams: List[str]
+    has_team: bool
+    opp: Optional[np.ndarray] = None     # object, opponent team (None when unknown)
+    game: Optional[np.ndarray] = None    # object, game key (None when unknown)
+    cpt_ids: Optional[np.ndarray] = None  # object, DK ID of the player's Showdown CPT entry (None when unknown)
+    # Derived in __post_init__
+    opp_code: np.ndarray = field(init=False)    # team index of the opponent, -1 when unknown / not in pool
+    game_code: np.ndarray = field(init=False)   # int, -1 when unknown
+    games: List[str] = field(init=False)
+
+    def __post_init__(self) -> None:
+        n = len(self.ids)
+        team_index = {t: i for i, t in enumerate(self.teams)}
+        opp = self.opp if self.opp is not None else np.full(n, None, dtype=object)
+        self.opp_code = np.array([team_index.get(o, -1) if o is not None else -1 for o in opp], dtype=int)
+        game = pd.Series(self.game if self.game is not None else np.full(n, None, dtype=object), dtype=object)
+        codes, uniques = pd.factorize(game, sort=True)
+        self.game_code = codes.astype(int)
+        self.games = [str(g) for g in uniques]
+
+    @property
+    def size(self) -> int:
+        return len(self.ids)
+
+    @property
+    def has_games(self) -> bool:
+        return bool((self.game_code >= 0).any())
+
+    @classmethod
+    def from_df(cls, df: pd.DataFrame) -> "PlayerPool":
+        """df must carry the engine columns (_salary, _proj, _positions, _team, ...)."""
+        # Duplicate player_ids collapse to the last row (same as the old dict-based build)
+        df = df.drop_duplicates("player_id", keep="last").reset_index(drop=True)
+
+        proj = pd.to_numeric(df["_proj"], errors="coerce").fillna(0.0).to_numpy(dtype=float)
+        ev = pd.to_numeric(df["_ev"], errors="coerce").fillna(0.0).to_numpy(dtype=float) if "_ev" in df.columns else proj.copy()
+        ceiling = (
+            pd.to_numeric(df["_ceiling"], errors="coerce").fillna(df["_proj"]).to_numpy(dtype=float)
+            if "_ceiling" in df.columns else proj.copy()
+        )
+        own = (
+            pd.to_numeric(df["_ownership"], errors="coerce").fillna(0.0).to_numpy(dtype=float)
+            if "_ownership" in df.columns else np.zeros(len(df))
+        )
+
+        team = df["_team"].astype(object).where(df["_team"].notna(), None).to_numpy()
+        opp, game = (
+            df[c].astype(object).where(df[c].notna() & (df[c].astype(str) != ""), None).to_numpy()
+            if c in df.columns else None
+            for c in ("_opp", "_game")
+        )
+        cpt_ids = (
+            df["cpt_player_id"].astype(str).where(df["cpt_player_id"].notna(), None).to_numpy(dtype=object)
+            if "cpt_player_id" in df.columns else None
+        )
+        has_team = bool(df["_team"].notna().any())
+        if has_team:
+            codes, uniques = pd.factorize(df["_team"], sort=True)
+            team_code = codes.astype(int)
+            teams = [str(t) for t in uniques]
+        else:
+            team_code = np.full(len(df), -1, dtype=int)
+            teams = []
+
+        return cls(
+            ids=df["player_id"].astype(str).to_numpy(dtype=object),
+            names=df["player_name"].astype(str).to_numpy(dtype=object),
+            positions=list(df["_positions"]),
+            salary=pd.to_numeric(df["_salary"], errors="coerce").fillna(0).to_numpy(dtype=float),
+            proj=proj,
+            ev=ev,
+            own=own,
+            ceiling=ceiling,
+            team=team,
+            team_code=team_code,
+            teams=teams,
+            has_team=has_team,
+            opp=opp,
+            game=game,
+            cpt_ids=cpt_ids,
+        )
+
+    def subset(self, idx: np.ndarray) -> "PlayerPool":
+        """Pool restricted to rows idx (teams re-factorized over the remaining players)."""
+        idx = np.asarray(idx, dtype=int)
+        team = self.team[idx]
+        has_team = self.has_team and any(t is not None for t in team)
+        if has_team:
+            codes, uniques = pd.factorize(pd.Series(team, dtype=object), sort=True)
+            team_code, teams = codes.astype(int), [str(t) for t in uniques]
+        else:
+            team_code, teams = np.full(len(idx), -1, dtype=int), []
+        return PlayerPool(
+            ids=self.ids[idx],
+            names=self.names[idx],
+            positions=[self.positions[i] for i in idx],
+            salary=self.salary[idx],
+            proj=self.proj[idx],
+            ev=self.ev[idx],
+            own=self.own[idx],
+            ceiling=self.ceiling[idx],
+            team=team,
+            team_code=team_code,
+            teams=teams,
+            has_team=has_team,
+            opp=self.opp[idx] if self.opp is not None else None,
+            game=self.game[idx] if self.game is not None else None,
+            cpt_ids=self.cpt_ids[idx] if self.cpt_ids is not None else None,
+        )
+
+    def index_of(self, player_ids: Iterable[str]) -> np.ndarray:
+        lookup = {pid: i for i, pid in enumerate(self.ids)}
+        return np.array([lookup[str(pid)] for pid in player_ids if str(pid) in lookup], dtype=int)
+
+
+def expand_slots(slots: Sequence[Any]) -> List[Tuple[str, Set[str]]]:
+    """SlotRule list -> [(instance_name, eligible)], e.g. OF -> OF__1, OF__2, OF__3."""
+    out: List[Tuple[str, Set[str]]] = []
+    for sr in slots:
+        for i in range(sr.count):
+            # Each instance has a unique name to enforce exact count
+            out.append((f"{sr.name}__{i+1}", sr.eligible))
+    return out
+
+
+def slot_multipliers(slots: Sequence[Any]) -> Tuple[np.ndarray, np.ndarray]:
+    """(salary, points) multiplier per slot instance, in expand_slots order."""
+    salary: List[float] = []
+    points: List[float] = []
+    for sr in slots:
+        salary += [float(getattr(sr, "salary_multiplier", 1.0))] * sr.count
+        points += [float(getattr(sr, "points_multiplier", 1.0))] * sr.count
+    return np.asarray(salary), np.asarray(points)
+
+
+def has_slot_multipliers(rules: Any) -> bool:
+    salary, points = slot_multipliers(rules.slots)
+    return bool((salary != 1.0).any() or (points != 1.0).any())
+
+
+def eligibility_mask(positions: Sequence[Set[str]], slot_instances: Sequence[Tuple[str, Set[str]]]) -> np.ndarray:
+    """Boolean players x slot-instances matrix: True where a position token matches the slot."""
+    tokens = sorted(set().union(*positions, *(elig for _, elig in slot_instances)) or {""})
+    tok_idx = {t: i for i, t in enumerate(tokens)}
+
+    player_tok = np.zeros((len(positions), len(tokens)), dtype=bool)
+    rows = [i for i, ps in enumerate(positions) for _ in ps]
+    cols = [tok_idx[t] for ps in positions for t in ps]
+    player_tok[rows, cols] = True
+
+    slot_tok = np.zeros((len(slot_instances), len(tokens)), dtype=bool)
+    for j, (_name, elig) in enumerate(slot_instances):
+        slot_tok[j, [tok_idx[t] for t in elig]] = True
+
+    return (player_tok.astype(np.int32) @ slot_tok.T.astype(np.int32)) > 0
+
+
+def hall_coverage(
+    elig: np.ndarray, slot_instances: Sequence[Tuple[str, Set[str]]]
+) -> List[Tuple[np.ndarray, int, str]]:
+    """
+    Hall-type coverage rows for the aggregated formulation.
+    For every set S of slot types: (#chosen players eligible for some type in S) >= sum of counts in S.
+    Together with "exactly lineup_size players" this guarantees a perfect slot assignment.
+    Returns [(player_mask, demand, row_name)]. Redundant rows are skipped:
+      - sets covering every player (implied by the lineup-size row)
+      - sets whose types split into groups with no shared player (sum of smaller rows)
+      - sets with the same player set as a higher-demand set
+    """
+    bases = [sname.split("__")[0] for sname, _ in slot_instances]
+    types = list(dict.fromkeys(bases))
+    n_types = len(types)
+    type_of_slot = np.array([types.index(b) for b in bases])
+    counts = np.bincount(type_of_slot, minlength=n_types)
+
+    player_types = np.stack([elig[:, type_of_slot == t].any(axis=1) for t in range(n_types)], axis=1)
+    sig = player_types.astype(np.int64) @ (1 << np.arange(n_types, dtype=np.int64))
+    sigs = np.unique(sig[sig > 0])
+
+    # Type adjacency: two slot types share at least one eligible player
+    shared = (player_types.astype(np.int32).T @ player_types.astype(np.int32)) > 0
+    adj = [sum(1 << u for u in range(n_types) if shared[t, u] and u != t) for t in range(n_types)]
+
+    def connected(subset: int) -> bool:
+        start = subset & -subset
+        seen, frontier = start, start
+        while frontier:
+            t = frontier.bit_length() - 1
+            frontier &= ~(1 << t)
+            new = adj[t] & subset & ~seen
+            seen |= new
+            frontier |= new
+        return seen == subset
+
+    best: Dict[Tuple[bool, ...], Tuple[int, int]] = {}
+    for subset in range(1, 1 << n_types):
+        hit = tuple(bool(sg & subset) for sg in sigs.tolist())
+        if all(hit) or not connected(subset):
+            continue
+        demand = int(sum(counts[t] for t in range(n_types) if subset >> t & 1))
+        if hit not in best or demand > best[hit][0]:
+            best[hit] = (demand, subset)
+
+    rows: List[Tuple[np.ndarray, int, str]] = []
+    for hit, (demand, subset) in best.items():
+        mask = np.isin(sig, sigs[np.array(hit, dtype=bool)])
+        name = "cover_" + "+".join(types[t] for t in range(len(types)) if subset >> t & 1)
+        rows.append((mask, demand, name))
+    return rows
+
+
+# ----------------------------
+# Row assembly
+# ----------------------------
+
+class _RowBuilder:
+    """Collects constraint rows as COO triplets and emits CSR."""
+
+    def __init__(self) -> None:
+        self._r: List[np.ndarray] = []
+        self._c: List[np.ndarray] = []
+        self._v: List[np.ndarray] = []
+        self.lb: List[float] = []
+        self.ub: List[float] = []
+        self.names: List[str] = []
+
+    @property
+    def n_rows(self) -> int:
+        return len(self.names)
+
+    def add_row(self, cols: np.ndarray, coefs: np.ndarray | float, lb: float, ub: float, name: str) -> None:
+        cols = np.asarray(cols, dtype=int)
+        self._r.append(np.full(len(cols), self.n_rows, dtype=int))
+        self._c.append(cols)
+        self._v.append(np.broadcast_to(np.asarray(coefs, dtype=float), cols.shape).copy())
+        self.lb.append(float(lb))
+        self.ub.append(float(ub))
+        self.names.append(name)
+
+    def add_grouped(
+        self,
+        group_of_col: np.ndarray,
+        groups: Sequence[int],
+        coefs: np.ndarray | float,
+        lb: float | np.ndarray,
+        ub: float | np.ndarray,
+        names: Sequence[str],
+    ) -> None:
+        """One row per group g in `groups`: sum of coefs over columns with group_of_col == g."""
+        groups = np.asarray(groups, dtype=int)
+        if groups.size == 0:
+            return
+        coefs = np.broadcast_to(np.asarray(coefs, dtype=float), group_of_col.shape)
+        pos = np.full(int(max(groups.max(), group_of_col.max(initial=-1))) + 1, -1, dtype=int)
+        pos[groups] = np.arange(len(groups))
+        valid = group_of_col >= 0
+        cols = np.nonzero(valid)[0]
+        row_in_block = pos[group_of_col[valid]]
+        keep = row_in_block >= 0
+        self._r.append(self.n_rows + row_in_block[keep])
+        self._c.append(cols[keep])
+        self._v.append(coefs[valid][keep].copy())
+        self.lb.extend(np.broadcast_to(np.asarray(lb, dtype=float), groups.shape).tolist())
+        self.ub.extend(np.broadcast_to(np.asarray(ub, dtype=float), groups.shape).tolist())
+        self.names.extend(names)
+
+    def to_csr(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        if not self._r:
+            return np.zeros(self.n_rows + 1, dtype=int), np.zeros(0, dtype=int), np.zeros(0)
+        r = np.concatenate(self._r)
+        c = np.concatenate(self._c)
+        v = np.concatenate(self._v)
+        order = np.lexsort((c, r))
+        indptr = np.zeros(self.n_rows + 1, dtype=int)
+        np.cumsum(np.bincount(r, minlength=self.n_rows), out=indptr[1:])
+        return indptr, c[order], v[order]
+
+
+# ----------------------------
+# Model
+# ----------------------------
+
+@dataclass
+class LineupModel:
+    """MILP in matrix form: maximize c @ x  s.t.  row_lb <= A x <= row_ub, col_lb <= x <= col_ub."""
+
+    pool: PlayerPool
+    slot_instances: List[Tuple[str, Set[str]]]
+    n_x: int
+    col_player: np.ndarray     # player index per column (-1 for auxiliary columns)
+    col_slot: np.ndarray       # slot-instance index per column (-1 for auxiliary columns)
+    c: np.ndarray
+    col_lb: np.ndarray
+    col_ub: np.ndarray
+    integrality: np.ndarray    # True = binary/integer
+    indptr: np.ndarray
+    indices: np.ndarray
+    data: np.ndarray
+    row_lb: np.ndarray
+    row_ub: np.ndarray
+    row_names: List[str]
+    elig: Optional[np.ndarray] = None    # players x slot instances
+    formulation: str = "instances"
+    aux_names: List[str] = field(default_factory=list)   # names of columns [n_x, n_cols)
+    slot_points_mult: Optional[np.ndarray] = None         # per slot instance, None when all 1
+    # Bumped when objective / bounds change so stateful backends can resync
+    obj_rev: int = 0
+    bounds_rev: int = 0
+
+    @property
+    def n_cols(self) -> int:
+        return len(self.c)
+
+    @property
+    def n_rows(self) -> int:
+        return len(self.row_lb)
+
+    def row(self, i: int) -> Tuple[np.ndarray, np.ndarray]:
+        a, b = self.indptr[i], self.indptr[i + 1]
+        return self.indices[a:b], self.data[a:b]
+
+    def player_cols(self, players: np.ndarray) -> np.ndarray:
+        """Columns of x that select any of the given player indices."""
+        return np.nonzero(np.isin(self.col_player[: self.n_x], players))[0]
+
+    def add_row(self, cols: np.ndarray, coefs: np.ndarray | float, lb: float, ub: float, name: str) -> None:
+        cols = np.asarray(cols, dtype=int)
+        vals = np.broadcast_to(np.asarray(coefs, dtype=float), cols.shape)
+        self.indices = np.concatenate([self.indices, cols])
+        self.data = np.concatenate([self.data, vals])
+        self.indptr = np.append(self.indptr, self.indptr[-1] + len(cols))
+        self.row_lb = np.append(self.row_lb, float(lb))
+        self.row_ub = np.append(self.row_ub, float(ub))
+        self.row_names.append(name)
+
+    def add_player_row(self, players: np.ndarray, lb: float, ub: float, name: str) -> None:
+        """sum_{p in players} (player p selected) within [lb, ub]."""
+        self.add_row(self.player_cols(players), 1.0, lb, ub, name)
+
+    def truncate_rows(self, n_rows: int) -> None:
+        """Drop rows [n_rows, ..), e.g. the overlap cuts of a finished run. See SolverBackend.drop_rows."""
+        self.indices = self.indices[: self.indptr[n_rows]]
+        self.data = self.data[: self.indptr[n_rows]]
+        self.indptr = self.indptr[: n_rows + 1]
+        self.row_lb = self.row_lb[:n_rows]
+        self.row_ub = self.row_ub[:n_rows]
+        del self.row_names[n_rows:]
+
+    def column_costs(self, coef: np.ndarray, penalty: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Objective of the x columns from per-player coefficients coef (one row per
+        player vector, 1-D or 2-D). The points part, coef + penalty (see
+        player_objective), is scaled by the slot's points_multiplier.
+        """
+        coef = np.asarray(coef, dtype=float)
+        cp = self.col_player[: self.n_x]
+        out = coef[..., cp]
+        if self.slot_points_mult is not None:
+            points = coef + penalty if penalty is not None else coef
+            out = out + (self.slot_points_mult[self.col_slot[: self.n_x]] - 1.0) * points[..., cp]
+        return out
+
+    def set_objective(self, c: np.ndarray) -> None:
+        self.c = np.asarray(c, dtype=float)
+        self.obj_rev += 1
+
+    def set_col_bounds(self, col_lb: np.ndarray, col_ub: np.ndarray) -> None:
+        self.col_lb = np.asarray(col_lb, dtype=float)
+        self.col_ub = np.asarray(col_ub, dtype=float)
+        self.bounds_rev += 1
+
+    def row_activity(self, x: np.ndarray) -> np.ndarray:
+        """A @ x for every row."""
+        row_of = np.repeat(np.arange(self.n_rows), np.diff(self.indptr))
+        return np.bincount(row_of, weights=self.data * x[self.indices], minlength=self.n_rows)
+
+    def is_feasible(self, x: np.ndarray, tol: float = 1e-6) -> bool:
+        act = self.row_activity(x)
+        return bool(
+            np.all(act >= self.row_lb - tol) and np.all(act <= self.row_ub + tol)
+            and np.all(x >= self.col_lb - tol) and np.all(x <= self.col_ub + tol)
+        )
+
+    def point(self, players: Sequence[int]) -> Optional[np.ndarray]:
+        """
+        Full column vector for a lineup given as player indices: decision columns
+        from a slot assignment, auxiliary columns set to their implied values.
+        Returns None if the players cannot fill the slots. Rows are not checked
+        (see is_feasible).
+        """
+        players = np.asarray(players, dtype=int)
+        if self.slot_points_mult is not None and self.formulation != "aggregated":
+            # Slot multipliers: the slot assignment matters, take the best-scoring one
+            cost = np.full((len(self.slot_instances), len(players)), np.inf)
+            pos = {int(p): r for r, p in enumerate(players)}
+            for j in np.nonzero(np.isin(self.col_player[: self.n_x], players))[0].tolist():
+                cost[self.col_slot[j], pos[int(self.col_player[j])]] = -self.c[j]
+            slot_player = min_cost_assignment(cost)
+        else:
+            slot_player = assign_slots(self.elig[players])
+        if slot_player is None:
+            return None
+        x = np.zeros(self.n_cols)
+        if self.formulation == "aggregated":
+            x[np.nonzero(np.isin(self.col_player[: self.n_x], players))[0]] = 1.0
+        else:
+            col_of = {(int(p), int(s)): j for j, (p, s) in enumerate(zip(self.col_player[: self.n_x], self.col_slot[: self.n_x]))}
+            for s, r in enumerate(slot_player):
+                x[col_of[(int(players[r]), s)]] = 1.0
+
+        used_teams = {self.pool.team[p] for p in players}
+        for k, name in enumerate(self.aux_names):
+            if name.startswith("y_team_"):
+                x[self.n_x + k] = float(name[len("y_team_"):] in used_teams)
+            elif name.startswith("z_stack_"):
+                # Stack indicator: on when the group has enough players
+                cols, vals = self.row(self.row_names.index(name[2:]))
+                x_part = cols < self.n_x
+                x[self.n_x + k] = float(vals[x_part] @ x[cols[x_part]] >= -vals[~x_part][0] - 1e-9)
+        if "delta_pos" in self.aux_names:
+            i = self.row_names.index("target_leverage_def")
+            cols, vals = self.row(i)
+            dev = float(vals[cols < self.n_x] @ x[cols[cols < self.n_x]]) - self.row_lb[i]
+            x[self.n_x + self.aux_names.index("delta_pos")] = max(dev, 0.0)
+            x[self.n_x + self.aux_names.index("delta_neg")] = max(-dev, 0.0)
+        return x
+
+    def selected(self, x: np.ndarray) -> List[Tuple[int, int]]:
+        """(player_idx, slot_idx) pairs chosen in solution vector x."""
+        cols = np.nonzero(x[: self.n_x] > 0.5)[0]
+        if self.formulation != "aggregated":
+            return [(int(self.col_player[j]), int(self.col_slot[j])) for j in cols]
+
+        # Aggregated: players only, assign slots by bipartite matching
+        players = self.col_player[cols]
+        slot_player = assign_slots(self.elig[players])
+        if slot_player is None:
+            raise RuntimeError("Aggregated solution has no valid slot assignment (coverage rows violated).")
+        return [(int(players[r]), s) for s, r in enumerate(slot_player)]
+
+
+def player_objective(pool: PlayerPool, settings: Dict[str, Any]) -> np.ndarray:
+    """Per-player objective coefficient for the active mode (EV in gpp, projection in cash)."""
+    return player_points(pool, settings) - ownership_penalty(pool, settings)
+
+
+def player_points(pool: PlayerPool, settings: Dict[str, Any]) -> np.ndarray:
+    """Points part of player_objective (what slot points multipliers scale)."""
+    mode = str(settings.get("objective_mode", "cash")).lower()
+    coef = pool.ev.copy() if mode == "gpp" else pool.proj.copy()
+
+    # Randomized projections: multiplicative Gaussian noise, reproducible via settings["seed"]
+    noise = float(settings.get("projection_noise", 0.0) or 0.0)
+    if noise > 0:
+        rng = np.random.default_rng(settings.get("seed"))
+        coef = coef + rng.normal(0.0, noise, size=len(coef)) * np.abs(coef)
+    return coef
+
+
+def ownership_penalty(pool: PlayerPool, settings: Dict[str, Any]) -> np.ndarray:
+    """Per-player amount player_objective subtracts for ownership (zeros when off)."""
+    # --- Legacy/Extra Objective Modifiers ---
+    # Even in GPP/Cash mode, user might want to subtract Ownership penalty on top
+    if settings.get("use_ownership", False):
+        own_weight = float(settings.get("ownership_weight", 0.0))
+        lev_mode = settings.get("leverage_mode", "penalize_high_own")
+        if own_weight > 0 and lev_mode == "penalize_high_own":
+            # (Maximize Proj - Weight * SumOwn)
+            return own_weight * pool.own
+    return np.zeros(pool.size)
+
+
+def build_lineup_model(
+    pool: PlayerPool,
+    slot_instances: List[Tuple[str, Set[str]]],
+    rules: Any,
+    settings: Dict[str, Any],
+    *,
+    locked: Optional[np.ndarray] = None,
+) -> LineupModel:
+    """
+    Build the base lineup MILP (everything except overlap cuts).
+    `locked` holds player indices that must appear in the lineup.
+    """
+    n_slots = len(slot_instances)
+    formulation = str(settings.get("formulation", "instances")).lower()
+    if formulation not in FORMULATIONS:
+        raise ValueError(f"Unknown formulation '{formulation}'. Use one of {FORMULATIONS}")
+
+    # Slot multipliers (only for the rules' own slot expansion)
+    sal_mult = pts_mult = None
+    if sum(sr.count for sr in rules.slots) == n_slots and has_slot_multipliers(rules):
+        sal_mult, pts_mult = slot_multipliers(rules.slots)
+        formulation = "instances"   # the multiplier is per (player, slot) column
+
+    elig = eligibility_mask(pool.positions, slot_instances)
+    if formulation == "aggregated":
+        col_player = np.nonzero(elig.any(axis=1))[0]
+        col_slot = np.full(len(col_player), -1, dtype=int)
+    else:
+        col_player, col_slot = np.nonzero(elig)
+    n_x = len(col_player)
+    if n_x == 0:
+        raise ValueError("No feasible (player,slot) assignments from eligibility rules.")
+
+    # Auxiliary columns are appended after x
+    aux_names: List[str] = []
+    aux_c: List[float] = []
+    aux_int: List[bool] = []
+    aux_ub: List[float] = []
+
+    rb = _RowBuilder()
+    ones = np.ones(n_x)
+
+    if formulation == "aggregated":
+        # Exactly lineup_size players, and every set of slot types can be covered
+        rb.add_row(np.arange(n_x), 1.0, n_slots, n_slots, "lineup_size")
+        for mask, demand, name in hall_coverage(elig[col_player], slot_instances):
+            rb.add_row(np.nonzero(mask)[0], 1.0, demand, INF, name)
+    else:
+        # Each slot instance must be filled by exactly 1 player
+        rb.add_grouped(col_slot, np.arange(n_slots), 1.0, 1.0, 1.0,
+                       [f"fill_{sname}" for sname, _ in slot_instances])
+
+        # Each player can be used at most once across all slot instances
+        used_players = np.unique(col_player)
+        rb.add_grouped(col_player, used_players, 1.0, -INF, 1.0,
+                       [f"player_once_{pool.ids[p]}" for p in used_players])
+
+    # Salary cap
+    col_salary = pool.salary[col_player] * (sal_mult[col_slot] if sal_mult is not None else 1.0)
+    rb.add_row(np.arange(n_x), col_salary, -INF, rules.salary_cap, "salary_cap")
+
+    # Locked players (must appear exactly once)
+    if locked is not None:
+        for p in np.asarray(locked, dtype=int):
+            rb.add_row(np.nonzero(col_player == p)[0], 1.0, 1.0, 1.0, f"lock_{pool.ids[p]}")
+
+    # Ownership Cap (Sum of ownership <= Cap)
+    total_own_cap = settings.get("total_ownership_cap")
+    if total_own_cap is not None:
+        rb.add_row(np.arange(n_x), pool.own[col_player], -INF, float(total_own_cap), "total_ownership_cap")
+
+    # Min Total Ceiling (GPP)
+    min_ceil = settings.get("min_total_ceiling")
+    if min_ceil is not None:
+        col_ceiling = pool.ceiling[col_player] * (pts_mult[col_slot] if pts_mult is not None else 1.0)
+        rb.add_row(np.arange(n_x), col_ceiling, float(min_ceil), INF, "min_total_ceiling")
+
+    # Max Chalk Count: Sum of (is_chalk * x) <= max_chalk
+    max_chalk = settings.get("max_chalk_count")
+    if max_chalk is not None:
+        chalk_thresh = float(settings.get("chalk_threshold", 0.20))
+        is_chalk = (pool.own >= chalk_thresh).astype(float)
+        rb.add_row(np.arange(n_x), is_chalk[col_player], -INF, int(max_chalk), "max_chalk_count")
+
+    # Team limits (auto-skip if no team data)
+    if pool.has_team:
+        col_team = pool.team_code[col_player]
+        team_idx = np.arange(len(pool.teams))
+        if rules.team_limits.max_from_team is not None:
+            rb.add_grouped(col_team, team_idx, 1.0, -INF, int(rules.team_limits.max_from_team),
+                           [f"max_from_team_{t}" for t in pool.teams])
+
+        if rules.team_limits.min_teams is not None:
+            # Binary y[t] indicating whether team t is used
+            # link: sum_x_team >= y[t] and sum_x_team <= M * y[t]
+            M = n_slots
+            y0 = n_x
+            for i, t in enumerate(pool.teams):
+                aux_names.append(f"y_team_{t}")
+                aux_c.append(0.0)
+                aux_int.append(True)
+                aux_ub.append(1.0)
+            for i, t in enumerate(pool.teams):
+                team_cols = np.nonzero(col_team == i)[0]
+                cols = np.append(team_cols, y0 + i)
+                rb.add_row(cols, np.append(np.ones(len(team_cols)), -1.0), 0.0, INF, f"team_used_lb_{t}")
+                rb.add_row(cols, np.append(np.ones(len(team_cols)), -float(M)), -INF, 0.0, f"team_used_ub_{t}")
+            rb.add_row(y0 + team_idx, 1.0, int(rules.team_limits.min_teams), INF, "min_teams")
+
+    # Stacks (rules `stacks` / settings["stacks"], see stacking.py)
+    stacks = stack_rules(rules, settings)
+    if stacks:
+        names, rows = compile_stacks(pool, col_player, stacks, n_x + len(aux_names))
+        aux_names += names
+        aux_c += [0.0] * len(names)
+        aux_int += [True] * len(names)
+        aux_ub += [1.0] * len(names)
+        for cols, coefs, lb, ub, name in rows:
+            rb.add_row(cols, coefs, lb, ub, name)
+
+    # No X versus Y (rules `no_opponents` / settings["no_opponents"], see opponents.py)
+    no_opp = opponent_rules(rules, settings)
+    if no_opp:
+        limits = getattr(rules, "team_limits", None)
+        for cols, coefs, lb, ub, name in compile_opponent_rows(
+            pool, col_player, no_opp, max_from_team=limits.max_from_team if limits is not None else None, n_slots=n_slots,
+        ):
+            rb.add_row(cols, coefs, lb, ub, name)
+
+    # Objective (points scaled per slot, ownership penalty per player)
+    points = player_points(pool, settings)
+    penalty = ownership_penalty(pool, settings)
+    c_x = (points - penalty)[col_player]
+    if pts_mult is not None:
+        c_x = c_x + (pts_mult[col_slot] - 1.0) * points[col_player]
+
+    if settings.get("use_ownership", False):
+        own_weight = float(settings.get("ownership_weight", 0.0))
+        if own_weight > 0 and settings.get("leverage_mode", "penalize_high_own") == "target_leverage":
+            # Minimize deviation |SumOwn - TargetSum| with slacks d_pos, d_neg >= 0
+            target_avg = float(settings.get("target_ownership", 0.15))
+            target_sum = target_avg * (rules.lineup_size or n_slots)
+            d0 = n_x + len(aux_names)
+            aux_names += ["delta_pos", "delta_neg"]
+            aux_c += [-own_weight, -own_weight]
+            aux_int += [False, False]
+            aux_ub += [INF, INF]
+            # Sum(Own) - d_pos + d_neg == TargetSum
+            rb.add_row(np.concatenate([np.arange(n_x), [d0, d0 + 1]]),
+                       np.concatenate([pool.own[col_player], [-1.0, 1.0]]),
+                       target_sum, target_sum, "target_leverage_def")
+
+    indptr, indices, data = rb.to_csr()
+    n_aux = len(aux_names)
+    return LineupModel(
+        pool=pool,
+        slot_instances=slot_instances,
+        n_x=n_x,
+        col_player=np.concatenate([col_player, np.full(n_aux, -1, dtype=int)]),
+        col_slot=np.concatenate([col_slot, np.full(n_aux, -1, dtype=int)]),
+        c=np.concatenate([c_x, np.asarray(aux_c, dtype=float)]),
+        col_lb=np.zeros(n_x + n_aux),
+        col_ub=np.concatenate([ones, np.asarray(aux_ub, dtype=float)]),
+        integrality=np.concatenate([np.ones(n_x, dtype=bool), np.asarray(aux_int, dtype=bool)]),
+        indptr=indptr,
+        indices=indices,
+        data=data,
+        row_lb=np.asarray(rb.lb, dtype=float),
+        row_ub=np.asarray(rb.ub, dtype=float),
+        row_names=rb.names,
+        elig=elig,
+        formulation=formulation,
+        aux_names=aux_names,
+        slot_points_mult=pts_mult,
+    )
@@ -0,0 +1,231 @@
+# src/optimizer/parallel.py
+# Parallel lineup generation across a process pool
+#
+# optimize_df solves lineups strictly in sequence because each max_overlap cut
+# depends on the lineups before it. Many portfolios are instead built from
+# independent sub-problems:
+#   - randomized projections:  {"projection_noise": 0.15}
+#   - different locked cores:  {"lock_player_ids": [...]}
+#   - different stack teams / any other settings override
+#
+# Each task is a dict of settings overrides on top of the base settings and runs
+# one optimize_df call in a worker process (the player frame and rules are sent
+# once per worker). Results are merged in task order and deduplicated, so the
+# output depends only on the tasks and the seed, never on worker scheduling.
+#
+# Workers never touch the lineup cache (every task has its own seed, so each
+# would store a single-use entry, and processes would race in evict()). The
+# merged result is cached once, in the calling process, when it is reproducible
+# and every task came back complete: no task short of its num_lineups
+# (infeasible, time budget spent), no lineup stopped by a time limit.
+#
+from __future__ import annotations
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .cache import cached_run
+from .signature import LineupIndex, lineup_codes
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .engine import DkRules, OptimizerEngine
+    from .feasibility import FeasibilityReport
+
+# Keys that control the parallel run itself and are not passed to tasks
+_PARALLEL_KEYS = ("tasks", "workers", "seed", "projection_noise", "max_lineups", "cache", "signature_index")
+
+# Per-worker state, set once by _init_worker
+_WORKER: Dict[str, Any] = {}
+
+
+def _init_worker(engine: "OptimizerEngine", players_df: pd.DataFrame, rules: "DkRules") -> None:
+    _WORKER["engine"] = engine
+    _WORKER["players_df"] = players_df
+    _WORKER["rules"] = rules
+
+
+def _run_task(task_settings: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], Optional["FeasibilityReport"]]:
+    """The task's lineups and, when it came back short, the engine's diagnosis."""
+    engine = _WORKER["engine"]
+    lineups = engine.optimize_df(_WORKER["players_df"], _WORKER["rules"], settings=task_settings)
+    return lineups, engine.last_diagnosis
+
+
+def task_seeds(seed: Optional[int], n: int) -> List[int]:
+    """Independent per-task seeds derived from one base seed (np.random.SeedSequence)."""
+    return [int(s.generate_state(1)[0]) for s in np.random.SeedSequence(seed).spawn(n)]
+
+
+def build_tasks(settings: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Expand settings into per-task settings dicts.
+      - settings["tasks"]: explicit list of overrides (each defaults to num_lineups=1)
+      - otherwise: num_lineups randomized-projection tasks of one lineup each
+        (projection_noise defaults to 0.1)
+    Every task gets its own seed unless it sets one.
+    """
+    base = {k: v for k, v in settings.items() if k not in _PARALLEL_KEYS}
+    overrides = settings.get("tasks")
+    if overrides is None:
+        n = max(1, int(settings.get("num_lineups") or 1))
+        noise = float(settings.get("projection_noise", 0.1))
+        overrides = [{"projection_noise": noise} for _ in range(n)]
+    elif "projection_noise" in settings:
+        overrides = [dict({"projection_noise": settings["projection_noise"]}, **o) for o in overrides]
+
+    seeds = task_seeds(settings.get("seed"), len(overrides))
+    tasks: List[Dict[str, Any]] = []
+    for override, seed in zip(overrides, seeds):
+        task = dict(base, num_lineups=1, seed=seed)
+        task.update(override)
+        task["cache"] = False
+        tasks.append(task)
+    return tasks
+
+
+def lineup_key(lineup: Dict[str, Any]) -> Tuple[str, ...]:
+    """Order-independent identity of a lineup (sorted player_ids)."""
+    return tuple(sorted(str(r["player_id"]) for r in lineup["slots"]))
+
+
+def merge_lineups(
+    results: Sequence[List[Dict[str, Any]]],
+    *,
+    max_overlap: Optional[int] = None,
+    limit: Optional[int] = None,
+    index: Optional[LineupIndex] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Merge per-task results in task order: drop duplicates (by meta["signature"],
+    also against `index`, a LineupIndex.for_ids shared with other runs), optionally
+    drop lineups sharing more than max_overlap players with an already kept
+    lineup, cap at limit.
+    """
+    merged: List[Dict[str, Any]] = []
+    size = max((len(lu["slots"]) for lineups in results for lu in lineups), default=1)
+    seen = index if index is not None else LineupIndex.for_ids(size)
+    kept_sets: List[set] = []
+    for task_index, lineups in enumerate(results):
+        for lu in lineups:
+            sig = lu.get("meta", {}).get("signature")
+            sig = np.array([int(sig, 16) if sig is not None else seen.signature(lineup_codes(lu))], dtype=np.uint64)
+            if seen.contains(sig)[0]:
+                continue
+            players = set(lineup_key(lu))
+            if max_overlap is not None and any(len(players & k) > max_overlap for k in kept_sets):
+                continue
+            seen.add_signatures(sig)
+            kept_sets.append(players)
+            lu.setdefault("meta", {})["task_index"] = task_index
+            merged.append(lu)
+            if limit is not None and len(merged) >= limit:
+                break
+        if limit is not None and len(merged) >= limit:
+            break
+
+    for i, lu in enumerate(merged, start=1):
+        lu["meta"]["lineup_index"] = i
+    return merged
+
+
+def optimize_parallel(
+    engine: "OptimizerEngine",
+    players_df: pd.DataFrame,
+    rules: "DkRules",
+    *,
+    settings: Optional[Dict[str, Any]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Solve independent tasks across a ProcessPoolExecutor and merge the results.
+    Settings (in addition to the optimize_df settings shared by every task):
+      - tasks: List[dict] settings overrides, one sub-problem each
+      - workers: int (default os.cpu_count()); 1 runs in-process
+      - seed: int base seed; same seed + same tasks -> same lineups
+      - projection_noise: float relative stdev for randomized projections
+      - num_lineups: number of randomized tasks when no explicit tasks are given
+      - max_lineups: cap on merged lineups
+      - max_overlap: also enforced across tasks while merging
+      - signature_index: LineupIndex.for_ids shared with other runs; merged lineups
+        already in it are dropped, the kept ones are added
+      - cache: bool (default True) Cache the merged lineups in the engine's lineup
+        cache. Randomized runs (projection_noise, the default without tasks) are
+        only cached with a seed.
+    Duplicates are dropped, so fewer lineups than tasks may come back. When a
+    task comes back short, engine.last_diagnosis holds the first such diagnosis.
+    Each lineup's meta gains "task_index" and "seed" (and "cache" with a cache).
+    """
+    settings = dict(settings or {})
+    cache = engine.cache if settings.get("cache", True) else None
+    # workers does not change the merged lineups; the key is kept apart from optimize_df runs
+    key_settings = {k: v for k, v in settings.items() if k not in ("workers", "cache")}
+    key_settings["parallel"] = True
+    key_inputs = (players_df, rules, key_settings) if _reproducible(settings) else None
+    complete: List[bool] = []
+
+    def run():
+        merged, ok = _optimize_parallel(engine, players_df, rules, settings)
+        complete.append(ok)
+        return iter(merged)
+
+    # Duplicates dropped in the merge do not make a run short: completeness is per task
+    return list(cached_run(cache, engine, key_inputs, run, 0, complete=lambda lineups: bool(lineups) and complete[0]))
+
+
+def _reproducible(settings: Dict[str, Any]) -> bool:
+    """Same settings -> same merged lineups (a base seed, or no randomized task; no shared index)."""
+    if settings.get("signature_index") is not None:
+        return False
+    if settings.get("seed") is not None:
+        return True
+    overrides = settings.get("tasks")
+    noise = settings.get("projection_noise", 0.1 if overrides is None else 0.0)
+    return not (float(noise or 0.0) > 0 or any(float(o.get("projection_noise") or 0.0) > 0 for o in overrides or []))
+
+
+def _optimize_parallel(
+    engine: "OptimizerEngine",
+    players_df: pd.DataFrame,
+    rules: "DkRules",
+    settings: Dict[str, Any],
+) -> Tuple[List[Dict[str, Any]], bool]:
+    """Merged lineups, and whether every task returned its lineups proven optimal."""
+    tasks = build_tasks(settings)
+    workers = int(settings.get("workers") or os.cpu_count() or 1)
+    workers = max(1, min(workers, len(tasks)))
+
+    if workers == 1:
+        _init_worker(engine, players_df, rules)
+        results = [_run_task(t) for t in tasks]
+    else:
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=(engine, players_df, rules)
+        ) as pool:
+            # map() yields in submission order, so merging is deterministic
+            results = list(pool.map(_run_task, tasks, chunksize=max(1, len(tasks) // (4 * workers))))
+
+    # Worker engines are copies: report the first task's diagnosis on this one
+    diagnoses = [d for _, d in results if d is not None]
+    engine.last_diagnosis = diagnoses[0] if diagnoses else None
+    results = [lineups for lineups, _ in results]
+    complete = not diagnoses and all(
+        len(lineups) >= int(task["num_lineups"]) and all(lu.get("meta", {}).get("optimal", True) for lu in lineups)
+        for task, lineups in zip(tasks, results)
+    )
+
+    for task, lineups in zip(tasks, results):
+        for lu in lineups:
+            lu.setdefault("meta", {})["seed"] = task["seed"]
+
+    max_overlap = settings.get("max_overlap")
+    limit = settings.get("max_lineups")
+    merged = merge_lineups(
+        results,
+        max_overlap=int(max_overlap) if max_overlap is not None else None,
+        limit=int(limit) if limit is not None else None,
+        index=settings.get("signature_index"),
+    )
+    return merged, complete
@@ -0,0 +1,209 @@
+# src/optimizer/presolve.py
+# Dominance presolve on the player pool, ahead of MILP construction
+#
+# Player q dominates player p when q can fill every slot instance p can,
+# costs no more, scores no less on the active objective, and is no worse on
+# every other lineup-level constraint that is active (ownership cap / chalk,
+# min ceiling). Ties are broken by pool order so identical players do not
+# dominate each other.
+#
+# p is removed when its dominators are too many to all sit in one lineup next
+# to p: with D the dominators and U the slot instances any of them can fill,
+# |D| >= |U| means some q in D is always free to take p's slot, at no loss.
+# (The same test is also run on the exact-eligibility dominators only.)
+# Under team limits, dominators on teams that could already be full are not
+# counted (see dominated_players).
+#
+# The optimum of every single solve is preserved. With max_overlap, later
+# lineups are optimal over the reduced pool: a dominated player may only have
+# been needed to dodge an overlap cut.
+#
+# Exposure bounds, stack rules and opponent exclusions change which players
+# may stand in for others; see the comments in dominated_players.
+#
+# Top-K: with k lineups to keep, p must have |U| + k - 1 usable dominators.
+# At most |U| - 1 of them share a lineup with p, so every lineup holding p has
+# k distinct swaps p -> q that score no less, and the k best values survive.
+#
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from .exposure import ExposureBounds, has_exposure_bounds
+from .model import PlayerPool, eligibility_mask, ownership_penalty, player_points, slot_multipliers
+from .opponents import opponent_masks, opponent_rules
+from .stacking import stack_members, stack_rules
+
+
+@dataclass
+class PresolveResult:
+    keep: np.ndarray           # indices into the original pool
+    before: int
+    after: int
+    seconds: float
+
+    @property
+    def removed(self) -> int:
+        return self.before - self.after
+
+    def as_meta(self) -> Dict[str, Any]:
+        return {"before": self.before, "after": self.after, "removed": self.removed, "seconds": self.seconds}
+
+
+def _popcount(v: np.ndarray) -> np.ndarray:
+    v = v.astype(np.uint64)
+    count = np.zeros(v.shape, dtype=np.int64)
+    while np.any(v):
+        count += (v & np.uint64(1)).astype(np.int64)
+        v >>= np.uint64(1)
+    return count
+
+
+def dominated_players(
+    pool: PlayerPool,
+    slot_instances: Any,
+    rules: Any,
+    settings: Dict[str, Any],
+    *,
+    locked: Optional[np.ndarray] = None,
+    k: int = 1,
+) -> np.ndarray:
+    """Boolean mask of players that can be removed without changing the k best lineup values."""
+    n = pool.size
+    elig = eligibility_mask(pool.positions, slot_instances)
+    if elig.shape[1] > 63:
+        return np.zeros(n, dtype=bool)
+    if settings.get("use_ownership") and settings.get("leverage_mode") == "target_leverage":
+        # |sum own - target| objective: lower ownership is not always better
+        return np.zeros(n, dtype=bool)
+
+    mask = elig.astype(np.int64) @ (1 << np.arange(elig.shape[1], dtype=np.int64))
+    points = player_points(pool, settings)
+    coef = points - ownership_penalty(pool, settings)
+    idx = np.arange(n)
+
+    # dom[q, p]: q dominates p
+    sal, obj = pool.salary, coef
+    dom = (mask[:, None] & mask[None, :]) == mask[None, :]
+    dom &= sal[:, None] <= sal[None, :]
+    dom &= obj[:, None] >= obj[None, :]
+    # Slot multipliers scale salary (order kept) and the points part of the
+    # objective: q must score no less in every slot, e.g. as 1.5x captain
+    _sal_mult, pts_mult = slot_multipliers(rules.slots)
+    for m in np.unique(pts_mult[pts_mult != 1.0]):
+        obj_m = coef + (m - 1.0) * points
+        dom &= obj_m[:, None] >= obj_m[None, :]
+    strict = (sal[:, None] < sal[None, :]) | (obj[:, None] > obj[None, :])
+
+    if settings.get("total_ownership_cap") is not None or settings.get("max_chalk_count") is not None:
+        dom &= pool.own[:, None] <= pool.own[None, :]
+        strict |= pool.own[:, None] < pool.own[None, :]
+    if settings.get("min_total_ceiling") is not None:
+        dom &= pool.ceiling[:, None] >= pool.ceiling[None, :]
+        strict |= pool.ceiling[:, None] > pool.ceiling[None, :]
+    dom &= strict | (idx[:, None] < idx[None, :])
+    dom &= mask[:, None] != 0
+    np.fill_diagonal(dom, False)
+
+    # Exposure bounds. A capped player (or one from a capped team) can be banned
+    # from later lineups, so it cannot stand in for anybody. Under a team min
+    # exposure the swap must stay on p's team. Players with a min are kept.
+    exposure = ExposureBounds.from_settings(pool, settings) if has_exposure_bounds(settings) else None
+    if exposure is not None:
+        has = pool.team_code >= 0
+        code = np.maximum(pool.team_code, 0)
+        capped = exposure.player_max < 1
+        if len(pool.teams):
+            capped |= has & (exposure.team_max[code] < 1)
+            team_min = has & (exposure.team_min[code] > 0)
+            dom[:, team_min] &= pool.team_code[:, None] == pool.team_code[None, team_min]
+        dom[capped, :] = False
+
+    # Stacks and opponent exclusions. A swap keeps every such row satisfied only
+    # if q counts exactly like p: same team, opponent and game, same membership
+    # in every rule.
+    stacks = stack_rules(rules, settings)
+    no_opp = opponent_rules(rules, settings)
+    if stacks or no_opp:
+        keys = [pool.team_code, pool.opp_code, pool.game_code]
+        for rule in stacks:
+            keys += list(stack_members(pool, rule))
+        for rule in no_opp:
+            keys += list(opponent_masks(pool, rule))
+        _, sig = np.unique(np.column_stack(keys).astype(int), axis=0, return_inverse=True)
+        sig = sig.ravel()
+        dom &= sig[:, None] == sig[None, :]
+
+    # Team limits. A dominator on another team cannot be swapped in if its team
+    # is already at max_from_team; at most `blocked_teams` teams can be full.
+    # min_teams is only safe to ignore if the other players alone always span
+    # enough teams; otherwise dominators must come from p's own team.
+    n_slots = elig.shape[1]
+    blocked_teams = 0
+    limits = getattr(rules, "team_limits", None)
+    if pool.has_team and limits is not None:
+        max_team, min_teams = limits.max_from_team, limits.min_teams
+        if max_team is not None and int(max_team) > 0:
+            blocked_teams = (n_slots - 1) // int(max_team)
+        spans = -(-(n_slots - 1) // int(max_team)) if max_team is not None and int(max_team) > 0 else 1
+        if (pool.team_code < 0).any():
+            spans = 1   # team-less players do not count towards min_teams
+        if min_teams is not None and spans < int(min_teams):
+            dom &= pool.team_code[:, None] == pool.team_code[None, :]
+            blocked_teams = 0
+
+    def usable(d: np.ndarray) -> np.ndarray:
+        """Dominators per player after removing the `blocked_teams` teams holding the most of them."""
+        total = d.sum(axis=0)
+        if blocked_teams == 0 or not pool.has_team:
+            return total
+        onehot = pool.team_code[:, None] == np.arange(len(pool.teams))[None, :]
+        per_team = onehot.T.astype(np.int64) @ d.astype(np.int64)       # teams x players
+        has = pool.team_code >= 0
+        per_team[pool.team_code[has], idx[has]] = 0                      # p's own team never blocks
+        top = np.sort(per_team, axis=0)[::-1][:blocked_teams].sum(axis=0)
+        return total - top
+
+    # Test 1: dominators with exactly p's eligibility
+    same = dom & (mask[:, None] == mask[None, :])
+    removable = usable(same) >= _popcount(mask) + (k - 1)
+
+    # Test 2: all dominators against the union of their slot instances
+    union = np.zeros(n, dtype=np.int64)
+    for m in np.unique(mask[mask != 0]).tolist():
+        has = dom[mask == m].any(axis=0)
+        union[has] |= m
+    removable |= (union != 0) & (usable(dom) >= _popcount(union) + (k - 1))
+
+    removable &= mask != 0
+    if exposure is not None:
+        removable &= exposure.player_min == 0
+    if locked is not None and len(locked):
+        removable[np.asarray(locked, dtype=int)] = False
+    return removable
+
+
+def presolve_pool(
+    pool: PlayerPool,
+    slot_instances: Any,
+    rules: Any,
+    settings: Dict[str, Any],
+    *,
+    locked: Optional[np.ndarray] = None,
+    k: int = 1,
+) -> PresolveResult:
+    """
+    Dominance presolve. Players eligible for no slot are dropped as well.
+    Locked players are always kept. k > 1 keeps the k best lineups (top-K mode).
+    """
+    t0 = time.perf_counter()
+    drop = dominated_players(pool, slot_instances, rules, settings, locked=locked, k=k)
+    no_slot = ~eligibility_mask(pool.positions, slot_instances).any(axis=1)
+    if locked is not None and len(locked):
+        no_slot[np.asarray(locked, dtype=int)] = False
+    keep = np.nonzero(~(drop | no_slot))[0]
+    return PresolveResult(keep=keep, before=pool.size, after=len(keep), seconds=time.perf_counter() - t0)
@@ -0,0 +1,238 @@
+# src/optimizer/session.py
+# Persistent model for interactive re-optimization
+#
+# optimize_df builds the MILP from scratch on every call. In the app most
+# re-runs follow a small edit: one EV weight, one lock, one exclusion.
+# OptimizerSession compiles the slate once (aggregated formulation, one binary
+# per player; per-slot columns when slots carry multipliers) and keeps the
+# solver backend loaded:
+#   - update_objective:  new weights / projections -> cost vector only
+#   - lock / exclude:    column bounds (lb = 1 / ub = 0)
+#   - resolve:           overlap cuts are appended for the run, then dropped
+# Settings that change the constraint rows (caps, chalk, ceiling, leverage
+# target, solver, ...) trigger a rebuild; `builds` counts them.
+#
+#   session = OptimizerSession(engine, df, rules, settings)
+#   lineups = session.resolve(num_lineups=20, max_overlap=6)
+#   session.lock(["12345"]); lineups = session.resolve()
+#
+from __future__ import annotations
+
+import time
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Iterator, List, Optional, Set
+
+import numpy as np
+import pandas as pd
+
+from .cache import cached_run, reproducible
+from .exposure import EXPOSURE_KEYS
+from .feasibility import check_feasibility
+from .model import build_lineup_model, ownership_penalty, player_objective
+from .solvers import get_backend
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .engine import DkRules, OptimizerEngine
+
+# Settings that only change the objective coefficients
+_OBJECTIVE_KEYS = ("objective_mode", "gpp_alpha", "projection_noise", "seed", "use_ownership", "ownership_weight")
+# Settings that only apply to one resolve() call
+_RUN_KEYS = (
+    "num_lineups", "max_overlap", "warm_start", "warm_start_baseline", "reuse_model", "time_limit", "time_budget",
+    "cache", "unique", "signature_index",
+) + EXPOSURE_KEYS
+# Handled through lock() / exclude()
+_PLAYER_KEYS = ("lock_player_ids", "exclude_player_ids")
+# Player columns the model rows depend on; a new frame that changes them rebuilds
+_ROW_COLUMNS = ("ids", "salary", "own", "ceiling", "team_code", "opp_code", "game_code")
+
+
+def _target_leverage(settings: Dict[str, Any]) -> bool:
+    return (
+        bool(settings.get("use_ownership", False))
+        and float(settings.get("ownership_weight", 0.0)) > 0
+        and settings.get("leverage_mode", "penalize_high_own") == "target_leverage"
+    )
+
+
+class OptimizerSession:
+    """Compiled lineup model for one slate and rule set, re-solved after small edits."""
+
+    def __init__(
+        self,
+        engine: "OptimizerEngine",
+        players_df: pd.DataFrame,
+        rules: "DkRules",
+        settings: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        settings = dict(settings or {})
+        self.engine = engine
+        self.rules = rules
+        self.players_df = players_df
+        self.settings = {k: v for k, v in settings.items() if k not in _RUN_KEYS + _PLAYER_KEYS}
+        self.locked: Set[str] = set()
+        self.excluded: Set[str] = set()
+        self.builds = 0
+        self._build()
+        self.lock(settings.get("lock_player_ids") or [])
+        self.exclude(settings.get("exclude_player_ids") or [])
+
+    def _build(self) -> None:
+        t0 = time.perf_counter()
+        pool, slot_instances, _ = self.engine._prepare_pool(self.players_df, self.rules, self.settings)
+        self.pool = pool
+        self.slot_instances = slot_instances
+        self.model = build_lineup_model(pool, slot_instances, self.rules, dict(self.settings, formulation="aggregated"))
+        gap = self.settings.get("mip_gap")
+        self.backend = get_backend(self.settings.get("solver"), mip_gap=float(gap) if gap is not None else None)
+        self._n_rows = self.model.n_rows
+        self._col_lb = self.model.col_lb.copy()
+        self._col_ub = self.model.col_ub.copy()
+        self.builds += 1
+        self.build_s = time.perf_counter() - t0
+        self._apply_bounds()
+
+    def _players(self, player_ids: Iterable[str]) -> List[str]:
+        ids = [str(p) for p in player_ids]
+        missing = [p for p in ids if p not in set(self.pool.ids)]
+        if missing:
+            raise ValueError(f"player_ids not found in the session slate: {missing}")
+        return ids
+
+    @property
+    def _per_player(self) -> bool:
+        # One column per player; slot multipliers keep the per-slot columns
+        return self.model.formulation == "aggregated"
+
+    def _apply_bounds(self) -> None:
+        lb, ub = self._col_lb.copy(), self._col_ub.copy()
+        locked = self.pool.index_of(sorted(self.locked))
+        ub[self.model.player_cols(self.pool.index_of(sorted(self.excluded)))] = 0.0
+        if not np.isin(locked, self.model.col_player[: self.model.n_x]).all():
+            ub[:] = 0.0   # a locked player fits no slot: nothing is feasible
+        elif self._per_player:
+            lb[self.model.player_cols(locked)] = 1.0
+        self.model.set_col_bounds(lb, ub)
+
+    def _lock_rows(self) -> None:
+        # Per-slot columns: a lock is a row (any of the player's slots), added per run
+        if not self._per_player:
+            for p in self.pool.index_of(sorted(self.locked)).tolist():
+                self.model.add_player_row(np.array([p]), 1.0, 1.0, f"lock_{self.pool.ids[p]}")
+
+    # --------
+    # Edits
+    # --------
+    def update_objective(self, players_df: Optional[pd.DataFrame] = None, **settings: Any) -> None:
+        """
+        New objective settings (EV weights, objective_mode, ownership penalty, ...)
+        and/or a players frame with new projections. Only the cost vector changes,
+        unless the edit touches the constraint rows; then the model is rebuilt.
+        """
+        new = dict(self.settings, **settings)
+        rebuild = _target_leverage(new) != _target_leverage(self.settings) or any(
+            new.get(k) != self.settings.get(k) for k in set(new) | set(self.settings) if k not in _OBJECTIVE_KEYS
+        )
+        pool = self.pool
+        if players_df is not None:
+            pool, _slots, _ = self.engine._prepare_pool(players_df, self.rules, new)
+            rebuild = rebuild or pool.size != self.pool.size or pool.positions != self.pool.positions or any(
+                not np.array_equal(getattr(pool, c), getattr(self.pool, c)) for c in _ROW_COLUMNS
+            )
+            self.players_df = players_df
+        self.settings = new
+        if rebuild:
+            self._build()
+            return
+
+        self.pool = self.model.pool = pool
+        c = self.model.c.copy()
+        c[: self.model.n_x] = self.model.column_costs(player_objective(pool, new), ownership_penalty(pool, new))
+        for name in ("delta_pos", "delta_neg"):
+            if name in self.model.aux_names:
+                c[self.model.n_x + self.model.aux_names.index(name)] = -float(new.get("ownership_weight", 0.0))
+        self.model.set_objective(c)
+
+    def lock(self, player_ids: Iterable[str], locked: bool = True) -> None:
+        """Force players into every lineup (locked=False releases them)."""
+        ids = self._players(player_ids)
+        if locked:
+            self.locked.update(ids)
+            self.excluded.difference_update(ids)
+        else:
+            self.locked.difference_update(ids)
+        self._apply_bounds()
+
+    def exclude(self, player_ids: Iterable[str], excluded: bool = True) -> None:
+        """Keep players out of every lineup (excluded=False brings them back)."""
+        ids = self._players(player_ids)
+        if excluded:
+            self.excluded.update(ids)
+            self.locked.difference_update(ids)
+        else:
+            self.excluded.difference_update(ids)
+        self._apply_bounds()
+
+    # --------
+    # Solve
+    # --------
+    def iter_resolve(self, **settings: Any) -> Iterator[Dict[str, Any]]:
+        """
+        Generator version of resolve. Keyword settings are the optimize_df settings:
+        num_lineups / max_overlap / warm_start / time_limit / time_budget and the
+        exposure bounds apply to this run only, lock_player_ids / exclude_player_ids replace the current locks /
+        exclusions, and anything else goes through update_objective.
+        """
+        # Cuts left behind by an abandoned generator
+        self.model.truncate_rows(self._n_rows)
+        self.backend.drop_rows(self._n_rows)
+
+        run = {k: settings.pop(k) for k in _RUN_KEYS if k in settings}
+        if "lock_player_ids" in settings or "exclude_player_ids" in settings:
+            self.locked = set(self._players(settings.pop("lock_player_ids", None) or []))
+            self.excluded = set(self._players(settings.pop("exclude_player_ids", None) or [])) - self.locked
+            self._apply_bounds()
+        if settings:
+            self.update_objective(**settings)
+
+        run_settings = dict(self.settings, **run)
+        num_lineups = max(1, int(run.get("num_lineups") or self.rules.num_lineups))
+        cache = self.engine.cache if run_settings.pop("cache", True) else None
+        # Keyed apart from optimize_df runs: the session solves the aggregated model
+        key_settings = dict(run_settings, lock_player_ids=self.locked, exclude_player_ids=self.excluded,
+                            session=True)
+        key_inputs = (self.players_df, self.rules, key_settings) if reproducible(run_settings) else None
+        yield from cached_run(cache, self.engine, key_inputs,
+                              lambda: self._run(run_settings, num_lineups, run.get("max_overlap")), num_lineups)
+
+    def _run(self, run_settings: Dict[str, Any], num_lineups: int, max_overlap: Optional[int]) -> Iterator[Dict[str, Any]]:
+        from .engine import _overlap_setting
+
+        locked_idx = self.pool.index_of(sorted(self.locked))
+
+        self.engine.last_diagnosis = None
+        if run_settings.get("feasibility_check", True):
+            keep = np.nonzero(~np.isin(self.pool.ids, sorted(self.excluded)))[0]
+            report = check_feasibility(self.pool.subset(keep), self.slot_instances, self.rules, run_settings,
+                                       locked=np.nonzero(np.isin(keep, locked_idx))[0])
+            if not report.feasible:
+                self.engine.last_diagnosis = report
+                return
+        self._lock_rows()
+        try:
+            yield from self.engine._iter_milp(
+                self.rules, self.pool, self.slot_instances, locked_idx, run_settings,
+                num_lineups=num_lineups,
+                max_overlap=_overlap_setting(run_settings, int(max_overlap) if max_overlap is not None else None,
+                                             len(self.slot_instances)),
+                t_start=time.perf_counter(),
+                model=self.model,
+                backend=self.backend,
+            )
+        finally:
+            # Drop this run's lock rows / overlap cuts from the model and the loaded solver
+            self.model.truncate_rows(self._n_rows)
+            self.backend.drop_rows(self._n_rows)
+
+    def resolve(self, **settings: Any) -> List[Dict[str, Any]]:
+        """Solve the current model. Same as list(iter_resolve(...))."""
+        return list(self.iter_resolve(**settings))
@@ -0,0 +1,221 @@
+# src/optimizer/signature.py
+# Compact lineup signatures and a duplicate index shared by every generator
+#
+# A lineup is a set of player codes 0 .. n_players-1 (pool indices, or codes
+# from a player_id vocabulary). Its signature is one uint64:
+#   - exact:  the sorted codes packed at ceil(log2(n_players)) bits each, when
+#             lineup_size * bits <= 64 (e.g. 8 golfers of 180: 64 bits)
+#   - hashed: otherwise a splitmix64 chain over the sorted codes. Two distinct
+#             lineups collide with probability ~2^-64 per pair, i.e. about
+#             3e-8 over a million lineups.
+# Signatures do not depend on slot order, so the same players in another slot
+# assignment are the same lineup (as in parallel.lineup_key).
+#
+# LineupIndex keeps the signatures in a numpy open-addressing hash set (linear
+# probing, load factor <= 1/2): 16 bytes per lineup, ~16 MB per million, against
+# ~200 bytes for a Python set of tuples. Batches of lineups are inserted with
+# vectorized probing, so the random builder can push 100k rows at once; single
+# lineups (MILP, knapsack) go through the same path.
+#
+#   index = LineupIndex(n_players, lineup_size)
+#   new = index.add(rows)          # rows: (n, lineup_size) codes -> bool mask
+#   index.add_one(players)         # True if the lineup was not seen before
+#
+# Engine lineups are signed over stable player codes instead (player_code: a
+# 63-bit hash of the player_id, the same in every run and process), so
+# meta["signature"] compares across runs, sessions and parallel merges, and one
+# LineupIndex.for_ids index can be shared between them (settings["signature_index"]).
+#
+from __future__ import annotations
+
+import hashlib
+from typing import Any, Collection, Dict, Hashable, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+_M1 = np.uint64(0xBF58476D1CE4E5B9)
+_M2 = np.uint64(0x94D049BB133111EB)
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+_EMPTY = np.uint64(0)
+# Code space of player_code: always the hashed signature
+ID_SPACE = 1 << 63
+
+
+def _mix(h: np.ndarray) -> np.ndarray:
+    """splitmix64 finalizer (uint64 arrays; wraps around)."""
+    h = h ^ (h >> np.uint64(30))
+    h = h * _M1
+    h = h ^ (h >> np.uint64(27))
+    h = h * _M2
+    return h ^ (h >> np.uint64(31))
+
+
+def code_bits(n_players: int) -> int:
+    return max(1, int(max(n_players, 1) - 1).bit_length())
+
+
+def is_exact(n_players: int, lineup_size: int) -> bool:
+    """True when signatures of this shape are collision-free packings."""
+    return lineup_size * code_bits(n_players) <= 64
+
+
+def lineup_signatures(rows: np.ndarray, n_players: int) -> np.ndarray:
+    """uint64 signature per row of player codes (any order within a row)."""
+    rows = np.sort(np.atleast_2d(np.asarray(rows, dtype=np.int64)), axis=1).astype(np.uint64)
+    n, k = rows.shape
+    if is_exact(n_players, k):
+        bits = code_bits(n_players)
+        sig = np.zeros(n, dtype=np.uint64)
+        for j in range(k):
+            sig |= rows[:, j] << np.uint64(bits * j)
+        return sig
+    h = np.full(n, np.uint64(k), dtype=np.uint64)
+    for j in range(k):
+        h = _mix(h * _GOLDEN + rows[:, j])
+    return h
+
+
+class LineupIndex:
+    """Set of lineup signatures (numpy open addressing)."""
+
+    def __init__(self, n_players: int, lineup_size: int, *, capacity: int = 1024) -> None:
+        self.n_players = int(n_players)
+        self.lineup_size = int(lineup_size)
+        self.exact = is_exact(self.n_players, self.lineup_size)
+        size = 1 << max(4, int(2 * max(capacity, 1) - 1).bit_length())
+        self._table = np.zeros(size, dtype=np.uint64)
+        self._has_zero = False   # signature 0 marks empty cells; kept aside
+        self._count = 0
+
+    @classmethod
+    def for_ids(cls, lineup_size: int, *, capacity: int = 1024) -> "LineupIndex":
+        """Index over player_code codes: engine lineups of any run or process."""
+        return cls(ID_SPACE, lineup_size, capacity=capacity)
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def nbytes(self) -> int:
+        return int(self._table.nbytes)
+
+    def signatures(self, rows: np.ndarray) -> np.ndarray:
+        return lineup_signatures(rows, self.n_players)
+
+    def signature(self, players: Sequence[int]) -> int:
+        return int(self.signatures(np.asarray(players)[None, :])[0])
+
+    def contains(self, sigs: np.ndarray) -> np.ndarray:
+        """bool mask: signature already in the index."""
+        sigs = np.asarray(sigs, dtype=np.uint64).ravel()
+        out = np.zeros(len(sigs), dtype=bool)
+        zero = sigs == _EMPTY
+        out[zero] = self._has_zero
+        todo = np.nonzero(~zero)[0]
+        mask = np.uint64(len(self._table) - 1)
+        pos = _mix(sigs[todo]) & mask
+        while todo.size:
+            cur = self._table[pos.astype(np.int64)]
+            hit = cur == sigs[todo]
+            out[todo[hit]] = True
+            more = ~hit & (cur != _EMPTY)
+            todo, pos = todo[more], (pos[more] + np.uint64(1)) & mask
+        return out
+
+    def __contains__(self, players: Sequence[int]) -> bool:
+        return bool(self.contains(self.signatures(np.asarray(players)[None, :]))[0])
+
+    def add_signatures(self, sigs: np.ndarray) -> np.ndarray:
+        """Insert signatures; bool mask of the ones not seen before (first occurrence in the batch)."""
+        sigs = np.asarray(sigs, dtype=np.uint64).ravel()
+        new = np.zeros(len(sigs), dtype=bool)
+        uniq, first = np.unique(sigs, return_index=True)
+        if len(uniq) and uniq[0] == _EMPTY:
+            if not self._has_zero:
+                self._has_zero = True
+                self._count += 1
+                new[first[0]] = True
+            uniq, first = uniq[1:], first[1:]
+        if not len(uniq):
+            return new
+        if 2 * (self._count + len(uniq)) > len(self._table):
+            self._grow(self._count + len(uniq))
+        new[first[self._insert(uniq)]] = True
+        return new
+
+    def add(self, rows: np.ndarray) -> np.ndarray:
+        """Insert lineups (rows of player codes); bool mask of the new ones."""
+        return self.add_signatures(self.signatures(rows))
+
+    def add_one(self, players: Sequence[int]) -> bool:
+        return bool(self.add(np.asarray(players)[None, :])[0])
+
+    def _insert(self, keys: np.ndarray) -> np.ndarray:
+        """Insert distinct non-zero keys; bool mask of the ones that were absent."""
+        table = self._table
+        mask = np.uint64(len(table) - 1)
+        new = np.zeros(len(keys), dtype=bool)
+        todo = np.arange(len(keys))
+        pos = _mix(keys) & mask
+        while todo.size:
+            p = pos.astype(np.int64)
+            cur = table[p]
+            k = keys[todo]
+            empty = cur == _EMPTY
+            table[p[empty]] = k[empty]       # several keys may claim one cell: the last write wins
+            won = empty & (table[p] == k)
+            done = won | (cur == k)
+            new[todo[won]] = True
+            todo, pos = todo[~done], (pos[~done] + np.uint64(1)) & mask
+        self._count += int(new.sum())
+        return new
+
+    def _grow(self, needed: int) -> None:
+        old = self._table[self._table != _EMPTY]
+        size = len(self._table)
+        while 2 * needed > size:
+            size *= 2
+        self._table = np.zeros(size, dtype=np.uint64)
+        self._count = int(self._has_zero)
+        self._insert(old)
+
+
+def vocabulary(lineups: Iterable[Iterable[Hashable]]) -> Dict[Hashable, int]:
+    """Code per distinct player key (player_id), in order of first appearance."""
+    codes: Dict[Hashable, int] = {}
+    for players in lineups:
+        for p in players:
+            codes.setdefault(p, len(codes))
+    return codes
+
+
+def encode(lineups: Sequence[Sequence[Hashable]], codes: Dict[Hashable, int], lineup_size: Optional[int] = None) -> np.ndarray:
+    """(n, lineup_size) code rows for lineups given as player keys."""
+    k = lineup_size if lineup_size is not None else (len(lineups[0]) if len(lineups) else 0)
+    out = np.empty((len(lineups), k), dtype=np.int64)
+    for i, players in enumerate(lineups):
+        out[i] = [codes[p] for p in players]
+    return out
+
+
+def player_code(key: Hashable) -> int:
+    """Stable 63-bit code of a player key (unlike hash(), the same in every process)."""
+    return int.from_bytes(hashlib.blake2b(str(key).encode(), digest_size=8).digest(), "little") >> 1
+
+
+def lineup_codes(lineup: Dict[str, Any], multiplied: Collection[str] = ()) -> List[int]:
+    """
+    player_code per slot of an engine lineup dict (its pool player_id). A player
+    in a `multiplied` slot (Showdown CPT) gets its own code, so the same players
+    under another captain are another lineup.
+    """
+    codes = []
+    for r in lineup["slots"]:
+        pid = str(r.get("base_player_id", r["player_id"]))
+        codes.append(player_code(f"{r['slot']}:{pid}" if r.get("slot") in multiplied else pid))
+    return codes
+
+
+def signature_hex(sig: int) -> str:
+    return f"{int(sig):016x}"
+
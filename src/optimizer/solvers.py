@@ -0,0 +1,363 @@
+# src/optimizer/solvers.py
+# Pluggable solver backends for OptimizerEngine
+#
+# Backends:
+#   - "cbc":   PuLP's bundled CBC. Writes the model to disk and runs a subprocess
+#              per solve. Always available; used as the fallback.
+#   - "highs": HiGHS in-process through highspy (pip install highspy).
+#              The CSR matrix is passed as one block; no temp files, no subprocess.
+#
+# Selected with settings["solver"] in optimize_df. A known backend that is not
+# installed falls back to CBC, so a missing optional dependency never breaks a
+# run; an unknown name (a typo such as "higs") raises ValueError.
+#
+# New backends subclass SolverBackend and implement its abstract hooks (_load,
+# _delete_rows, _add_rows, _set_objective, _set_bounds, _run); a missing hook
+# fails when the backend is created, not halfway through a solve.
+#
+# Backends are stateful: they keep the loaded model between solves and only push
+# what changed (appended rows such as overlap cuts, objective, column bounds).
+# Rows dropped with LineupModel.truncate_rows are removed with drop_rows.
+#
+# Warm start: solve(model, start=x0) passes a feasible point as the initial
+# incumbent (CBC mipstart file / HiGHS setSolution). Both backends report the
+# branch-and-bound node count in SolveResult.nodes.
+#
+# mip_gap: relative optimality gap handed to the solver (None = solver default;
+# CBC stops at 0, HiGHS at 1e-4). Top-K enumeration sets 0 so lineups are ranked
+# exactly.
+#
+# Time limits: solve(model, time_limit=s) stops the search after s seconds and
+# returns the best incumbent found. SolveResult.x is set whenever there is a
+# feasible point; SolveResult.optimal is True only if the solver proved it
+# optimal (within mip_gap). SolveResult.gap is the relative gap at the end of the
+# search, where the backend reports one.
+#
+from __future__ import annotations
+
+import os
+import re
+import tempfile
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Type
+
+import numpy as np
+import pulp
+from pulp import (
+    LpAffineExpression, LpBinary, LpContinuous, LpMaximize, LpProblem, LpSolutionOptimal, LpStatusOptimal, LpVariable,
+    PULP_CBC_CMD,
+)
+
+from .model import LineupModel
+
+try:
+    import highspy  # type: ignore
+except Exception:  # pragma: no cover - optional dependency
+    highspy = None
+
+DEFAULT_SOLVER = "cbc"
+
+
+@dataclass
+class SolveResult:
+    status: str
+    optimal: bool
+    objective: Optional[float]
+    seconds: float
+    backend: str
+    x: Optional[np.ndarray] = None
+    nodes: Optional[int] = None
+    warm_start: bool = False
+    gap: Optional[float] = None
+
+
+class SolverBackend(ABC):
+    """Base class: a backend solves a LineupModel and returns the column values."""
+
+    name = "base"
+
+    def __init__(self, *, mip_gap: Optional[float] = None) -> None:
+        self.mip_gap = mip_gap
+        self._model: Optional[LineupModel] = None
+        self._rows_loaded = 0
+        self._obj_rev = -1
+        self._bounds_rev = -1
+
+    def available(self) -> bool:
+        return False
+
+    def solve(
+        self,
+        model: LineupModel,
+        start: Optional[np.ndarray] = None,
+        *,
+        time_limit: Optional[float] = None,
+    ) -> SolveResult:
+        """
+        Solve the current model. `start` is an optional feasible point used as initial
+        incumbent; `time_limit` (seconds) stops the search with the best incumbent.
+        """
+        t0 = time.perf_counter()
+        if model is not self._model:
+            self._load(model)
+            self._model = model
+            self._rows_loaded = model.n_rows
+            self._obj_rev = model.obj_rev
+            self._bounds_rev = model.bounds_rev
+        else:
+            if model.n_rows > self._rows_loaded:
+                self._add_rows(model, self._rows_loaded)
+                self._rows_loaded = model.n_rows
+            if model.obj_rev != self._obj_rev:
+                self._set_objective(model)
+                self._obj_rev = model.obj_rev
+            if model.bounds_rev != self._bounds_rev:
+                self._set_bounds(model)
+                self._bounds_rev = model.bounds_rev
+        result = self._run(model, start, time_limit)
+        result.warm_start = start is not None
+        result.seconds = time.perf_counter() - t0
+        return result
+
+    def drop_rows(self, n_rows: int) -> None:
+        """Remove loaded rows [n_rows, ..) to match LineupModel.truncate_rows(n_rows)."""
+        if self._model is not None and self._rows_loaded > n_rows:
+            self._delete_rows(n_rows, self._rows_loaded)
+            self._rows_loaded = n_rows
+
+    # Backend hooks
+    @abstractmethod
+    def _load(self, model: LineupModel) -> None:
+        """Load the whole model (a new LineupModel object)."""
+
+    @abstractmethod
+    def _delete_rows(self, start: int, stop: int) -> None:
+        """Remove loaded rows [start, stop)."""
+
+    @abstractmethod
+    def _add_rows(self, model: LineupModel, start: int) -> None:
+        """Append model rows [start, model.n_rows)."""
+
+    @abstractmethod
+    def _set_objective(self, model: LineupModel) -> None:
+        """Objective coefficients."""
+
+    @abstractmethod
+    def _set_bounds(self, model: LineupModel) -> None:
+        """Column bounds."""
+
+    @abstractmethod
+    def _run(self, model: LineupModel, start: Optional[np.ndarray], time_limit: Optional[float]) -> SolveResult:
+        """Solve the loaded model."""
+
+
+class CbcBackend(SolverBackend):
+    name = "cbc"
+
+    def available(self) -> bool:
+        return True
+
+    def _load(self, model: LineupModel) -> None:
+        self._prob = LpProblem("dk_optimizer", LpMaximize)
+        self._vars = [
+            LpVariable(f"x{j}", lowBound=model.col_lb[j], upBound=_finite(model.col_ub[j]),
+                       cat=LpBinary if model.integrality[j] and model.col_ub[j] <= 1 else LpContinuous)
+            for j in range(model.n_cols)
+        ]
+        self._set_bounds(model)   # LpBinary resets bounds to [0, 1]; keep fixed columns fixed
+        self._row_cons: List[List[str]] = []   # PuLP constraint names per model row
+        self._set_objective(model)
+        self._add_rows(model, 0)
+
+    def _add_rows(self, model: LineupModel, start: int) -> None:
+        for i in range(start, model.n_rows):
+            cols, vals = model.row(i)
+            expr = LpAffineExpression([(self._vars[j], v) for j, v in zip(cols.tolist(), vals.tolist())])
+            lb, ub, name = model.row_lb[i], model.row_ub[i], model.row_names[i]
+            cons = []
+            if lb == ub:
+                cons.append((expr == lb, name))
+            else:
+                if np.isfinite(lb):
+                    cons.append((expr >= lb, name if not np.isfinite(ub) else f"{name}_lb"))
+                if np.isfinite(ub):
+                    cons.append((expr <= ub, name if not np.isfinite(lb) else f"{name}_ub"))
+            for con in cons:
+                self._prob += con
+            self._row_cons.append([c.name for c, _n in cons])   # as stored by PuLP
+
+    def _delete_rows(self, start: int, stop: int) -> None:
+        for names in self._row_cons[start:stop]:
+            for name in names:
+                del self._prob.constraints[name]
+        del self._row_cons[start:stop]
+
+    def _set_objective(self, model: LineupModel) -> None:
+        nz = np.nonzero(model.c)[0]
+        self._prob.setObjective(LpAffineExpression([(self._vars[j], model.c[j]) for j in nz.tolist()]))
+
+    def _set_bounds(self, model: LineupModel) -> None:
+        for j, v in enumerate(self._vars):
+            v.lowBound = model.col_lb[j]
+            v.upBound = _finite(model.col_ub[j])
+
+    def _run(self, model: LineupModel, start: Optional[np.ndarray], time_limit: Optional[float]) -> SolveResult:
+        if start is not None:
+            for v, val in zip(self._vars, start.tolist()):
+                v.setInitialValue(round(val) if v.cat == LpBinary else val)
+        fd, log_path = tempfile.mkstemp(suffix=".log")
+        os.close(fd)
+        try:
+            status = self._prob.solve(PULP_CBC_CMD(
+                msg=False, warmStart=start is not None, logPath=log_path, gapRel=self.mip_gap,
+                timeLimit=time_limit,
+            ))
+            with open(log_path, errors="replace") as f:
+                log = f.read()
+        finally:
+            os.remove(log_path)
+        nodes, bound = _CBC_NODES.search(log), _CBC_BOUND.search(log)
+        # A solve stopped on time with an incumbent reads as Optimal / IntegerFeasible
+        found = status == LpStatusOptimal
+        optimal = found and self._prob.sol_status == LpSolutionOptimal
+        x = np.array([v.varValue or 0.0 for v in self._vars]) if found else None
+        objective = float(model.c @ x) if found else None
+        gap = 0.0 if optimal else None
+        if found and bound:
+            gap = abs(float(bound.group(1)) - objective) / max(abs(objective), 1e-9)
+        return SolveResult(
+            status=pulp.LpStatus.get(status, str(status)) if optimal or not found else "Time limit",
+            optimal=optimal,
+            objective=objective,
+            seconds=0.0,
+            backend=self.name,
+            x=x,
+            nodes=int(nodes.group(1)) if nodes else None,
+            gap=gap,
+        )
+
+
+class HighsBackend(SolverBackend):
+    name = "highs"
+
+    def available(self) -> bool:
+        return highspy is not None
+
+    def _load(self, model: LineupModel) -> None:
+        h = highspy.Highs()
+        h.setOptionValue("output_flag", False)
+        if self.mip_gap is not None:
+            h.setOptionValue("mip_rel_gap", float(self.mip_gap))
+        lp = highspy.HighsLp()
+        lp.num_col_ = model.n_cols
+        lp.num_row_ = model.n_rows
+        lp.sense_ = highspy.ObjSense.kMaximize
+        lp.col_cost_ = model.c
+        lp.col_lower_ = model.col_lb
+        lp.col_upper_ = model.col_ub
+        lp.row_lower_ = model.row_lb
+        lp.row_upper_ = model.row_ub
+        lp.a_matrix_.format_ = highspy.MatrixFormat.kRowwise
+        lp.a_matrix_.start_ = model.indptr.astype(np.int32)
+        lp.a_matrix_.index_ = model.indices.astype(np.int32)
+        lp.a_matrix_.value_ = model.data
+        var_types = (highspy.HighsVarType.kContinuous, highspy.HighsVarType.kInteger)
+        lp.integrality_ = [var_types[b] for b in model.integrality.tolist()]
+        h.passModel(lp)
+        self._h = h
+
+    def _add_rows(self, model: LineupModel, start: int) -> None:
+        a, b = model.indptr[start], model.indptr[-1]
+        n = model.n_rows - start
+        self._h.addRows(
+            n,
+            model.row_lb[start:],
+            model.row_ub[start:],
+            int(b - a),
+            (model.indptr[start:-1] - a).astype(np.int32),
+            model.indices[a:b].astype(np.int32),
+            model.data[a:b],
+        )
+
+    def _delete_rows(self, start: int, stop: int) -> None:
+        self._h.deleteRows(stop - start, np.arange(start, stop, dtype=np.int32))
+
+    def _set_objective(self, model: LineupModel) -> None:
+        self._h.changeColsCost(model.n_cols, np.arange(model.n_cols, dtype=np.int32), model.c)
+
+    def _set_bounds(self, model: LineupModel) -> None:
+        self._h.changeColsBounds(model.n_cols, np.arange(model.n_cols, dtype=np.int32), model.col_lb, model.col_ub)
+
+    def _run(self, model: LineupModel, start: Optional[np.ndarray], time_limit: Optional[float]) -> SolveResult:
+        h = self._h
+        h.setOptionValue("time_limit", float(time_limit) if time_limit is not None else highspy.kHighsInf)
+        # Drop any incumbent from the previous run so cold solves are really cold
+        h.clearSolver()
+        if start is not None:
+            sol = highspy.HighsSolution()
+            sol.col_value = start.tolist()
+            sol.value_valid = True
+            h.setSolution(sol)
+        h.run()
+        ms = h.getModelStatus()
+        info = h.getInfo()
+        optimal = ms == highspy.HighsModelStatus.kOptimal
+        found = optimal or info.primal_solution_status == 2   # kSolutionStatusFeasible
+        x = np.array(h.getSolution().col_value) if found else None
+        return SolveResult(
+            status=h.modelStatusToString(ms),
+            optimal=optimal,
+            objective=float(info.objective_function_value) if found else None,
+            seconds=0.0,
+            backend=self.name,
+            x=x,
+            nodes=int(info.mip_node_count),
+            gap=float(info.mip_gap) if found and np.isfinite(info.mip_gap) else None,
+        )
+
+
+_CBC_NODES = re.compile(r"Enumerated nodes:\s+(\d+)")
+_CBC_BOUND = re.compile(r"^(?:Upper|Lower) bound:\s+([-+\d.eE]+)", re.MULTILINE)
+
+
+def time_left(time_limit: Optional[float], deadline: Optional[float]) -> Optional[float]:
+    """
+    Time limit for the next solve: the per-solve limit capped by what is left
+    before `deadline` (a time.perf_counter() value). None = unlimited.
+    """
+    limits = [float(time_limit)] if time_limit is not None else []
+    if deadline is not None:
+        limits.append(deadline - time.perf_counter())
+    return min(limits) if limits else None
+
+
+def _finite(v: float) -> Optional[float]:
+    return float(v) if np.isfinite(v) else None
+
+
+_BACKENDS: Dict[str, Type[SolverBackend]] = {
+    "cbc": CbcBackend,
+    "highs": HighsBackend,
+}
+
+
+def available_solvers() -> List[str]:
+    """Names of backends that can run in this environment."""
+    return [name for name, cls in _BACKENDS.items() if cls().available()]
+
+
+def get_backend(name: Optional[str] = None, *, mip_gap: Optional[float] = None) -> SolverBackend:
+    """
+    Return a fresh backend for `name` (case-insensitive).
+    Falls back to CBC if the backend is not installed; raises ValueError for an unknown name.
+    """
+    key = str(name or DEFAULT_SOLVER).strip().lower()
+    cls = _BACKENDS.get(key)
+    if cls is None:
+        raise ValueError(f"Unknown solver {name!r}; expected one of {sorted(_BACKENDS)}.")
+    backend = cls(mip_gap=mip_gap)
+    if backend.available():
+        return backend
+    return CbcBackend(mip_gap=mip_gap)
@@ -0,0 +1,146 @@
+# src/optimizer/stacking.py
+# Declarative stack rules compiled into lineup-model rows
+#
+# Rules come from the `stacks` list of a rules/dk/*.yaml file, or from
+# settings["stacks"] (same fields; replaces the YAML list, [] turns stacking off):
+#
+#   type: team        at least `count` teams with >= min_players players
+#                     (MLB 4-hitter primary + 2-hitter secondary stack)
+#   type: game        at least `count` games with >= min_players players
+#   type: anchor      every `anchor` player has >= min_players teammates
+#                     (NFL QB + WR/TE, LOL TEAM + players)
+#   type: bring_back  every `anchor` player has >= min_players players from
+#                     the opposing team (needs opp / game data)
+#
+# `positions` limits which players count (empty: everybody); for anchor /
+# bring_back rules, players matching `anchor` never count as their own stack.
+#
+# Formulation (x = player selected):
+#   team / game:  z_g binary per team / game with enough eligible players
+#                   sum_{g players} x - min_players * z_g >= 0,   sum_g z_g >= count
+#   anchor:       one row per team t with anchor players
+#                   sum_{t stack players} x - min_players * sum_{t anchors} x >= 0
+#   bring_back:   same, with the stack players taken from t's opponents
+# Rows are named stack_<rule name>:<team / game / "count">, z columns z_<row name>.
+#
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, Iterable, List, Tuple
+
+import numpy as np
+
+STACK_TYPES = ("team", "game", "anchor", "bring_back")
+
+# (columns, coefficients, lb, ub, row name)
+Row = Tuple[np.ndarray, np.ndarray, float, float, str]
+
+
+@dataclass(frozen=True)
+class StackRule:
+    type: str
+    min_players: int
+    count: int = 1                                  # team / game: number of stacked teams / games
+    positions: FrozenSet[str] = frozenset()         # players that count towards the stack (empty: all)
+    anchor: FrozenSet[str] = frozenset()            # anchor / bring_back: positions stacked around
+    name: str = ""
+
+
+def position_tokens(value: Any) -> FrozenSet[str]:
+    if value is None:
+        return frozenset()
+    items = value if isinstance(value, (list, tuple, set, frozenset)) else [value]
+    out = set()
+    for item in items:
+        for tok in str(item).replace("|", "/").replace(",", "/").split("/"):
+            if tok.strip():
+                out.add(tok.strip().upper())
+    return frozenset(out)
+
+
+def parse_stack_rules(raw: Iterable[Any]) -> List[StackRule]:
+    """StackRule list from YAML / settings entries (dicts or StackRule)."""
+    rules: List[StackRule] = []
+    for i, entry in enumerate(raw or []):
+        if isinstance(entry, StackRule):
+            rules.append(entry)
+            continue
+        if not isinstance(entry, dict):
+            raise ValueError(f"Invalid stack entry (must be dict): {entry}")
+        kind = str(entry.get("type", "team")).strip().lower()
+        if kind not in STACK_TYPES:
+            raise ValueError(f"Unknown stack type '{kind}'. Use one of {STACK_TYPES}")
+        min_players = int(entry.get("min_players", 0))
+        count = int(entry.get("count", 1))
+        anchor = position_tokens(entry.get("anchor"))
+        if min_players <= 0 or count <= 0:
+            raise ValueError(f"Stack entry needs positive min_players and count: {entry}")
+        if kind in ("anchor", "bring_back") and not anchor:
+            raise ValueError(f"Stack type '{kind}' needs an anchor position list: {entry}")
+        name = str(entry.get("name") or f"{kind}{i + 1}").strip().replace(" ", "_")
+        rules.append(StackRule(kind, min_players, count, position_tokens(entry.get("positions")), anchor, name))
+    return rules
+
+
+def stack_rules(rules: Any, settings: Dict[str, Any]) -> List[StackRule]:
+    """Active stack rules: settings["stacks"] when given, else the rules file."""
+    if settings.get("stacks") is not None:
+        return parse_stack_rules(settings["stacks"])
+    return list(getattr(rules, "stacks", None) or [])
+
+
+def matches(pool: Any, tokens: FrozenSet[str]) -> np.ndarray:
+    """Players with a position in `tokens` (everybody when tokens is empty)."""
+    if not tokens:
+        return np.ones(pool.size, dtype=bool)
+    return np.array([bool(ps & tokens) for ps in pool.positions], dtype=bool)
+
+
+def stack_members(pool: Any, rule: StackRule) -> Tuple[np.ndarray, np.ndarray]:
+    """(players counting towards the stack, anchor players) masks."""
+    anchors = matches(pool, rule.anchor) if rule.anchor else np.zeros(pool.size, dtype=bool)
+    members = matches(pool, rule.positions) & ~anchors
+    return members, anchors
+
+
+def stack_groups(pool: Any, rule: StackRule) -> Tuple[np.ndarray, List[str]]:
+    """Group code per player (team or game, -1 unknown) and group labels of a team / game rule."""
+    if rule.type == "game":
+        return pool.game_code, pool.games
+    return pool.team_code, pool.teams
+
+
+def compile_stacks(pool: Any, col_player: np.ndarray, stacks: List[StackRule], aux0: int) -> Tuple[List[str], List[Row]]:
+    """
+    Rows for the stack rules over columns col_player (x columns); new binary
+    columns start at aux0. Returns (aux column names, rows).
+    """
+    aux_names: List[str] = []
+    rows: List[Row] = []
+    for rule in stacks:
+        members, anchors = stack_members(pool, rule)
+        if rule.type in ("team", "game"):
+            group, labels = stack_groups(pool, rule)
+            sizes = np.bincount(group[members & (group >= 0)], minlength=len(labels))
+            z_cols = []
+            for g in np.nonzero(sizes >= rule.min_players)[0].tolist():
+                z = aux0 + len(aux_names)
+                row = f"stack_{rule.name}:{labels[g]}"
+                aux_names.append(f"z_{row}")
+                z_cols.append(z)
+                cols = np.nonzero((members & (group == g))[col_player])[0]
+                rows.append((np.append(cols, z), np.append(np.ones(len(cols)), -float(rule.min_players)),
+                             0.0, np.inf, row))
+            rows.append((np.asarray(z_cols, dtype=int), np.ones(len(z_cols)), float(rule.count), np.inf,
+                         f"stack_{rule.name}:count"))
+        else:
+            partner = pool.team_code if rule.type == "anchor" else pool.opp_code
+            for t in np.unique(pool.team_code[anchors & (pool.team_code >= 0)]).tolist():
+                stack_cols = np.nonzero((members & (partner == t))[col_player])[0]
+                anchor_cols = np.nonzero((anchors & (pool.team_code == t))[col_player])[0]
+                rows.append((
+                    np.concatenate([stack_cols, anchor_cols]),
+                    np.concatenate([np.ones(len(stack_cols)), np.full(len(anchor_cols), -float(rule.min_players))]),
+                    0.0, np.inf, f"stack_{rule.name}:{pool.teams[t]}",
+                ))
+    return aux_names, rows
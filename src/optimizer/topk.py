@@ -0,0 +1,106 @@
+# src/optimizer/topk.py
+# Exact K best distinct lineups by Lawler-Murty partitioning
+#
+# Emulating top-K with max_overlap = lineup_size - 1 appends one no-good cut per
+# lineup found, so every solve is slower than the one before. Here the model
+# never grows. The best lineup L = {p1, ..., pn} of a subproblem splits the rest
+# of that subproblem into n disjoint children:
+#   child i:  p1 .. p(i-1) forced in, p(i) forced out
+# Each child holds one no-good cut on L in the form of a column bound. Children
+# are solved when their parent is taken from the heap, and the heap always pops
+# the best remaining subproblem optimum, so lineups come out in order of
+# objective value.
+#
+# The model must be aggregated (one binary per player): forcing a player in or
+# out is then a bound change, which stateful backends push without reloading.
+# The backend must solve with mip_gap=0. A child solved only to within a gap can
+# be ranked below a lineup that is really worse. The same holds for a child cut
+# short by a time limit; its lineup is reported as not optimal.
+#
+from __future__ import annotations
+
+import heapq
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from .model import LineupModel
+from .solvers import SolverBackend, time_left
+
+
+class TopKSearch:
+    """
+    Best-first enumeration of distinct lineups (player sets) of `model`.
+    Counters (solves, nodes, solve_s) accumulate across iter_lineups.
+    """
+
+    def __init__(self, model: LineupModel, backend: SolverBackend, *, locked: Optional[np.ndarray] = None) -> None:
+        if model.formulation != "aggregated":
+            raise ValueError("Top-K enumeration needs the aggregated formulation (one column per player).")
+        self.model = model
+        self.backend = backend
+        self.locked = set(int(p) for p in (locked if locked is not None else []))
+        self.col_of = np.full(model.pool.size, -1, dtype=int)
+        self.col_of[model.col_player[: model.n_x]] = np.arange(model.n_x)
+        self._lb = model.col_lb.copy()
+        self._ub = model.col_ub.copy()
+        self.solves = 0
+        self.nodes = 0
+        self.solve_s = 0.0
+
+    def _solve(
+        self, forced_in: Tuple[int, ...], forced_out: Tuple[int, ...], time_limit: Optional[float],
+    ) -> Optional[Tuple[float, np.ndarray, bool]]:
+        lb, ub = self._lb.copy(), self._ub.copy()
+        lb[self.col_of[list(forced_in)]] = 1.0
+        ub[self.col_of[list(forced_out)]] = 0.0
+        self.model.set_col_bounds(lb, ub)
+        result = self.backend.solve(self.model, time_limit=time_limit)
+        self.solves += 1
+        self.nodes += result.nodes or 0
+        self.solve_s += result.seconds
+        if result.x is None:
+            return None
+        return float(result.objective), result.x, result.optimal
+
+    def iter_lineups(
+        self,
+        k: int,
+        *,
+        time_limit: Optional[float] = None,
+        deadline: Optional[float] = None,
+    ) -> Iterator[Tuple[float, np.ndarray, bool]]:
+        """
+        Yield up to k (objective, x, optimal) tuples, best first, each a different
+        player set. time_limit caps each subproblem solve; enumeration stops at
+        deadline (a time.perf_counter() value).
+        """
+        heap: List[Tuple[float, int, np.ndarray, bool, Tuple[int, ...], Tuple[int, ...]]] = []
+        count = 0
+
+        def push(forced_in: Tuple[int, ...], forced_out: Tuple[int, ...]) -> bool:
+            nonlocal count
+            limit = time_left(time_limit, deadline)
+            if limit is not None and limit <= 0:
+                return False
+            solved = self._solve(forced_in, forced_out, limit)
+            if solved is not None:
+                count += 1
+                heapq.heappush(heap, (-solved[0], count, solved[1], solved[2], forced_in, forced_out))
+            return True
+
+        push((), ())
+        for found in range(1, k + 1):
+            if not heap:
+                return
+            neg_value, _n, x, optimal, forced_in, forced_out = heapq.heappop(heap)
+            yield -neg_value, x, optimal
+            if found == k:
+                return
+
+            players = self.model.col_player[np.nonzero(x[: self.model.n_x] > 0.5)[0]]
+            fixed = set(forced_in) | self.locked
+            free = [int(p) for p in players if int(p) not in fixed]
+            for i, p in enumerate(free):
+                if not push(forced_in + tuple(free[:i]), forced_out + (p,)):
+                    return   # budget spent
@@ -0,0 +1,88 @@
+# src/optimizer/warmstart.py
+# Initial incumbents for consecutive lineup solves
+#
+# With max_overlap, lineup k+1 may share at most max_overlap players with
+# lineup k, so the previous optimum is never feasible as-is. repair_lineup keeps
+# its best max_overlap players, refills the open slots greedily by objective
+# (respecting slot eligibility, the salary cap and the opponent exclusions of
+# optimizer/opponents.py), and returns the full column vector only if it
+# satisfies every row of the current model. Other rules (stacks, team limits,
+# exposure) are not steered for; a refill that breaks them gives no start.
+#
+from __future__ import annotations
+
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .assignment import assign_slots
+from .model import LineupModel
+from .opponents import OpponentRule, opponent_masks
+
+
+def _opponent_clash(pool, masks: List[Tuple[np.ndarray, np.ndarray]], chosen: Sequence[int], p: int) -> bool:
+    """True if p and a chosen player are opponents excluded by one of the rules."""
+    g = pool.game_code[p]
+    if g < 0 or not masks:
+        return False
+    rivals = [q for q in chosen if pool.game_code[q] == g and pool.team_code[q] != pool.team_code[p]]
+    return any((side[q] and versus[p]) or (side[p] and versus[q]) for side, versus in masks for q in rivals)
+
+
+def repair_lineup(
+    model: LineupModel,
+    prev_players: Sequence[int],
+    coef: np.ndarray,
+    *,
+    max_overlap: Optional[int],
+    locked: Optional[np.ndarray] = None,
+    opponents: Sequence[OpponentRule] = (),
+) -> Optional[np.ndarray]:
+    """
+    prev_players: player indices of the previous lineup
+    coef: per-player objective coefficient (used to rank keep / refill candidates)
+    opponents: the model's no_opponents rules; refill candidates that face a kept player are skipped
+    Returns a feasible x for `model`, or None if the greedy repair fails.
+    """
+    pool = model.pool
+    n_slots = len(model.slot_instances)
+    locked_set = set(int(p) for p in (locked if locked is not None else []))
+    prev = sorted((int(p) for p in prev_players), key=lambda p: (p not in locked_set, -coef[p]))
+
+    keep_n = n_slots if max_overlap is None else max(0, min(int(max_overlap), n_slots))
+    chosen = prev[:keep_n]
+    banned = set(prev[keep_n:])
+
+    cap = np.inf
+    if "salary_cap" in model.row_names:
+        cap = model.row_ub[model.row_names.index("salary_cap")]
+    eligible = model.elig.any(axis=1)
+    min_salary = float(pool.salary[eligible].min()) if eligible.any() else 0.0
+    used = float(pool.salary[chosen].sum())
+
+    masks = [opponent_masks(pool, rule) for rule in opponents] if pool.has_games else []
+    chosen_set = set(chosen)
+    for p in np.argsort(-coef, kind="stable").tolist():
+        if len(chosen) >= n_slots:
+            break
+        if p in chosen_set or p in banned or not eligible[p]:
+            continue
+        if _opponent_clash(pool, masks, chosen, p):
+            continue
+        # Leave room for the cheapest player in every slot still open
+        if used + pool.salary[p] + (n_slots - len(chosen) - 1) * min_salary > cap:
+            continue
+        # Every chosen player must still get a distinct slot (matching slots -> players)
+        if assign_slots(model.elig[chosen + [p]].T) is None:
+            continue
+        chosen.append(p)
+        chosen_set.add(p)
+        used += pool.salary[p]
+
+    if len(chosen) < n_slots:
+        return None
+
+    x = model.point(chosen)
+    if x is None or not model.is_feasible(x):
+        return None
+    return x
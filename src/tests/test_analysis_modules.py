@@ -1,3 +1,4 @@
+import numpy as np
 import pandas as pd
 import sys
 import os
@@ -5,8 +6,10 @@ import os
 sys.path.append(os.path.join(os.getcwd(), "src"))
 
 from analysis.distribution import estimate_distribution_parameters
-from analysis.correlation_model import calculate_lineup_correlation_score
+from analysis.correlation_model import calculate_lineup_correlation_score, correlation_blocks, generate_correlation_matrix
 from analysis.ev import calculate_ev
+from analysis import simulation
+from analysis.simulation import simulate_lineups, simulate_slate
 
 def test_distribution():
     print("Testing Distribution...")
@@ -85,7 +88,81 @@ def test_correlation_score():
     assert abs(score - 0.2) < 0.01
     print("PASS: Correlation")
 
+def test_lineup_simulation():
+    print("Testing Lineup Simulation...")
+    df = pd.DataFrame({
+        "player_id": ["1", "2", "3", "4"],
+        "_proj": [40.0, 30.0, 20.0, 10.0],
+        "_stddev": [8.0, 6.0, 4.0, 2.0],
+    })
+    def lineup(pids, cpt=None):
+        slots = [{"player_id": p, "slot": "CPT" if p == cpt else "FLEX"} for p in pids]
+        return {"slots": slots, "total_proj": 0.0}
+    lineups = [lineup(["1", "2"]), lineup(["3", "4"]), lineup(["1", "3"], cpt="1"), lineup(["9", "4"])]
+    lineups[3]["slots"][0]["proj_points"] = 50.0    # not in the slate: uses the lineup's projection
+
+    res = simulate_lineups(lineups, df, n_sims=20000, seed=7, points_multipliers={"CPT": 1.5})
+    assert list(res["Lineup"]) == [1, 2, 3, 4]
+    assert abs(res.loc[0, "EV"] - 70.0) < 0.5 and abs(res.loc[1, "EV"] - 30.0) < 0.3
+    assert abs(res.loc[2, "EV"] - 80.0) < 0.5 and abs(res.loc[3, "EV"] - 60.0) < 0.5
+    # Independent players: Var = sum of variances (CPT scaled 1.5x)
+    assert abs(res.loc[0, "Std"] - 10.0) < 0.3 and abs(res.loc[2, "Std"] - np.hypot(12.0, 4.0)) < 0.3
+    assert (res["P90"] > res["EV"]).all() and (res["P10"] < res["EV"]).all()
+    assert abs(res["Top%"].sum() - 100.0) < 1e-6 and res.loc[1, "Top%"] == 0.0
+
+    # One shared outcome matrix: same seed, same numbers; the sparse and gather products agree
+    slate = simulate_slate(df, 2000, seed=3)
+    a = simulate_lineups(lineups[:3], df, slate=slate)
+    assert a.equals(simulate_lineups(lineups[:3], df, n_sims=2000, seed=3))
+    sparse, simulation.sparse = simulation.sparse, None
+    try:
+        b = simulate_lineups(lineups[:3], df, slate=slate)
+    finally:
+        simulation.sparse = sparse
+    assert np.allclose(a["EV"], b["EV"]) and np.allclose(a["P90"], b["P90"])
+    print("PASS: Lineup Simulation")
+
+def test_correlated_simulation():
+    print("Testing Correlated Simulation...")
+    config = {
+        "aliases": {"D": "DST"},
+        "same_team": {"QB-WR": 0.5, "*": 0.0},
+        "opponent": {"DST-*": -0.3, "*": 0.1},
+    }
+    rows = []
+    for game, (home, away) in enumerate([("KC", "BUF"), ("DAL", "PHI"), ("SF", "SEA")]):
+        for team, opp in ((home, away), (away, home)):
+            for pos in ("QB", "WR", "WR", "D"):
+                rows.append({"player_id": f"{team}-{len(rows)}", "_team": team, "_opp": opp,
+                             "position": pos, "_proj": 15.0, "_stddev": 5.0})
+    df = pd.DataFrame(rows)
+
+    blocks = correlation_blocks(df, config)
+    assert len(blocks) == 3 and sorted(np.concatenate([b[0] for b in blocks]).tolist()) == list(range(len(df)))
+    # Same game structure -> one cached factor
+    assert all(b[1] is blocks[0][1] for b in blocks)
+
+    corr = generate_correlation_matrix(df, "NFL", config).round(4)
+    assert corr.loc["KC-0", "KC-1"] == 0.5 and corr.loc["KC-0", "BUF-7"] == -0.3
+    assert corr.loc["KC-0", "BUF-4"] == 0.1 and corr.loc["KC-0", "DAL-8"] == 0.0
+    assert (generate_correlation_matrix(df, "NFL").to_numpy() == np.eye(len(df))).all()
+
+    # Draws follow the block correlations (high means: clipping at 0 is rare)
+    slate = simulate_slate(df.assign(_proj=100.0), 20000, seed=1, correlation=config)
+    sample = np.corrcoef(slate.outcomes.T)
+    assert np.abs(sample - corr.to_numpy()).max() < 0.05
+
+    # Correlation changes the spread of a stack, not its mean
+    stack = [{"slots": [{"player_id": "KC-0"}, {"player_id": "KC-1"}], "total_proj": 30.0}]
+    indep = simulate_lineups(stack, df, n_sims=20000, seed=2)
+    corr_res = simulate_lineups(stack, df, n_sims=20000, seed=2, correlation=config)
+    assert corr_res.loc[0, "Std"] > indep.loc[0, "Std"] * 1.15
+    assert abs(corr_res.loc[0, "EV"] - indep.loc[0, "EV"]) < 0.3
+    print("PASS: Correlated Simulation")
+
 if __name__ == "__main__":
     test_distribution()
     test_ev()
     test_correlation_score()
+    test_lineup_simulation()
+    test_correlated_simulation()
@@ -0,0 +1,68 @@
+import random
+import numpy as np
+import sys
+import os
+
+sys.path.append(os.path.join(os.getcwd(), "src"))
+from lineup_builder import PoolArrays, build_many, build_one, load_pool, load_rules, random_lineups, sample_lineups
+
+def _mlb():
+    rules = load_rules("rules/dk/mlb.yaml")
+    pool = load_pool("data/dk_salaries.csv", rules["projection_column"], "MLB")
+    return rules, pool
+
+def test_random_lineups_valid():
+    print("Testing Array Lineup Builder...")
+    rules, pool = _mlb()
+    arrays = PoolArrays(pool, rules["expanded_slots"])
+    lus = random_lineups(arrays, 5000, rules["salary_cap"], rules["max_from_team"], rules["min_teams"], seed=1)
+    assert lus.shape == (5000, len(rules["expanded_slots"]))
+    assert (arrays.salary[lus].sum(axis=1) <= rules["salary_cap"]).all()
+    positions = pool.groupby(pool["ID"].astype(str))["Roster Position"].agg(set)
+    for row in lus[:500]:
+        assert len(set(row.tolist())) == len(row)
+        teams = np.bincount(arrays.team_code[row])
+        assert teams.max() <= rules["max_from_team"] and (teams > 0).sum() >= rules["min_teams"]
+        for slot, p in zip(rules["expanded_slots"], row.tolist()):
+            assert slot == "UTIL" or positions[arrays.ids[p]] & set(slot.split("/"))
+    # Same seed, same lineups
+    again = random_lineups(arrays, 5000, rules["salary_cap"], rules["max_from_team"], rules["min_teams"], seed=1)
+    assert (again == lus).all()
+    print("PASS: Array Lineup Builder")
+
+def test_sampler_acceptance():
+    print("Testing Salary-Aware Sampler...")
+    rules, pool = _mlb()
+    arrays = PoolArrays(pool, rules["expanded_slots"])
+    # Tight cap: blind random picks dead-end, the look-ahead sampler does not
+    cap = 30000
+    blind, blind_stats = sample_lineups(arrays, 2000, cap, 5, 2, seed=4, lookahead=False, max_tries=8000)
+    lus, stats = sample_lineups(arrays, 2000, cap, 5, 2, seed=4)
+    assert blind_stats["acceptance"] < 0.2 and stats["acceptance"] > 0.99
+    assert len(lus) == 2000 and (arrays.salary[lus].sum(axis=1) <= cap).all()
+    # Projection floor and min_teams are kept too
+    lus, stats = sample_lineups(arrays, 500, rules["salary_cap"], 5, 6, seed=4, min_proj=80)
+    assert (arrays.proj[lus].sum(axis=1) >= 80 - 1e-9).all()
+    assert all(len(set(arrays.team_code[row].tolist())) >= 6 for row in lus)
+    # unique: no player set twice
+    lus, stats = sample_lineups(arrays, 3000, rules["salary_cap"], 5, 2, seed=4, unique=True)
+    assert len({tuple(sorted(row)) for row in lus.tolist()}) == len(lus) == 3000
+    assert stats["valid"] - stats["duplicates"] >= 3000
+    print("PASS: Salary-Aware Sampler")
+
+def test_build_many_dicts():
+    print("Testing Lineup Dicts...")
+    rules, pool = _mlb()
+    lus = build_many(pool, dict(rules, num_lineups=5), seed=3)
+    assert len(lus) == 5
+    assert [p["Slot"] for p in lus[0]] == rules["expanded_slots"]
+    assert sum(p["Salary"] for p in lus[0]) <= rules["salary_cap"]
+    one = build_one(pool, rules["expanded_slots"], rules["salary_cap"], rules["max_from_team"],
+                    rules["min_teams"], random.Random(0))
+    assert one is not None and len({p["ID"] for p in one}) == len(rules["expanded_slots"])
+    print("PASS: Lineup Dicts")
+
+if __name__ == "__main__":
+    test_random_lineups_valid()
+    test_sampler_acceptance()
+    test_build_many_dicts()
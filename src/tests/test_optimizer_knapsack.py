@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+import sys
+import os
+
+sys.path.append(os.path.join(os.getcwd(), "src"))
+from optimizer.engine import OptimizerEngine
+from optimizer.knapsack import CardinalityKnapsack
+
+def _golf_pool(n=30, seed=3):
+    rng = np.random.default_rng(seed)
+    salary = rng.integers(60, 121, n) * 100
+    return pd.DataFrame({
+        "player_id": [f"g{i}" for i in range(n)],
+        "player_name": [f"Golfer {i}" for i in range(n)],
+        "position": "G",
+        "salary": salary,
+        "_proj": np.round(salary / 1000 * rng.uniform(6, 9, n), 3),
+    })
+
+def test_knapsack_matches_milp():
+    print("Testing Knapsack Engine...")
+    engine = OptimizerEngine(rules_dir="rules/dk")
+    rules = engine.load_rules("GOLF")
+    df = _golf_pool()
+
+    for settings in ({"max_overlap": 4}, {"max_overlap": 2, "lock_player_ids": ["g7"]}):
+        settings = dict(settings, num_lineups=5)
+        fast = engine.optimize_df(df, rules, settings=settings)
+        milp = engine.optimize_df(df, rules, settings=dict(settings, engine="milp"))
+        assert fast[0]["meta"]["solver"] == "knapsack"
+        assert milp[0]["meta"]["solver"] != "knapsack"
+        assert [round(lu["total_proj"], 6) for lu in fast] == [round(lu["total_proj"], 6) for lu in milp]
+        for lu in fast:
+            assert lu["total_salary"] <= rules.salary_cap and len(lu["slots"]) == 6
+    assert all("g7" in [r["player_id"] for r in lu["slots"]] for lu in fast)
+    print("PASS: Knapsack Engine")
+
+def test_knapsack_enumeration_budget():
+    print("Testing Knapsack Budget Fallback...")
+    df = _golf_pool(n=40, seed=5)
+    ks = CardinalityKnapsack(df["_proj"].to_numpy(float), df["salary"].to_numpy(float), 6, 50000)
+    # A tiny budget forces the one-at-a-time search; results must not change
+    full = [tuple(p) for p in ks.iter_lineups(20, 3)]
+    small = [tuple(p) for p in ks.iter_lineups(20, 3, budget=5)]
+    assert full == small and len(full) == 20
+    print("PASS: Knapsack Budget Fallback")
+
+if __name__ == "__main__":
+    test_knapsack_matches_milp()
+    test_knapsack_enumeration_budget()
@@ -0,0 +1,256 @@
+import itertools
+import numpy as np
+import pandas as pd
+from dataclasses import replace
+import sys
+import os
+import tempfile
+
+sys.path.append(os.path.join(os.getcwd(), "src"))
+from optimizer.engine import OptimizerEngine
+from optimizer.assignment import assign_slots, min_cost_assignment
+from optimizer.feasibility import check_feasibility, find_conflict
+from optimizer.model import PlayerPool, build_lineup_model, eligibility_mask, expand_slots
+from optimizer.presolve import dominated_players
+from optimizer.session import OptimizerSession
+from optimizer.warmstart import repair_lineup
+
+def test_vectorized_model_build():
+    print("Testing Vectorized Model Build...")
+    engine = OptimizerEngine(rules_dir="rules/dk")
+    rules = engine.load_rules("MLB")
+    df = engine.load_players_df("data/raw/DKSalaries.csv", rules)
+
+    pool = PlayerPool.from_df(df)
+    slot_instances = expand_slots(rules.slots)
+    model = build_lineup_model(pool, slot_instances, rules, {})
+
+    # One column per eligible (player, slot instance) pair
+    elig = eligibility_mask(pool.positions, slot_instances)
+    assert model.n_x == int(elig.sum())
+    assert len(model.indptr) == model.n_rows + 1
+    assert model.indptr[-1] == len(model.indices) == len(model.data)
+
+    # Fill rows cover exactly the eligible players of each slot instance
+    for s, (sname, _elig) in enumerate(slot_instances):
+        cols, _vals = model.row(model.row_names.index(f"fill_{sname}"))
+        assert sorted(model.col_player[cols]) == sorted(np.nonzero(elig[:, s])[0])
+
+    # Salary row coefficients are the player salaries
+    cols, vals = model.row(model.row_names.index("salary_cap"))
+    assert np.array_equal(vals, pool.salary[model.col_player[cols]])
+    print(f"PASS: Vectorized Model Build ({model.n_cols} cols, {model.n_rows} rows)")
+
+def test_aggregated_formulation_matches_instances():
+    print("Testing Aggregated Formulation...")
+    engine = OptimizerEngine(rules_dir="rules/dk")
+    for sport, path in [("NBA", "data/sample_nba.csv"), ("MLB", "data/raw/DKSalaries.csv")]:
+        rules = engine.load_rules(sport)
+        df = engine.load_players_df(path, rules)
+        settings = {"num_lineups": 3, "max_overlap": 6}
+
+        inst = engine.optimize_df(df, rules, settings=dict(settings, formulation="instances"))
+        agg = engine.optimize_df(df, rules, settings=dict(settings, formulation="aggregated"))
+        assert [round(lu["total_proj"], 6) for lu in agg] == [round(lu["total_proj"], 6) for lu in inst]
+
+        # Slot rows keep YAML order and every player fits the slot it was assigned to
+        slot_instances = expand_slots(rules.slots)
+        for lu in agg:
+            assert [s["slot_instance"] for s in lu["slots"]] == [sname for sname, _ in slot_instances]
+            for s, (_sname, elig) in zip(lu["slots"], slot_instances):
+                assert set(s["position"].split("/")) & elig
+    print("PASS: Aggregated Formulation")
+
+def test_warm_start_repair():
+    print("Testing Warm Start Repair...")
+    engine = OptimizerEngine(rules_dir="rules/dk")
+    rules = engine.load_rules("MLB")
+    df = engine.load_players_df("data/raw/DKSalaries.csv", rules)
+    settings = {"num_lineups": 3, "max_overlap": 6}
+
+    cold = engine.optimize_df(df, rules, settings=settings)
+    warm = engine.optimize_df(df, rules, settings=dict(settings, warm_start=True, warm_start_baseline=True))
+    assert [round(lu["total_proj"], 6) for lu in warm] == [round(lu["total_proj"], 6) for lu in cold]
+    assert warm[0]["meta"]["warm_start"] is False
+    for lu in warm[1:]:
+        if lu["meta"]["warm_start"]:
+            assert {"cold_nodes", "node_savings", "time_savings_s"} <= set(lu["meta"])
+
+    # The repaired previous lineup satisfies every row of the model with its overlap cut
+    pool = PlayerPool.from_df(df)
+    model = build_lineup_model(pool, expand_slots(rules.slots), rules, {})
+    prev = pool.index_of([r["player_id"] for r in cold[0]["slots"]])
+    model.add_player_row(prev, -np.inf, 6, "max_overlap_prev_1")
+    x = repair_lineup(model, prev, pool.proj, max_overlap=6)
+    assert x is not None and model.is_feasible(x)
+    assert len(set(model.col_player[np.nonzero(x[: model.n_x] > 0.5)[0]]) & set(prev)) <= 6
+    print("PASS: Warm Start Repair")
+
+def test_dominance_presolve():
+    print("Testing Dominance Presolve...")
+    engine = OptimizerEngine(rules_dir="rules/dk")
+    rules = engine.load_rules("MLB")
+    df = engine.load_players_df("data/raw/DKSalaries.csv", rules)
+
+    # Lock a player that the presolve would otherwise drop
+    pool = PlayerPool.from_df(df)
+    drop = dominated_players(pool, expand_slots(rules.slots), rules, {})
+    lock = str(pool.ids[np.nonzero(drop)[0][0]])
+
+    for settings in ({"num_lineups": 1}, {"num_lineups": 1, "lock_player_ids": [lock]}):
+        full = engine.optimize_df(df, rules, settings=settings)
+        reduced = engine.optimize_df(df, rules, settings=dict(settings, presolve=True))
+        assert round(reduced[0]["total_proj"], 6) == round(full[0]["total_proj"], 6)
+        meta = reduced[0]["meta"]["presolve"]
+        assert meta["removed"] == meta["before"] - meta["after"] and meta["after"] * 2 < meta["before"]
+    assert lock in [r["player_id"] for r in reduced[0]["slots"]]
+
+    # Top-K keeps more players and the same K best values
+    settings = {"num_lineups": 4, "top_k": True, "solver": "highs"}
+    full = engine.optimize_df(df, rules, settings=settings)
+    top = engine.optimize_df(df, rules, settings=dict(settings, presolve=True))
+    assert [round(lu["total_proj"], 6) for lu in top] == [round(lu["total_proj"], 6) for lu in full]
+    assert meta["after"] < top[0]["meta"]["presolve"]["after"] < meta["before"]
+    print(f"PASS: Dominance Presolve ({meta['before']} -> {meta['after']} players)")
+
+def test_assign_slots():
+    print("Testing Slot Assignment...")
+    # Slots: PG, G, UTIL. Players: PG/SG, SG, C
+    elig = np.array([
+        [True, True, True],
+        [False, True, True],
+        [False, False, True],
+    ])
+    assert assign_slots(elig) == [0, 1, 2]
+    # Two players can only fill the same single slot
+    assert assign_slots(np.array([[True, False], [True, False]])) is None
+    print("PASS: Slot Assignment")
+
+def test_min_cost_assignment():
+    print("Testing Min-Cost Assignment...")
+    # Rows are slots, columns players; inf marks an ineligible pair
+    cost = np.array([
+        [4.0, 1.0, 3.0, np.inf],
+        [2.0, 0.0, 5.0, 1.0],
+        [3.0, 2.0, np.inf, 2.0],
+    ])
+    picked = min_cost_assignment(cost)
+    assert picked is not None and len(set(picked)) == 3
+    assert cost[np.arange(3), picked].sum() == 5.0
+    assert min_cost_assignment(np.array([[1.0, np.inf], [2.0, np.inf]])) is None
+    print("PASS: Min-Cost Assignment")
+
+def test_feasibility_checks():
+    print("Testing Feasibility Checks...")
+    engine = OptimizerEngine(rules_dir="rules/dk")
+    rules = engine.load_rules("MLB")
+    df = engine.load_players_df("data/raw/DKSalaries.csv", rules)
+    pool = PlayerPool.from_df(df)
+    slot_instances = expand_slots(rules.slots)
+
+    report = check_feasibility(pool, slot_instances, rules, {})
+    assert report.feasible and report.seconds < 0.5
+
+    # Single-quantity limits no roster can meet
+    for key, value in (("max_chalk_count", 0), ("min_total_ceiling", 10000)):
+        settings = {key: value, "chalk_threshold": 0.0}
+        report = check_feasibility(pool, slot_instances, rules, settings)
+        assert [r.code for r in report.reasons] == [key]
+        assert engine.optimize_df(df, rules, settings=dict(settings, num_lineups=1)) == []
+        assert engine.last_diagnosis.reasons[0].code == key
+
+    # Too many locks from one team
+    team = pool.team_code == pool.team_code[0]
+    locks = [str(pool.ids[p]) for p in np.nonzero(team)[0][: rules.team_limits.max_from_team + 1]]
+    assert engine.optimize_df(df, rules, settings={"num_lineups": 1, "lock_player_ids": locks}) == []
+    assert "locks_team_limit" in [r.code for r in engine.last_diagnosis.reasons]
+
+    # An expensive lock under a cap that only the cheapest rosters meet
+    lock = int(np.argmax(np.where(eligibility_mask(pool.positions, slot_instances).any(axis=1), pool.salary, -1)))
+    cheapest = check_feasibility(pool, slot_instances, rules, {}, locked=np.array([lock]))
+    assert cheapest.feasible
+    lowest = check_feasibility(pool, slot_instances, replace(rules, salary_cap=0), {}).reasons[0].details["best"]
+    rules = replace(rules, salary_cap=int(lowest) + 100)
+    report = check_feasibility(pool, slot_instances, rules, {}, locked=np.array([lock]))
+    assert report.reasons[0].code == "salary_cap"
+    assert set(report.reasons[0].constraints) == {"salary_cap", f"lock_{pool.ids[lock]}"}
+
+    # The solver finds the same conflict when the pre-check is skipped
+    model = build_lineup_model(pool, slot_instances, rules, {}, locked=np.array([lock]))
+    assert find_conflict(model, solver="highs") == ["salary_cap", f"lock_{pool.ids[lock]}"]
+    settings = {"num_lineups": 1, "lock_player_ids": [str(pool.ids[lock])], "feasibility_check": False, "solver": "highs"}
+    assert engine.optimize_df(df, rules, settings=settings) == []
+    reason = engine.last_diagnosis.reasons[0]
+    assert reason.code == "solver" and set(reason.constraints) == {"salary_cap", f"lock_{pool.ids[lock]}"}
+    print("PASS: Feasibility Checks")
+
+def test_showdown_multipliers():
+    print("Testing Showdown Multipliers...")
+    engine = OptimizerEngine(rules_dir="rules/dk")
+    rules = engine.load_rules("NFL_SHOWDOWN")
+    raw = pd.read_csv("data/sample_nfl.csv")
+    df = engine.load_players_df(raw[raw["team"].isin(["KC", "SF"])], rules)
+    sal, proj, team = df["_salary"].to_numpy(), df["_proj"].to_numpy(), df["_team"].to_numpy()
+
+    # Brute force: captain at 1.5x salary and points, five more players
+    best = -1.0
+    for cpt in range(len(df)):
+        for flex in itertools.combinations([i for i in range(len(df)) if i != cpt], 5):
+            flex = list(flex)
+            if 1.5 * sal[cpt] + sal[flex].sum() <= rules.salary_cap and len(set(team[flex + [cpt]])) >= 2:
+                best = max(best, 1.5 * proj[cpt] + proj[flex].sum())
+
+    for settings in ({}, {"presolve": True}, {"formulation": "aggregated", "solver": "highs"}):
+        lineup = engine.optimize_df(df, rules, settings=dict(settings, num_lineups=1))[0]
+        assert round(lineup["total_proj"], 6) == round(best, 6)
+        cpt = lineup["slots"][0]
+        assert cpt["slot"] == "CPT" and cpt["salary"] == round(1.5 * sal[df["player_id"] == cpt["player_id"]][0])
+        assert lineup["total_salary"] == sum(r["salary"] for r in lineup["slots"]) <= rules.salary_cap
+
+    # Multipliers are coefficients: same columns and rows as without them
+    pool, slot_instances, _ = engine._prepare_pool(df, rules, {})
+    plain = replace(rules, slots=[replace(sr, salary_multiplier=1.0, points_multiplier=1.0) for sr in rules.slots])
+    model = build_lineup_model(pool, slot_instances, rules, {"formulation": "aggregated"})
+    flat = build_lineup_model(pool, slot_instances, plain, {"formulation": "instances"})
+    assert model.formulation == "instances" and (model.n_cols, model.n_rows) == (flat.n_cols, flat.n_rows)
+
+    # Session: locks become rows on the per-slot model
+    session = OptimizerSession(engine, df, rules)
+    lock = str(df["player_id"].iloc[int(np.argmin(proj))])
+    session.lock([lock])
+    locked = session.resolve(num_lineups=1)[0]
+    assert lock in [r["player_id"] for r in locked["slots"]]
+    assert locked["total_proj"] < best
+
+    # Raw DK export: a CPT row (own ID, 1.5x salary) and a FLEX row per player
+    flex = raw[raw["team"].isin(["KC", "SF"])].rename(columns={"player_name": "Name", "position": "Position", "salary": "Salary", "team": "TeamAbbrev"})
+    export = pd.concat([
+        flex.assign(ID=flex["player_id"].astype(int) + 9000, **{"Roster Position": "CPT", "Salary": (1.5 * flex["Salary"]).astype(int)}),
+        flex.assign(ID=flex["player_id"], **{"Roster Position": "FLEX"}),
+    ]).drop(columns="player_id")
+    with tempfile.TemporaryDirectory() as tmp:
+        export.to_csv(f"{tmp}/DKSalaries.csv", index=False)
+        dk = engine.load_players_df(f"{tmp}/DKSalaries.csv", rules)
+        assert len(dk) == len(flex) and (dk["cpt_player_id"].astype(int) == dk["player_id"].astype(int) + 9000).all()
+        lineup = engine.optimize_df(dk, rules, settings={"num_lineups": 1})[0]
+        cpt = lineup["slots"][0]
+        assert round(lineup["total_proj"], 6) == round(best, 6)
+        assert int(cpt["player_id"]) == int(cpt["base_player_id"]) + 9000
+        assert all("base_player_id" not in r for r in lineup["slots"][1:])
+        engine.export_lineups_csv([lineup], f"{tmp}/lineups.csv")
+        out = pd.read_csv(f"{tmp}/lineups.csv", dtype=str)
+        assert out["player_id"].tolist() == [str(r["player_id"]) for r in lineup["slots"]]
+    # An export without "Roster Position" is read as a classic export
+    plain = engine.load_players_df(export.drop(columns="Roster Position").assign(position=export["Position"]), rules)
+    assert len(plain) == len(export) and "cpt_player_id" not in plain.columns
+    print("PASS: Showdown Multipliers")
+
+if __name__ == "__main__":
+    test_vectorized_model_build()
+    test_aggregated_formulation_matches_instances()
+    test_warm_start_repair()
+    test_dominance_presolve()
+    test_assign_slots()
+    test_min_cost_assignment()
+    test_feasibility_checks()
+    test_showdown_multipliers()
@@ -1,9 +1,18 @@
+import dataclasses
+import numpy as np
 import pandas as pd
 import sys
 import os
+import tempfile
+from pathlib import Path
 
 sys.path.append(os.path.join(os.getcwd(), "src"))
-from optimizer.engine import OptimizerEngine, DkRules, SlotRule, TeamLimits
+from optimizer.engine import OptimizerEngine, DkRules, SlotRule, TeamLimits, _sign_lineup
+from optimizer.lateswap import started_players
+from optimizer.model import build_lineup_model
+from optimizer.session import OptimizerSession
+from optimizer.signature import LineupIndex
+from optimizer.solvers import SolverBackend, available_solvers, get_backend
 
 def test_optimizer_gpp():
     print("Testing Optimizer GPP Mode...")
@@ -110,5 +119,475 @@ def test_optimizer_gpp():
     assert "backup_SF" in names_c
     print("PASS: Max Chalk Constraint")
 
+def _nba_sample():
+    engine = OptimizerEngine(rules_dir="rules/dk")
+    rules = engine.load_rules("NBA")
+    df = engine.load_players_df("data/sample_nba.csv", rules)
+    return engine, rules, df
+
+def test_model_reuse_matches_rebuild():
+    print("Testing Model Reuse...")
+    engine, rules, df = _nba_sample()
+
+    settings = {"num_lineups": 4, "max_overlap": 5}
+    reused = engine.optimize_df(df, rules, settings=dict(settings, reuse_model=True))
+    rebuilt = engine.optimize_df(df, rules, settings=dict(settings, reuse_model=False))
+
+    assert [lu["total_proj"] for lu in reused] == [lu["total_proj"] for lu in rebuilt]
+    assert reused[0]["meta"]["reused_model"] is False
+    assert all(lu["meta"]["reused_model"] for lu in reused[1:])
+    assert all(lu["meta"]["build_s"] >= 0 and lu["meta"]["solve_s"] >= 0 for lu in reused)
+    print("PASS: Model Reuse")
+
+def test_solver_backends():
+    print("Testing Solver Backends...")
+    # Unknown names are an error; a backend missing a hook cannot be created
+    try:
+        get_backend("higs")
+        assert False, "unknown solver name accepted"
+    except ValueError:
+        pass
+    try:
+        type("NoRun", (SolverBackend,), {"available": lambda self: True})()
+        assert False, "backend without hooks created"
+    except TypeError:
+        pass
+
+    engine, rules, df = _nba_sample()
+    totals = {}
+    for name in available_solvers():
+        lineups = engine.optimize_df(df, rules, settings={"num_lineups": 1, "solver": name})
+        assert lineups[0]["meta"]["solver"] == name
+        totals[name] = lineups[0]["total_proj"]
+
+    # Every backend finds the same optimum
+    assert len(set(round(v, 6) for v in totals.values())) == 1
+    print(f"PASS: Solver Backends {sorted(totals)}")
+
+def test_iter_optimize_streams_lineups():
+    print("Testing iter_optimize...")
+    engine, rules, df = _nba_sample()
+    settings = {"num_lineups": 5, "max_overlap": 5}
+
+    gen = engine.iter_optimize(df, rules, settings=settings)
+    first = next(gen)
+    second = next(gen)
+    gen.close()  # cancel the remaining solves
+
+    full = engine.optimize_df(df, rules, settings=settings)
+    assert [first["total_proj"], second["total_proj"]] == [lu["total_proj"] for lu in full[:2]]
+    assert first["meta"]["lineup_index"] == 1
+    assert 0 < first["meta"]["elapsed_s"] <= second["meta"]["elapsed_s"]
+    print("PASS: iter_optimize")
+
+def test_top_k_lineups():
+    print("Testing Top-K...")
+    engine, rules, df = _nba_sample()
+    k = 10
+    lock = df.sort_values("_proj", ascending=False)["player_id"].iloc[3]
+
+    for extra in ({}, {"lock_player_ids": [lock]}):
+        top = engine.optimize_df(df, rules, settings=dict(extra, num_lineups=k, top_k=True))
+        cuts = engine.optimize_df(df, rules, settings=dict(extra, num_lineups=k, max_overlap=len(top[0]["slots"]) - 1))
+        assert len(top) == k
+        assert len({tuple(sorted(r["player_id"] for r in lu["slots"])) for lu in top}) == k
+        assert [round(lu["total_proj"], 6) for lu in top] == [round(lu["total_proj"], 6) for lu in cuts]
+        assert all(lu["meta"]["lineups_per_s"] > 0 and lu["meta"]["subproblems"] >= 1 for lu in top[1:])
+        if extra:
+            assert all(lock in {r["player_id"] for r in lu["slots"]} for lu in top)
+    print("PASS: Top-K")
+
+def test_optimizer_session():
+    print("Testing OptimizerSession...")
+    engine, rules, df = _nba_sample()
+    top = df.sort_values("_proj", ascending=False)["player_id"].tolist()
+    session = OptimizerSession(engine, df, rules)
+    base_rows = session.model.n_rows
+
+    def totals(lineups):
+        return [round(lu["total_proj"], 6) for lu in lineups]
+
+    run = {"num_lineups": 3, "max_overlap": 5}
+    assert totals(session.resolve(**run)) == totals(engine.optimize_df(df, rules, settings=run))
+    assert session.model.n_rows == base_rows  # overlap cuts dropped after the run
+
+    session.lock([top[5]])
+    session.exclude([top[0]])
+    edited = dict(run, lock_player_ids=[top[5]], exclude_player_ids=[top[0]])
+    lineups = session.resolve(**run)
+    assert totals(lineups) == totals(engine.optimize_df(df, rules, settings=edited))
+    assert all(top[5] in {r["player_id"] for r in lu["slots"]} for lu in lineups)
+
+    session.lock([top[5]], locked=False)
+    session.exclude([top[0]], excluded=False)
+    noisy = {"projection_noise": 0.2, "seed": 7}
+    session.update_objective(**noisy)
+    assert totals(session.resolve(**run)) == totals(engine.optimize_df(df, rules, settings=dict(run, **noisy)))
+    assert session.builds == 1
+
+    session.update_objective(total_ownership_cap=500)  # constraint row: rebuilt
+    assert session.builds == 2
+    print("PASS: OptimizerSession")
+
+def test_portfolio_exposure():
+    print("Testing Portfolio Exposure...")
+    engine, rules, df = _nba_sample()
+    top = df.sort_values("_proj", ascending=False)
+    capped, wanted = str(top["player_id"].iloc[0]), str(top["player_id"].iloc[-3])
+    team = str(top["_team"].iloc[1])
+    settings = {
+        "num_lineups": 10, "max_overlap": 6,
+        "max_exposure": {capped: 0.3}, "min_exposure": {wanted: 0.5}, "team_max_exposure": {team: 0.4},
+    }
+    lineups = engine.optimize_df(df, rules, settings=settings)
+    assert len(lineups) == 10
+    ids = [{r["player_id"] for r in lu["slots"]} for lu in lineups]
+    teams = [{r.get("team") for r in lu["slots"]} for lu in lineups]
+    assert sum(capped in lu for lu in ids) <= 3
+    assert sum(wanted in lu for lu in ids) >= 5
+    assert sum(team in lu for lu in teams) <= 4
+    report = {(row["kind"], row["id"]): row for row in engine.last_exposure}
+    assert set(report) == {("player", capped), ("player", wanted), ("team", team)}
+    assert all(row["ok"] for row in report.values())
+    assert report[("player", wanted)]["count"] == sum(wanted in lu for lu in ids)
+
+    # Same portfolio when the model is rebuilt per lineup or kept in a session
+    totals = [round(lu["total_proj"], 6) for lu in lineups]
+    rebuilt = engine.optimize_df(df, rules, settings=dict(settings, reuse_model=False))
+    assert [round(lu["total_proj"], 6) for lu in rebuilt] == totals
+    session = OptimizerSession(engine, df, rules)
+    base_rows = session.model.n_rows
+    assert [round(lu["total_proj"], 6) for lu in session.resolve(**settings)] == totals
+    assert session.model.n_rows == base_rows and session.builds == 1
+    print("PASS: Portfolio Exposure")
+
+def test_stack_rules():
+    print("Testing Stack Rules...")
+    engine = OptimizerEngine(rules_dir="rules/dk")
+    rules = engine.load_rules("MLB")
+    df = engine.load_players_df("data/raw/DKSalaries.csv", rules)
+    game_of = dict(zip(df["player_id"].astype(str), df["_game"]))
+    hitters = ["C", "1B", "2B", "3B", "SS", "OF"]
+    stacks = [
+        {"name": "primary", "type": "team", "positions": hitters, "min_players": 4},
+        {"name": "secondary", "type": "team", "positions": hitters, "min_players": 2, "count": 2},
+        {"name": "game", "type": "game", "min_players": 6},
+    ]
+    settings = {"num_lineups": 4, "max_overlap": 7, "formulation": "aggregated", "stacks": stacks}
+    lineups = engine.optimize_df(df, rules, settings=settings)
+    assert len(lineups) == 4
+    for lu in lineups:
+        hit_teams = pd.Series([r["team"] for r in lu["slots"] if set(r["position"].split("/")) & set(hitters)])
+        per_team = hit_teams.value_counts()
+        assert per_team.iloc[0] >= 4 and (per_team >= 2).sum() >= 2
+        assert pd.Series([game_of[r["player_id"]] for r in lu["slots"]]).value_counts().iloc[0] >= 6
+
+    # Stacks cost projection; presolve keeps the same optimum
+    plain = engine.optimize_df(df, rules, settings=dict(settings, stacks=[]))
+    assert plain[0]["total_proj"] >= lineups[0]["total_proj"]
+    pre = engine.optimize_df(df, rules, settings=dict(settings, presolve=True))
+    assert [round(lu["total_proj"], 6) for lu in pre] == [round(lu["total_proj"], 6) for lu in lineups]
+
+    # Stack larger than max_from_team: caught by the pre-check
+    assert engine.optimize_df(df, rules, settings={"stacks": [{"name": "big", "min_players": 6}]}) == []
+    assert engine.last_diagnosis.reasons[0].constraints == ["stack_big", "max_from_team"]
+
+    # NFL: QB stacked with a WR / TE, opt-in (cap raised, the sample is priced over it)
+    nfl = dataclasses.replace(engine.load_rules("NFL"), salary_cap=60000)
+    assert nfl.stacks == ()
+    nfl_df = engine.load_players_df("data/sample_nfl.csv", nfl)
+    qb_stack = [{"name": "qb_stack", "type": "anchor", "anchor": ["QB"], "positions": ["WR", "TE"], "min_players": 1}]
+    for lu in engine.optimize_df(nfl_df, nfl, settings={"num_lineups": 3, "max_overlap": 7, "stacks": qb_stack}):
+        qb = next(r for r in lu["slots"] if r["position"] == "QB")
+        assert any(r["team"] == qb["team"] and r["position"] in ("WR", "TE") for r in lu["slots"])
+    print("PASS: Stack Rules")
+
+def test_opponent_exclusion():
+    print("Testing Opponent Exclusion...")
+    engine = OptimizerEngine(rules_dir="rules/dk")
+    rules = engine.load_rules("MLB")
+    df = engine.load_players_df("data/raw/DKSalaries.csv", rules)
+    info = df.set_index(df["player_id"].astype(str))
+
+    def clashes(lineups):
+        out = 0
+        for lu in lineups:
+            ids = [r["player_id"] for r in lu["slots"]]
+            pitchers = [p for p in ids if "P" in info.at[p, "_positions"]]
+            for p in pitchers:
+                out += sum(info.at[q, "_team"] == info.at[p, "_opp"] and "P" not in info.at[q, "_positions"] for q in ids)
+        return out
+
+    no_opp = [{"name": "pitcher_vs_hitters", "positions": ["P"], "versus": ["C", "1B", "2B", "3B", "SS", "OF"]}]
+    settings = {"num_lineups": 3, "max_overlap": 7, "formulation": "aggregated", "no_opponents": no_opp}
+    lineups = engine.optimize_df(df, rules, settings=settings)
+    assert len(lineups) == 3 and clashes(lineups) == 0
+    assert clashes(engine.optimize_df(df, rules, settings=dict(settings, no_opponents=[]))) > 0
+    pre = engine.optimize_df(df, rules, settings=dict(settings, presolve=True))
+    assert [round(lu["total_proj"], 6) for lu in pre] == [round(lu["total_proj"], 6) for lu in lineups]
+    # Repaired warm starts respect the exclusions
+    warm = engine.optimize_df(df, rules, settings=dict(settings, warm_start=True))
+    assert all(lu["meta"]["warm_start"] for lu in warm[1:]) and clashes(warm) == 0
+    assert [round(lu["total_proj"], 6) for lu in warm] == [round(lu["total_proj"], 6) for lu in lineups]
+
+    # Compact: one row per pitcher, not one per pitcher x hitter pair
+    pool, slot_instances, _ = engine._prepare_pool(df, rules, settings)
+    model = build_lineup_model(pool, slot_instances, rules, settings)
+    rows = [n for n in model.row_names if n.startswith("no_opp_")]
+    assert 0 < len(rows) <= sum("P" in ps for ps in pool.positions)
+
+    # Tennis: never both players of one match (opt-in)
+    tennis = engine.load_rules("TENNIS")
+    assert tennis.no_opponents == ()
+    same_match = [{"name": "same_match", "positions": ["P"], "versus": ["P"]}]
+    players = pd.DataFrame({
+        "ID": [str(i) for i in range(16)],
+        "Name": [f"Player {i}" for i in range(16)],
+        "Roster Position": "P",
+        "Salary": [8000 - 100 * i for i in range(16)],
+        "AvgPointsPerGame": [50.0 - i for i in range(16)],
+        "TeamAbbrev": [f"T{i}" for i in range(16)],
+        "Game Info": [f"T{i - i % 2}@T{i - i % 2 + 1} 07/06/2025 09:00AM ET" for i in range(16)],
+    })
+    tdf = engine.load_players_df(players, tennis)
+    for lu in engine.optimize_df(tdf, tennis, settings={"num_lineups": 3, "max_overlap": 5, "no_opponents": same_match}):
+        matches = [int(r["player_id"]) // 2 for r in lu["slots"]]
+        assert len(set(matches)) == len(matches)
+    best = engine.optimize_df(tdf, tennis, settings={"num_lineups": 1})[0]
+    assert len({int(r["player_id"]) // 2 for r in best["slots"]}) < len(best["slots"])
+    print("PASS: Opponent Exclusion")
+
+def test_time_limits():
+    print("Testing Time Limits...")
+    engine, rules, df = _nba_sample()
+    lineups = engine.optimize_df(df, rules, settings={"num_lineups": 3, "max_overlap": 5, "time_limit": 30})
+    assert len(lineups) == 3 and all(lu["meta"]["optimal"] and lu["meta"]["mip_gap"] == 0 for lu in lineups)
+
+    # A spent budget starts no solve
+    assert engine.optimize_df(df, rules, settings={"num_lineups": 3, "time_budget": 0}) == []
+
+    # Hard MLB solves: stopped early, every lineup still feasible and flagged
+    rules = engine.load_rules("MLB")
+    df = engine.load_players_df("data/raw/DKSalaries.csv", rules)
+    lineups = engine.optimize_df(df, rules, settings={"num_lineups": 40, "max_overlap": 6, "time_limit": 0.2, "time_budget": 2})
+    assert 0 < len(lineups) < 40
+    assert lineups[-1]["meta"]["elapsed_s"] < 2 + 1
+    for lu in lineups:
+        assert lu["total_salary"] <= rules.salary_cap
+        assert isinstance(lu["meta"]["optimal"], bool)
+        if lu["meta"]["optimal"]:
+            assert (lu["meta"]["mip_gap"] or 0.0) <= 1e-4
+    print("PASS: Time Limits")
+
+def test_parallel_generation():
+    print("Testing Parallel Generation...")
+    engine, rules, df = _nba_sample()
+
+    settings = {"num_lineups": 4, "seed": 11, "projection_noise": 0.2}
+    par = engine.optimize_parallel(df, rules, settings=dict(settings, workers=2))
+    seq = engine.optimize_parallel(df, rules, settings=dict(settings, workers=1))
+    keys = [tuple(sorted(r["player_id"] for r in lu["slots"])) for lu in par]
+    assert keys == [tuple(sorted(r["player_id"] for r in lu["slots"])) for lu in seq]
+    assert len(set(keys)) == len(keys)
+
+    # Identical sub-problems merge into one lineup; task overrides are applied
+    lock = str(df.sort_values("_proj").iloc[0]["player_id"])
+    tasks = [{}, {}, {"lock_player_ids": [lock]}]
+    merged = engine.optimize_parallel(df, rules, settings={"tasks": tasks, "workers": 2})
+    assert [lu["meta"]["task_index"] for lu in merged] == [0, 2]
+    assert lock in [r["player_id"] for r in merged[1]["slots"]]
+    print("PASS: Parallel Generation")
+
+def test_sim_optimize():
+    print("Testing Sim-Optimize...")
+    engine, rules, df = _nba_sample()
+    df = df.assign(_stddev=0.3 * df["_proj"])
+
+    settings = {"num_sims": 12, "seed": 3}
+    par = engine.sim_optimize(df, rules, settings=dict(settings, workers=2))
+    seq = engine.sim_optimize(df, rules, settings=dict(settings, workers=1))
+    keys = [frozenset(r["player_id"] for r in lu["slots"]) for lu in par]
+    assert keys == [frozenset(r["player_id"] for r in lu["slots"]) for lu in seq]
+    assert len(set(keys)) == len(keys)
+    assert sum(lu["meta"]["draw_count"] for lu in par) == 12
+    counts = [lu["meta"]["draw_count"] for lu in par]
+    assert counts == sorted(counts, reverse=True)
+    assert par[0]["meta"]["lineups_per_s"] > 0 and par[0]["meta"]["workers"] == 2
+
+    # Zero spread: every draw is the projection, so one lineup, the optimal one
+    flat = engine.sim_optimize(df.assign(_stddev=0.0), rules, settings=dict(settings, workers=1))
+    best = engine.optimize_df(df, rules, settings={"num_lineups": 1})
+    assert len(flat) == 1 and flat[0]["meta"]["draw_count"] == 12
+    assert round(flat[0]["total_proj"], 6) == round(best[0]["total_proj"], 6)
+    print("PASS: Sim-Optimize")
+
+def test_lineup_cache():
+    print("Testing Lineup Cache...")
+    _, rules, df = _nba_sample()
+    top = df.sort_values("_proj", ascending=False)["player_id"].astype(str).tolist()
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = OptimizerEngine(rules_dir="rules/dk", cache_dir=tmp)
+        run = {"num_lineups": 3, "max_overlap": 5, "lock_player_ids": [top[3], top[4]]}
+        first = engine.optimize_df(df, rules, settings=run)
+        assert [lu["meta"]["cache"]["hit"] for lu in first] == [False] * 3
+        # Same inputs (lock order and None-valued settings do not matter): stored lineups
+        again = engine.optimize_df(df, rules, settings=dict(run, lock_player_ids=[top[4], top[3]], time_limit=None))
+        assert [lu["meta"]["cache"]["hit"] for lu in again] == [True] * 3
+        assert [lu["slots"] for lu in again] == [lu["slots"] for lu in first]
+        assert again[-1]["meta"]["cache"]["hits"] == 1 and again[-1]["meta"]["cache"]["misses"] == 1
+
+        # New projections, settings or rules: a miss
+        bumped = df.assign(_proj=df["_proj"].where(df["player_id"].astype(str) != top[10], 99.0))
+        assert not engine.optimize_df(bumped, rules, settings=run)[0]["meta"]["cache"]["hit"]
+        assert not engine.optimize_df(df, rules, settings=dict(run, max_overlap=4))[0]["meta"]["cache"]["hit"]
+        capped = dataclasses.replace(rules, salary_cap=rules.salary_cap - 1000)
+        assert not engine.optimize_df(df, capped, settings=run)[0]["meta"]["cache"]["hit"]
+        assert engine.cache.misses == 4 and len(list(Path(tmp).glob("*.json"))) == 4
+        assert "cache" not in engine.optimize_df(df, rules, settings=dict(run, cache=False))[0]["meta"]
+
+        # Randomized projections are only cached with a seed (a rerun must redraw them)
+        noisy = {"num_lineups": 1, "projection_noise": 0.3}
+        assert all("cache" not in engine.optimize_df(df, rules, settings=noisy)[0]["meta"] for _ in range(2))
+        assert engine.cache.misses == 4 and len(list(Path(tmp).glob("*.json"))) == 4
+        engine.optimize_df(df, rules, settings=dict(noisy, seed=5))
+        assert engine.optimize_df(df, rules, settings=dict(noisy, seed=5))[0]["meta"]["cache"]["hit"]
+
+        # Parallel runs: workers never cache, the merged result is stored once
+        before = len(list(Path(tmp).glob("*.json")))
+        par = {"num_lineups": 6, "seed": 11, "projection_noise": 0.2}
+        assert not any(lu["meta"]["cache"]["hit"] for lu in engine.optimize_parallel(df, rules, settings=dict(par, workers=2)))
+        assert len(list(Path(tmp).glob("*.json"))) == before + 1
+        assert all(lu["meta"]["cache"]["hit"] for lu in engine.optimize_parallel(df, rules, settings=dict(par, workers=1)))
+        engine.optimize_parallel(df, rules, settings=dict(par, seed=None, workers=1))
+        assert len(list(Path(tmp).glob("*.json"))) == before + 1
+        # ... and only when every task came back complete (time budget, infeasible task)
+        assert engine.optimize_parallel(df, rules, settings=dict(par, num_lineups=8, seed=3, time_budget=0.0, workers=1)) == []
+        short = dict(par, tasks=[{}, {"lock_player_ids": top[:9]}], workers=2)
+        for _ in range(2):
+            lineups = engine.optimize_parallel(df, rules, settings=short)
+            assert len(lineups) == 1 and not lineups[0]["meta"]["cache"]["hit"]
+            assert engine.last_diagnosis is not None
+        assert len(list(Path(tmp).glob("*.json"))) == before + 1
+
+        # Sessions share the cache; infeasible runs are not stored
+        session = OptimizerSession(engine, df, rules)
+        assert not session.resolve(num_lineups=2)[0]["meta"]["cache"]["hit"]
+        assert session.resolve(num_lineups=2)[0]["meta"]["cache"]["hit"]
+        assert engine.optimize_df(df, rules, settings={"lock_player_ids": top[:9]}) == []
+        assert engine.optimize_df(df, rules, settings={"lock_player_ids": top[:9]}) == []
+        assert engine.last_diagnosis is not None
+
+        # LRU: the least recently used entries go first
+        engine.cache.max_entries = 2
+        engine.optimize_df(df, rules, settings=run)   # hit: most recently used
+        engine.optimize_df(df, rules, settings=dict(run, num_lineups=1))
+        assert engine.optimize_df(df, rules, settings=run)[0]["meta"]["cache"]["hit"]
+        assert len(list(Path(tmp).glob("*.json"))) == 2
+    print("PASS: Lineup Cache")
+
+def test_late_swap():
+    print("Testing Late Swap...")
+    engine = OptimizerEngine(rules_dir="rules/dk")
+    rules = engine.load_rules("MLB")
+    df = engine.load_players_df("data/raw/DKSalaries.csv", rules)
+    lineups = engine.optimize_df(df, rules, settings={"num_lineups": 3, "max_overlap": 7, "formulation": "aggregated"})
+    settings = {"lock_time": "2025-09-08 21:40"}
+    started = set(df.loc[started_players(df, settings), "player_id"].astype(str))
+    assert started and len(started) < len(df)
+
+    # Scratch an unstarted player of the first entry: it must be swapped out
+    scratched = next(r["player_id"] for r in lineups[0]["slots"] if r["player_id"] not in started)
+    late = df.assign(_proj=df["_proj"].where(df["player_id"].astype(str) != scratched, 0.0))
+    swapped = engine.late_swap(late, rules, lineups, settings=dict(settings, workers=2))
+    assert len(swapped) == 3 and swapped[0]["meta"]["changed"]
+    assert scratched not in [r["player_id"] for r in swapped[0]["slots"]]
+    for old, new in zip(lineups, swapped):
+        before = [r["player_id"] for r in old["slots"]]
+        after = [r["player_id"] for r in new["slots"]]
+        assert all(a == b for a, b in zip(before, after) if a in started)
+        assert not (set(after) - set(before)) & started
+        assert new["meta"]["status"] == "swapped" and new["total_salary"] <= rules.salary_cap
+        # Same optimum as a fresh solve with the started players locked / excluded
+        fixed = [p for p in before if p in started]
+        ref = engine.optimize_df(late, rules, settings={
+            "lock_player_ids": fixed, "exclude_player_ids": sorted(started - set(fixed)),
+        })
+        assert round(new["total_proj"], 6) == round(ref[0]["total_proj"], 6)
+
+    # DK entries file: "Name (id)" cells under the slot headers, extra columns kept
+    slot_names = [r["slot"] for r in lineups[0]["slots"]]
+    entries = pd.DataFrame(
+        [[f"E{i}"] + [f"{r['player_name']} ({r['player_id']})" for r in lu["slots"]] for i, lu in enumerate(lineups)],
+        columns=["Entry ID"] + slot_names,
+    )
+    from_csv = engine.late_swap(late, rules, entries, settings=dict(settings, workers=1))
+    assert [lu["meta"]["entry"]["Entry ID"] for lu in from_csv] == ["E0", "E1", "E2"]
+    assert [lu["total_proj"] for lu in from_csv] == [lu["total_proj"] for lu in swapped]
+
+    # A started player that cannot keep its slot: entry returned unchanged
+    gone = next(p for p in [r["player_id"] for r in lineups[0]["slots"]] if p in started)
+    held = engine.late_swap(late, rules, lineups[:1], settings=dict(settings, workers=1, exclude_player_ids=[gone]))
+    assert held[0]["meta"]["status"] == "infeasible" and not held[0]["meta"]["changed"]
+    print("PASS: Late Swap")
+
+def test_lineup_index():
+    print("Testing Lineup Signature Index...")
+    rng = np.random.default_rng(5)
+    for n_players, size in ((180, 6), (300, 9)):    # exact packing / hashed
+        index = LineupIndex(n_players, size, capacity=16)
+        assert index.exact == (size * 8 <= 64)
+        rows = rng.integers(0, n_players, (20000, size))
+        new = index.add(np.vstack([rows, rows[:, ::-1]]))    # same players, other slot order
+        expected = {tuple(sorted(r)) for r in rows.tolist()}
+        assert new.sum() == len(index) == len(expected) and not new[len(rows):].any()
+        assert index.contains(index.signatures(rows)).all() and list(rows[0]) in index
+        assert not index.add_one(rows[7]) and index.nbytes <= 16 * 2 * len(index) * 2
+
+    # Generators: no repeated player sets unless asked for
+    engine, rules, df = _nba_sample()
+    keys = [frozenset(r["player_id"] for r in lu["slots"]) for lu in engine.optimize_df(df, rules, settings={"num_lineups": 3})]
+    assert len(set(keys)) == 3
+    same = engine.optimize_df(df, rules, settings={"num_lineups": 2, "unique": False})
+    assert same[0]["slots"] == same[1]["slots"]
+
+    # Signatures do not depend on slot order and compare across runs
+    six = [lu["meta"]["signature"] for lu in engine.optimize_df(df, rules, settings={"num_lineups": 6})]
+    lineup = engine.optimize_df(df, rules, settings={"num_lineups": 1})[0]
+    flipped = dict(lineup, slots=lineup["slots"][::-1], meta={})
+    assert lineup["meta"]["signature"] == six[0] == (_sign_lineup(flipped, rules, None) and flipped["meta"]["signature"])
+
+    # A shared index: later runs, sessions, top-K and parallel merges skip what it holds
+    shared = LineupIndex.for_ids(len(lineup["slots"]))
+    first = engine.optimize_df(df, rules, settings={"num_lineups": 3, "signature_index": shared})
+    second = engine.optimize_df(df, rules, settings={"num_lineups": 3, "signature_index": shared})
+    assert [lu["meta"]["signature"] for lu in first + second] == six and len(shared) == 6
+    assert [lu["meta"]["lineup_index"] for lu in second] == [1, 2, 3]
+    session = OptimizerSession(engine, df, rules)
+    later = session.resolve(num_lineups=2, signature_index=shared)
+    later += engine.optimize_df(df, rules, settings={"num_lineups": 2, "top_k": True, "signature_index": shared})
+    later += engine.optimize_parallel(df, rules, settings={"num_lineups": 4, "seed": 1, "workers": 1, "signature_index": shared})
+    sigs = [lu["meta"]["signature"] for lu in later]
+    assert len(set(sigs)) == len(sigs) and not set(sigs) & set(six) and len(shared) == 6 + len(sigs)
+    try:
+        engine.optimize_df(df, rules, settings={"signature_index": LineupIndex(len(df), 8)})
+        assert False, "an index over pool codes cannot be shared"
+    except ValueError:
+        pass
+    print("PASS: Lineup Signature Index")
+
 if __name__ == "__main__":
     test_optimizer_gpp()
+    test_model_reuse_matches_rebuild()
+    test_solver_backends()
+    test_top_k_lineups()
+    test_optimizer_session()
+    test_portfolio_exposure()
+    test_stack_rules()
+    test_opponent_exclusion()
+    test_time_limits()
+    test_iter_optimize_streams_lineups()
+    test_parallel_generation()
+    test_sim_optimize()
+    test_lineup_cache()
+    test_late_swap()
+    test_lineup_index()